@@ -0,0 +1,37 @@
+"""add row_count_deltas
+
+Revision ID: 3e9b7c1a5f82
+Revises: d2a8c5e1f437
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3e9b7c1a5f82'
+down_revision: Union[str, None] = 'd2a8c5e1f437'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('row_count_deltas',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('delta', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_row_count_deltas_name'), 'row_count_deltas', ['name'], unique=False)
+    # Written by the old code before a deleted user's recipes were skipped
+    op.execute("DELETE FROM row_counts WHERE name IN ('recipes:user:None', 'favorites:user:None')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_row_count_deltas_name'), table_name='row_count_deltas')
+    op.drop_table('row_count_deltas')
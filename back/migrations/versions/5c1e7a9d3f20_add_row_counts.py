@@ -0,0 +1,42 @@
+"""add row_counts
+
+Revision ID: 5c1e7a9d3f20
+Revises: ec95e8148be3
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e7a9d3f20'
+down_revision: Union[str, None] = 'ec95e8148be3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('row_counts',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('value', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    # Backfill, so the totals are right before the first reconciliation
+    op.execute("""
+        INSERT INTO row_counts (name, value)
+        SELECT 'recipes', COUNT(*) FROM recipes
+        UNION ALL SELECT 'recipes:published', COUNT(*) FROM recipes WHERE is_published
+        UNION ALL SELECT 'users', COUNT(*) FROM users
+        UNION ALL SELECT 'users:admin', COUNT(*) FROM users WHERE is_admin
+        UNION ALL SELECT 'recipes:user:' || user_id, COUNT(*) FROM recipes WHERE user_id IS NOT NULL GROUP BY user_id
+        UNION ALL SELECT 'favorites:user:' || user_id, COUNT(*) FROM favorite_recipes WHERE user_id IS NOT NULL GROUP BY user_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('row_counts')
@@ -0,0 +1,44 @@
+"""add listing indexes
+
+Revision ID: 8f3b2d6a1c47
+Revises: 5c1e7a9d3f20
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f3b2d6a1c47'
+down_revision: Union[str, None] = '5c1e7a9d3f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Every listing orders by (created_at or dish_name, id); a b-tree serves both directions
+    op.create_index('ix_recipes_created_at_id', 'recipes', ['created_at', 'id'], unique=False)
+    op.create_index('ix_recipes_dish_name_id', 'recipes', ['dish_name', 'id'], unique=False)
+    op.create_index('ix_recipes_published_created_at_id', 'recipes', ['created_at', 'id'], unique=False,
+                    postgresql_where=sa.text('is_published = true'))
+    op.create_index('ix_recipes_published_dish_name_id', 'recipes', ['dish_name', 'id'], unique=False,
+                    postgresql_where=sa.text('is_published = true'))
+    op.create_index('ix_recipes_user_id_created_at_id', 'recipes', ['user_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_recipes_user_id_dish_name_id', 'recipes', ['user_id', 'dish_name', 'id'], unique=False)
+    # Loading a page's ingredients; favorites by user already use unique_user_recipe_favorite
+    op.create_index(op.f('ix_ingredient_calories_recipe_id'), 'ingredient_calories', ['recipe_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_ingredient_calories_recipe_id'), table_name='ingredient_calories')
+    op.drop_index('ix_recipes_user_id_dish_name_id', table_name='recipes')
+    op.drop_index('ix_recipes_user_id_created_at_id', table_name='recipes')
+    op.drop_index('ix_recipes_published_dish_name_id', table_name='recipes')
+    op.drop_index('ix_recipes_published_created_at_id', table_name='recipes')
+    op.drop_index('ix_recipes_dish_name_id', table_name='recipes')
+    op.drop_index('ix_recipes_created_at_id', table_name='recipes')
@@ -0,0 +1,52 @@
+"""add recipe search vector
+
+Revision ID: b7d4e2f9a615
+Revises: 8f3b2d6a1c47
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d4e2f9a615'
+down_revision: Union[str, None] = '8f3b2d6a1c47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('recipes', sa.Column('ingredients_text', sa.Text(), nullable=True))
+    op.execute("""
+        UPDATE recipes SET ingredients_text = ingredients.names
+        FROM (
+            SELECT recipe_id, string_agg(ingredient, ', ' ORDER BY id) AS names
+            FROM ingredient_calories GROUP BY recipe_id
+        ) AS ingredients
+        WHERE ingredients.recipe_id = recipes.id
+    """)
+    # Added after the backfill, so every row's vector is computed once
+    op.add_column('recipes', sa.Column(
+        'search_vector',
+        postgresql.TSVECTOR(),
+        sa.Computed(
+            "setweight(to_tsvector('english', coalesce(dish_name, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(ingredients_text, '')), 'B') || "
+            "setweight(to_tsvector('english', coalesce(recipe, '')), 'C')",
+            persisted=True,
+        ),
+        nullable=True,
+    ))
+    op.create_index('ix_recipes_search_vector', 'recipes', ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_recipes_search_vector', table_name='recipes', postgresql_using='gin')
+    op.drop_column('recipes', 'search_vector')
+    op.drop_column('recipes', 'ingredients_text')
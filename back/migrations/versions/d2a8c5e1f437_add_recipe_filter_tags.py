@@ -0,0 +1,43 @@
+"""add recipe filter tags
+
+Revision ID: d2a8c5e1f437
+Revises: b7d4e2f9a615
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2a8c5e1f437'
+down_revision: Union[str, None] = 'b7d4e2f9a615'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('recipes', sa.Column('filter_tags', postgresql.ARRAY(sa.String()), server_default='{}', nullable=False))
+    # Category names from the join table, plus the vegan/halal flags as tags
+    op.execute("""
+        UPDATE recipes SET filter_tags =
+            ARRAY(
+                SELECT DISTINCT categories.name
+                FROM recipe_categories JOIN categories ON categories.id = recipe_categories.category_id
+                WHERE recipe_categories.recipe_id = recipes.id
+                ORDER BY categories.name
+            )
+            || CASE WHEN is_vegan THEN ARRAY['vegan']::varchar[] ELSE ARRAY[]::varchar[] END
+            || CASE WHEN is_halal THEN ARRAY['halal']::varchar[] ELSE ARRAY[]::varchar[] END
+    """)
+    op.create_index('ix_recipes_filter_tags', 'recipes', ['filter_tags'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_recipes_filter_tags', table_name='recipes', postgresql_using='gin')
+    op.drop_column('recipes', 'filter_tags')
@@ -0,0 +1,132 @@
+"""
+Load test for POST /dish/ against the fake model backend.
+
+Drives concurrent uploads through the real FastAPI app in-process (no network,
+no Gemini) and reports latency percentiles, throughput and peak RSS:
+
+    cd back
+    python -m scripts.benchmark_analysis --requests 200 --concurrency 20
+
+The app is imported as in production, so DATABASE_URL, Redis and
+gcs-config.json must be available just like for `uvicorn src.main:app`.
+Authentication and rate limiting are bypassed for the benchmark. The photos
+repeat every 32 uploads, so the analysis cache and single-flight are off unless
+--cache / --single-flight turn them back on.
+"""
+import argparse
+import asyncio
+import io
+import math
+import os
+import resource
+import statistics
+import sys
+import time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100, help="total uploads")
+    parser.add_argument("--concurrency", type=int, default=10, help="uploads in flight at once")
+    parser.add_argument("--latency-ms", type=int, default=800, help="median fake model latency")
+    parser.add_argument("--sigma", type=float, default=0.4, help="log-normal shape of the latency")
+    parser.add_argument("--image-edge", type=int, default=2048, help="edge of the generated test photos, px")
+    parser.add_argument("--cache", action="store_true", help="keep the analysis cache enabled")
+    parser.add_argument(
+        "--single-flight", action="store_true",
+        help="keep coalescing of identical uploads enabled (the photos repeat, so this inflates the results)"
+    )
+    return parser.parse_args()
+
+
+def configure_environment(args) -> None:
+    # Must happen before src.* is imported: agents read the backend at import time
+    os.environ["ANALYSIS_MODEL_BACKEND"] = "fake"
+    os.environ["FAKE_MODEL_LATENCY_MEDIAN_MS"] = str(args.latency_ms)
+    os.environ["FAKE_MODEL_LATENCY_SIGMA"] = str(args.sigma)
+    os.environ["ANALYSIS_CACHE_ENABLED"] = "true" if args.cache else "false"
+    os.environ["ANALYSIS_SINGLE_FLIGHT_ENABLED"] = "true" if args.single_flight else "false"
+
+
+def make_photo(index: int, edge: int) -> bytes:
+    """Noise photo: compresses poorly, so it is a pessimistic upload for preprocessing"""
+    from PIL import Image
+
+    img = Image.effect_noise((edge, edge), 64 + index % 64).convert("RGB")
+    output = io.BytesIO()
+    img.save(output, format="JPEG", quality=90)
+    return output.getvalue()
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def run(args) -> int:
+    import httpx
+
+    from src.main import app
+    from src.auth.service import get_current_user
+    from src.recipes.router import limiter
+
+    limiter.enabled = False
+    app.dependency_overrides[get_current_user] = lambda: {"username": "benchmark", "id": 0}
+
+    photos = [make_photo(i, args.image_edge) for i in range(min(args.requests, 32))]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    failures = 0
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=None) as client:
+        async def upload(index: int) -> None:
+            nonlocal failures
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(
+                    "/dish/",
+                    files={"file": (f"dish{index}.jpg", photos[index % len(photos)], "image/jpeg")},
+                    data={"location": "Almaty"},
+                )
+                elapsed = time.perf_counter() - started
+            if response.status_code == 200 and "analysis" in response.json():
+                latencies.append(elapsed)
+            else:
+                failures += 1
+                print(f"Request {index} failed: {response.status_code} {response.text[:200]}", file=sys.stderr)
+
+        baseline_rss = rss_mb()
+        started = time.perf_counter()
+        await asyncio.gather(*(upload(i) for i in range(args.requests)))
+        wall = time.perf_counter() - started
+
+    print(f"requests     {args.requests} ({failures} failed), concurrency {args.concurrency}")
+    print(f"fake model   median {args.latency_ms} ms, sigma {args.sigma}")
+    if latencies:
+        print(f"latency p50  {percentile(latencies, 50) * 1000:.0f} ms")
+        print(f"latency p95  {percentile(latencies, 95) * 1000:.0f} ms")
+        print(f"latency p99  {percentile(latencies, 99) * 1000:.0f} ms")
+        print(f"latency mean {statistics.mean(latencies) * 1000:.0f} ms")
+    print(f"throughput   {len(latencies) / wall:.2f} req/s over {wall:.1f} s")
+    print(f"rss          {baseline_rss:.0f} MB before, {rss_mb():.0f} MB after, {peak_rss_mb():.0f} MB peak")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    configure_environment(arguments)
+    sys.exit(asyncio.run(run(arguments)))
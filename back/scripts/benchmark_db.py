@@ -0,0 +1,99 @@
+"""
+Load test for the recipe listings, to compare database session strategies.
+
+Fires concurrent GET /dish/public/ requests through the real FastAPI app
+in-process and reports latency percentiles, throughput, and how long the
+event loop was stalled while they ran:
+
+    cd back
+    python -m scripts.benchmark_db --requests 400 --concurrency 50
+
+Every request asks for a different page, so the Redis listing cache never
+answers and each one goes to the database. Seed at least --requests published
+recipes at --page-size 1, otherwise the tail pages come back empty (they
+still query the database, just less of it).
+
+The app is imported as in production, so DATABASE_URL, Redis and
+gcs-config.json must be available just like for `uvicorn src.main:app`.
+Rate limiting is bypassed for the benchmark.
+"""
+import argparse
+import asyncio
+import math
+import statistics
+import sys
+import time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="total listing requests")
+    parser.add_argument("--concurrency", type=int, default=20, help="requests in flight at once")
+    parser.add_argument("--page-size", type=int, default=1, help="recipes per page")
+    return parser.parse_args()
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+async def watch_loop_lag(stop: asyncio.Event, lags: list, interval: float = 0.005) -> None:
+    """Wake up every interval and record how late the event loop let us run"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def run(args) -> int:
+    import httpx
+
+    from src.main import app
+    from src.recipes.router import limiter
+    from src.services.redis import invalidate_recipe_caches
+
+    limiter.enabled = False
+    # Drop listing pages cached by an earlier run
+    await invalidate_recipe_caches()
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    lags = []
+    failures = 0
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=None) as client:
+        async def listing(index: int) -> None:
+            nonlocal failures
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get("/dish/public/", params={"page": index + 1, "page_size": args.page_size})
+                elapsed = time.perf_counter() - started
+            if response.status_code == 200:
+                latencies.append(elapsed)
+            else:
+                failures += 1
+                print(f"Request {index} failed: {response.status_code} {response.text[:200]}", file=sys.stderr)
+
+        stop = asyncio.Event()
+        watcher = asyncio.create_task(watch_loop_lag(stop, lags))
+        started = time.perf_counter()
+        await asyncio.gather(*(listing(i) for i in range(args.requests)))
+        wall = time.perf_counter() - started
+        stop.set()
+        await watcher
+
+    print(f"requests     {args.requests} ({failures} failed), concurrency {args.concurrency}, page size {args.page_size}")
+    if latencies:
+        print(f"latency p50  {percentile(latencies, 50) * 1000:.1f} ms")
+        print(f"latency p95  {percentile(latencies, 95) * 1000:.1f} ms")
+        print(f"latency mean {statistics.mean(latencies) * 1000:.1f} ms")
+    print(f"throughput   {len(latencies) / wall:.1f} req/s over {wall:.2f} s")
+    if lags:
+        print(f"loop lag     p95 {percentile(lags, 95) * 1000:.1f} ms, max {max(lags) * 1000:.1f} ms")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run(parse_args())))
@@ -1,9 +1,9 @@
 from typing import Annotated
 from fastapi import Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.dependencies import get_db
+from src.dependencies import get_async_db
 from src.auth.service import get_current_admin_user
 
 AdminUserDependency = Annotated[dict, Depends(get_current_admin_user)]
-DatabaseDependency = Annotated[Session, Depends(get_db)] 
\ No newline at end of file
+DatabaseDependency = Annotated[AsyncSession, Depends(get_async_db)] 
\ No newline at end of file
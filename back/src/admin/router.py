@@ -7,6 +7,9 @@ from src.admin.schemas import (
     UserAdminToggleRequest,
     AdminRecipeResponse,
     AdminStatsResponse,
+    SpeculationStatsResponse,
+    JobQueueStatsResponse,
+    NutritionStatsResponse,
     AdminDashboardResponse,
     PaginatedUsersResponse,
     PaginatedRecipesResponse
@@ -22,6 +25,9 @@ from src.admin.service import (
     get_recent_users,
     get_recent_recipes
 )
+from src.recipes.analysis import get_speculation_stats
+from src.recipes.jobs import get_queue_metrics
+from src.recipes.nutrition import get_nutrition_stats
 
 router = APIRouter(prefix='/admin', tags=['admin'])
 
@@ -29,31 +35,31 @@ router = APIRouter(prefix='/admin', tags=['admin'])
 # ===== USER MANAGEMENT =====
 
 @router.get("/users", response_model=PaginatedUsersResponse, status_code=status.HTTP_200_OK)
-def get_all_users(
+async def get_all_users(
     db: DatabaseDependency,
     current_admin: AdminUserDependency,
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(20, ge=1, le=100, description="Number of items per page")
 ):
     """Get all users with pagination"""
-    return get_users_paginated(db, page=page, page_size=page_size)
+    return await get_users_paginated(db, page=page, page_size=page_size)
 
 
 @router.get("/users/{user_id}", response_model=AdminUserResponse, status_code=status.HTTP_200_OK)
-def get_user_details(
+async def get_user_details(
     user_id: int,
     db: DatabaseDependency,
     current_admin: AdminUserDependency
 ):
     """Get detailed user information"""
-    user = get_user_by_id(db, user_id)
+    user = await get_user_by_id(db, user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     return user
 
 
 @router.patch("/users/{user_id}/admin", status_code=status.HTTP_200_OK)
-def toggle_admin_rights(
+async def toggle_admin_rights(
     user_id: int,
     admin_toggle: UserAdminToggleRequest,
     db: DatabaseDependency,
@@ -66,7 +72,7 @@ def toggle_admin_rights(
             detail="Cannot remove admin rights from yourself"
         )
     
-    success = toggle_user_admin_status(db, user_id, admin_toggle.is_admin)
+    success = await toggle_user_admin_status(db, user_id, admin_toggle.is_admin)
     if not success:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     
@@ -75,7 +81,7 @@ def toggle_admin_rights(
 
 
 @router.delete("/users/{user_id}", status_code=status.HTTP_200_OK)
-def delete_user_by_id(
+async def delete_user_by_id(
     user_id: int,
     db: DatabaseDependency,
     current_admin: AdminUserDependency
@@ -87,7 +93,7 @@ def delete_user_by_id(
             detail="Cannot delete yourself"
         )
     
-    success = delete_user(db, user_id)
+    success = await delete_user(db, user_id)
     if not success:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     
@@ -97,24 +103,24 @@ def delete_user_by_id(
 # ===== RECIPE MANAGEMENT =====
 
 @router.get("/recipes", response_model=PaginatedRecipesResponse, status_code=status.HTTP_200_OK)
-def get_all_recipes(
+async def get_all_recipes(
     db: DatabaseDependency,
     current_admin: AdminUserDependency,
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(20, ge=1, le=100, description="Number of items per page")
 ):
     """Get all recipes with pagination"""
-    return get_recipes_paginated(db, page=page, page_size=page_size)
+    return await get_recipes_paginated(db, page=page, page_size=page_size)
 
 
 @router.delete("/recipes/{recipe_id}", status_code=status.HTTP_200_OK)
-def delete_recipe_by_id(
+async def delete_recipe_by_id(
     recipe_id: int,
     db: DatabaseDependency,
     current_admin: AdminUserDependency
 ):
     """Delete a recipe"""
-    success = delete_recipe(db, recipe_id)
+    success = await delete_recipe(db, recipe_id)
     if not success:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Recipe not found")
     
@@ -124,32 +130,56 @@ def delete_recipe_by_id(
 # ===== STATISTICS & DASHBOARD =====
 
 @router.get("/stats/users", response_model=AdminStatsResponse, status_code=status.HTTP_200_OK)
-def get_user_stats(
+async def get_user_stats(
     db: DatabaseDependency,
     current_admin: AdminUserDependency
 ):
     """Get user statistics"""
-    return get_admin_stats(db)
+    return await get_admin_stats(db)
 
 
 @router.get("/stats/recipes", response_model=AdminStatsResponse, status_code=status.HTTP_200_OK)
-def get_recipe_stats(
+async def get_recipe_stats(
     db: DatabaseDependency,
     current_admin: AdminUserDependency
 ):
     """Get recipe statistics"""
-    return get_admin_stats(db)
+    return await get_admin_stats(db)
+
+
+@router.get("/stats/speculation", response_model=SpeculationStatsResponse, status_code=status.HTTP_200_OK)
+async def get_analysis_speculation_stats(
+    current_admin: AdminUserDependency
+):
+    """Get LLM spend wasted by speculative dish analysis"""
+    return await get_speculation_stats()
+
+
+@router.get("/stats/jobs", response_model=JobQueueStatsResponse, status_code=status.HTTP_200_OK)
+async def get_analysis_job_stats(
+    current_admin: AdminUserDependency
+):
+    """Get analysis job queue depth and throughput counters"""
+    return await get_queue_metrics()
+
+
+@router.get("/stats/nutrition", response_model=NutritionStatsResponse, status_code=status.HTTP_200_OK)
+async def get_analysis_nutrition_stats(
+    current_admin: AdminUserDependency
+):
+    """Get how often the nutrition table answered calories_agent without the model"""
+    return await get_nutrition_stats()
 
 
 @router.get("/dashboard", response_model=AdminDashboardResponse, status_code=status.HTTP_200_OK)
-def get_admin_dashboard(
+async def get_admin_dashboard(
     db: DatabaseDependency,
     current_admin: AdminUserDependency
 ):
     """Get admin dashboard data"""
-    stats = get_admin_stats(db)
-    recent_users = get_recent_users(db, limit=5)
-    recent_recipes = get_recent_recipes(db, limit=5)
+    stats = await get_admin_stats(db)
+    recent_users = await get_recent_users(db, limit=5)
+    recent_recipes = await get_recent_recipes(db, limit=5)
     
     return AdminDashboardResponse(
         stats=stats,
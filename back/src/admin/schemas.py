@@ -42,6 +42,34 @@ class AdminStatsResponse(BaseModel):
     published_recipes: int
 
 
+class SpeculationStatsResponse(BaseModel):
+    speculative_runs: int
+    cancelled_runs: int
+    wasted_llm_calls: int
+    wasted_prompt_tokens: int
+    wasted_response_tokens: int
+    wasted_unanswered_prompt_tokens: int
+
+
+class JobQueueStatsResponse(BaseModel):
+    queue_depth: int
+    users_waiting: int
+    max_user_depth: int
+    running: int
+    enqueued: int
+    completed: int
+    failed: int
+    workers_per_process: int
+
+
+class NutritionStatsResponse(BaseModel):
+    ingredients: int
+    matched: int
+    hit_rate: float
+    stages: int
+    stages_skipped: int
+
+
 class AdminDashboardResponse(BaseModel):
     stats: AdminStatsResponse
     recent_users: List[AdminUserResponse]
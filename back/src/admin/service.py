@@ -1,10 +1,11 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Tuple
 from math import ceil
 
 from src.auth.models import Users
 from src.recipes.models import Recipe
+from src.services.row_counts import RECIPES, PUBLISHED_RECIPES, USERS, ADMINS, get_row_count
 from src.admin.schemas import (
     AdminUserResponse, 
     AdminRecipeResponse, 
@@ -14,14 +15,13 @@ from src.admin.schemas import (
 )
 
 
-def get_users_paginated(db: Session, page: int = 1, page_size: int = 20) -> PaginatedUsersResponse:
+async def get_users_paginated(db: AsyncSession, page: int = 1, page_size: int = 20) -> PaginatedUsersResponse:
     """Получить список пользователей с пагинацией"""
     offset = (page - 1) * page_size
     
-    users_query = db.query(Users).offset(offset).limit(page_size)
-    users = users_query.all()
+    users = (await db.scalars(select(Users).offset(offset).limit(page_size))).all()
     
-    total_users = db.query(Users).count()
+    total_users = await get_row_count(db, USERS)
     total_pages = ceil(total_users / page_size)
     
     return PaginatedUsersResponse(
@@ -33,50 +33,50 @@ def get_users_paginated(db: Session, page: int = 1, page_size: int = 20) -> Pagi
     )
 
 
-def get_user_by_id(db: Session, user_id: int) -> AdminUserResponse:
+async def get_user_by_id(db: AsyncSession, user_id: int) -> AdminUserResponse:
     """Получить пользователя по ID"""
-    user = db.query(Users).filter(Users.id == user_id).first()
+    user = await db.get(Users, user_id)
     if not user:
         return None
     return AdminUserResponse.model_validate(user)
 
 
-def toggle_user_admin_status(db: Session, user_id: int, is_admin: bool) -> bool:
+async def toggle_user_admin_status(db: AsyncSession, user_id: int, is_admin: bool) -> bool:
     """Назначить или снять админские права пользователя"""
-    user = db.query(Users).filter(Users.id == user_id).first()
+    user = await db.get(Users, user_id)
     if not user:
         return False
     
     user.is_admin = is_admin
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return True
 
 
-def delete_user(db: Session, user_id: int) -> bool:
+async def delete_user(db: AsyncSession, user_id: int) -> bool:
     """Удалить пользователя"""
-    user = db.query(Users).filter(Users.id == user_id).first()
+    user = await db.get(Users, user_id)
     if not user:
         return False
     
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    await db.commit()
     return True
 
 
-def get_recipes_paginated(db: Session, page: int = 1, page_size: int = 20) -> PaginatedRecipesResponse:
+async def get_recipes_paginated(db: AsyncSession, page: int = 1, page_size: int = 20) -> PaginatedRecipesResponse:
     """Получить список рецептов с пагинацией"""
     offset = (page - 1) * page_size
     
     recipes_query = (
-        db.query(Recipe, Users.username)
+        select(Recipe, Users.username)
         .join(Users, Recipe.user_id == Users.id)
         .offset(offset)
         .limit(page_size)
     )
-    recipes_data = recipes_query.all()
+    recipes_data = (await db.execute(recipes_query)).all()
     
-    total_recipes = db.query(Recipe).count()
+    total_recipes = await get_row_count(db, RECIPES)
     total_pages = ceil(total_recipes / page_size)
     
     recipes = []
@@ -94,23 +94,23 @@ def get_recipes_paginated(db: Session, page: int = 1, page_size: int = 20) -> Pa
     )
 
 
-def delete_recipe(db: Session, recipe_id: int) -> bool:
+async def delete_recipe(db: AsyncSession, recipe_id: int) -> bool:
     """Удалить рецепт"""
-    recipe = db.query(Recipe).filter(Recipe.id == recipe_id).first()
+    recipe = await db.get(Recipe, recipe_id)
     if not recipe:
         return False
     
-    db.delete(recipe)
-    db.commit()
+    await db.delete(recipe)
+    await db.commit()
     return True
 
 
-def get_admin_stats(db: Session) -> AdminStatsResponse:
+async def get_admin_stats(db: AsyncSession) -> AdminStatsResponse:
     """Получить статистику для админского дашборда"""
-    total_users = db.query(Users).count()
-    total_admins = db.query(Users).filter(Users.is_admin == True).count()
-    total_recipes = db.query(Recipe).count()
-    published_recipes = db.query(Recipe).filter(Recipe.is_published == True).count()
+    total_users = await get_row_count(db, USERS)
+    total_admins = await get_row_count(db, ADMINS)
+    total_recipes = await get_row_count(db, RECIPES)
+    published_recipes = await get_row_count(db, PUBLISHED_RECIPES)
     
     return AdminStatsResponse(
         total_users=total_users,
@@ -120,21 +120,20 @@ def get_admin_stats(db: Session) -> AdminStatsResponse:
     )
 
 
-def get_recent_users(db: Session, limit: int = 5) -> List[AdminUserResponse]:
+async def get_recent_users(db: AsyncSession, limit: int = 5) -> List[AdminUserResponse]:
     """Получить последних зарегистрированных пользователей"""
-    users = db.query(Users).order_by(Users.id.desc()).limit(limit).all()
+    users = (await db.scalars(select(Users).order_by(Users.id.desc()).limit(limit))).all()
     return [AdminUserResponse.model_validate(user) for user in users]
 
 
-def get_recent_recipes(db: Session, limit: int = 5) -> List[AdminRecipeResponse]:
+async def get_recent_recipes(db: AsyncSession, limit: int = 5) -> List[AdminRecipeResponse]:
     """Получить последние созданные рецепты"""
-    recipes_data = (
-        db.query(Recipe, Users.username)
+    recipes_data = (await db.execute(
+        select(Recipe, Users.username)
         .join(Users, Recipe.user_id == Users.id)
         .order_by(Recipe.id.desc())
         .limit(limit)
-        .all()
-    )
+    )).all()
     
     recipes = []
     for recipe, username in recipes_data:
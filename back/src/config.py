@@ -11,4 +11,89 @@ GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 REFRESH_SECRET_KEY = os.getenv('REFRESH_SECRET_KEY')
 ACCESS_TOKEN_EXPIRE_MINUTES=  30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
-IS_DEV = os.getenv('ENV') == 'dev'
\ No newline at end of file
+IS_DEV = os.getenv('ENV') == 'dev'
+
+# Row counts behind the listing totals: every write appends a delta, the deltas
+# are folded into the counters this often...
+ROW_COUNTS_FOLD_INTERVAL_SECONDS = int(os.getenv('ROW_COUNTS_FOLD_INTERVAL_SECONDS', 30))
+# ...and the counters are recomputed from the tables this often, to repair any drift
+ROW_COUNTS_RECONCILE_INTERVAL_SECONDS = int(os.getenv('ROW_COUNTS_RECONCILE_INTERVAL_SECONDS', 3600))
+
+# Dish analysis pipeline
+# "parallel" runs calories/health/delivery concurrently after the recipe stage,
+# "sequential" keeps the original one-after-another chain.
+ANALYSIS_PIPELINE_MODE = os.getenv('ANALYSIS_PIPELINE_MODE', 'parallel')
+
+# Content-addressed cache of dish analysis results (Redis)
+ANALYSIS_CACHE_ENABLED = os.getenv('ANALYSIS_CACHE_ENABLED', 'true').lower() == 'true'
+ANALYSIS_CACHE_TTL_SECONDS = int(os.getenv('ANALYSIS_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv('ANALYSIS_CACHE_MAX_ENTRIES', 10000))
+# Perceptual-hash lookup also catches re-encoded/resized copies of the same photo
+ANALYSIS_CACHE_PHASH = os.getenv('ANALYSIS_CACHE_PHASH', 'false').lower() == 'true'
+ANALYSIS_CACHE_PHASH_MAX_DISTANCE = int(os.getenv('ANALYSIS_CACHE_PHASH_MAX_DISTANCE', 4))
+
+# Start the food check and the recipe pipeline together; the pipeline is
+# cancelled (and its spend recorded as waste) when the photo is not food.
+ANALYSIS_SPECULATIVE = os.getenv('ANALYSIS_SPECULATIVE', 'false').lower() == 'true'
+
+# Background analysis jobs (POST /dish/jobs/)
+ANALYSIS_JOB_WORKERS = int(os.getenv('ANALYSIS_JOB_WORKERS', 4))
+ANALYSIS_JOB_TTL_SECONDS = int(os.getenv('ANALYSIS_JOB_TTL_SECONDS', 3600))
+ANALYSIS_JOB_MAX_PENDING_PER_USER = int(os.getenv('ANALYSIS_JOB_MAX_PENDING_PER_USER', 5))
+# A taken job not finished within this long is assumed lost with its worker and
+# is queued again, up to ANALYSIS_JOB_MAX_ATTEMPTS times
+ANALYSIS_JOB_VISIBILITY_TIMEOUT_SECONDS = int(os.getenv('ANALYSIS_JOB_VISIBILITY_TIMEOUT_SECONDS', 600))
+ANALYSIS_JOB_MAX_ATTEMPTS = int(os.getenv('ANALYSIS_JOB_MAX_ATTEMPTS', 3))
+
+# How long an analyzed image waits for POST /dish/save/ with its analysis_id
+ANALYSIS_STAGING_TTL_SECONDS = int(os.getenv('ANALYSIS_STAGING_TTL_SECONDS', 1800))
+
+# Upload preprocessing before images are sent to Gemini
+IMAGE_PREPROCESS_ENABLED = os.getenv('IMAGE_PREPROCESS_ENABLED', 'true').lower() == 'true'
+IMAGE_PREPROCESS_WORKERS = int(os.getenv('IMAGE_PREPROCESS_WORKERS', 2))
+IMAGE_MAX_EDGE = int(os.getenv('IMAGE_MAX_EDGE', 1536))
+IMAGE_OUTPUT_FORMAT = os.getenv('IMAGE_OUTPUT_FORMAT', 'JPEG').upper()  # JPEG or WEBP
+IMAGE_OUTPUT_QUALITY = int(os.getenv('IMAGE_OUTPUT_QUALITY', 85))
+
+# ADK session storage for the analysis runners
+ADK_SESSION_BACKEND = os.getenv('ADK_SESSION_BACKEND', 'memory')  # memory or redis
+ADK_SESSION_MAX_COUNT = int(os.getenv('ADK_SESSION_MAX_COUNT', 500))
+ADK_SESSION_IDLE_TTL_SECONDS = int(os.getenv('ADK_SESSION_IDLE_TTL_SECONDS', 600))
+# Byte budget of the in-memory store; sessions hold the uploaded image
+ADK_SESSION_MAX_BYTES = int(os.getenv('ADK_SESSION_MAX_BYTES', 256 * 1024 * 1024))
+
+# Model used by the analysis agents; "fake" answers with canned stage outputs
+# after a simulated latency so the pipeline can be load tested without Gemini.
+ANALYSIS_MODEL_BACKEND = os.getenv('ANALYSIS_MODEL_BACKEND', 'gemini')  # gemini or fake
+ANALYSIS_MODEL = os.getenv('ANALYSIS_MODEL', 'gemini-2.0-flash')
+FAKE_MODEL_LATENCY_MEDIAN_MS = int(os.getenv('FAKE_MODEL_LATENCY_MEDIAN_MS', 800))
+FAKE_MODEL_LATENCY_SIGMA = float(os.getenv('FAKE_MODEL_LATENCY_SIGMA', 0.4))  # log-normal shape
+FAKE_MODEL_SEED = int(os.getenv('FAKE_MODEL_SEED', 0))
+
+# POST /dish/batch/: images per request, and analyses in flight at once across
+# all batch requests in this process
+ANALYSIS_BATCH_MAX_IMAGES = int(os.getenv('ANALYSIS_BATCH_MAX_IMAGES', 8))
+ANALYSIS_BATCH_CONCURRENCY = int(os.getenv('ANALYSIS_BATCH_CONCURRENCY', 8))
+
+# Answer calories_agent from the bundled nutrition table where it covers the recipe
+NUTRITION_TABLE_ENABLED = os.getenv('NUTRITION_TABLE_ENABLED', 'true').lower() == 'true'
+
+# Per-stage model call deadlines, e.g. "recipe_agent=40,calories_agent=15";
+# stages not listed use ANALYSIS_STAGE_TIMEOUT_SECONDS
+ANALYSIS_STAGE_TIMEOUT_SECONDS = float(os.getenv('ANALYSIS_STAGE_TIMEOUT_SECONDS', 30))
+ANALYSIS_STAGE_TIMEOUTS = os.getenv('ANALYSIS_STAGE_TIMEOUTS', 'checking_agent=15')
+# Re-prompts of a stage after a timeout, error or non-JSON reply
+ANALYSIS_STAGE_MAX_RETRIES = int(os.getenv('ANALYSIS_STAGE_MAX_RETRIES', 1))
+# Send a duplicate request once a call outlives the stage's observed latency percentile
+ANALYSIS_HEDGE_ENABLED = os.getenv('ANALYSIS_HEDGE_ENABLED', 'false').lower() == 'true'
+ANALYSIS_HEDGE_PERCENTILE = int(os.getenv('ANALYSIS_HEDGE_PERCENTILE', 95))
+ANALYSIS_HEDGE_DEFAULT_DELAY_MS = int(os.getenv('ANALYSIS_HEDGE_DEFAULT_DELAY_MS', 5000))
+# Retries plus hedges allowed per first attempt, and the burst they may draw on
+ANALYSIS_RETRY_BUDGET_RATIO = float(os.getenv('ANALYSIS_RETRY_BUDGET_RATIO', 0.1))
+ANALYSIS_RETRY_BUDGET_CAPACITY = float(os.getenv('ANALYSIS_RETRY_BUDGET_CAPACITY', 10))
+
+# Coalesce identical concurrent analyses (same image bytes and location),
+# in-process and across workers through a Redis lock
+ANALYSIS_SINGLE_FLIGHT_ENABLED = os.getenv('ANALYSIS_SINGLE_FLIGHT_ENABLED', 'true').lower() == 'true'
+ANALYSIS_SINGLE_FLIGHT_LOCK_TTL_SECONDS = int(os.getenv('ANALYSIS_SINGLE_FLIGHT_LOCK_TTL_SECONDS', 120))
+ANALYSIS_SINGLE_FLIGHT_RESULT_TTL_SECONDS = int(os.getenv('ANALYSIS_SINGLE_FLIGHT_RESULT_TTL_SECONDS', 60))
@@ -1,4 +1,6 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url, URL
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 from dotenv import load_dotenv
@@ -7,6 +9,25 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# asyncio drivers for the same databases
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def async_database_url(url: str) -> URL:
+    """DATABASE_URL with its driver swapped for the asyncio one"""
+    url = make_url(url)
+    query = dict(url.query)
+    # asyncpg calls libpq's sslmode "ssl"
+    if "sslmode" in query:
+        query["ssl"] = query.pop("sslmode")
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername), query=query)
+
+
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Used by the async routes so queries don't block the event loop. Objects stay
+# loaded after commit, since an expired attribute can't lazy-load under asyncio.
+async_engine = create_async_engine(async_database_url(DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
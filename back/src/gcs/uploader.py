@@ -1,4 +1,5 @@
 import io
+import mimetypes
 from fastapi import UploadFile, HTTPException
 from google.cloud import storage
 from google.oauth2 import service_account
@@ -41,6 +42,20 @@ def upload_large_file_to_gcs(file: UploadFile, chunk_size: int = CHUNK_SIZE):
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 
+def upload_bytes_to_gcs(data: bytes, content_type: str | None):
+    """Upload an image already held in memory, e.g. a staged analysis photo"""
+    try:
+        client = storage.Client(credentials=credentials)
+        bucket = client.bucket(BUCKET_NAME)
+
+        file_extension = mimetypes.guess_extension(content_type or "") or '.jpg'
+        blob = bucket.blob(f"recipes/{uuid4()}{file_extension}")
+        blob.upload_from_string(data, content_type=content_type)
+        return blob.public_url
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+
+
 def upload_file_in_chunks(file: UploadFile, chunk_size: int):
     try:
         client = storage.Client(credentials=credentials)
@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import FastAPI, Response, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
@@ -14,6 +15,9 @@ from src.recipes.router import router as ai_router, limiter
 from src.profile.router import router as profile_router
 from src.admin.router import router as admin_router
 from src.recipes.models import Recipe
+from src.recipes.jobs import start_workers, stop_workers
+from src.services.metrics import metrics_response
+from src.services.row_counts import maintain_row_counts
 
 app = FastAPI()
 
@@ -47,11 +51,28 @@ app.include_router(admin_router)
 Base.metadata.create_all(bind=engine)
 
 
+@app.on_event("startup")
+async def start_analysis_workers():
+    app.state.analysis_workers = start_workers()
+    app.state.row_count_reconciler = asyncio.create_task(maintain_row_counts())
+
+
+@app.on_event("shutdown")
+async def stop_analysis_workers():
+    await stop_workers(app.state.analysis_workers + [app.state.row_count_reconciler])
+
+
 @app.get("/")
 def root():
     return {"message": "Welcome to the FoodSnap AI!!"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint: per-agent latency, token usage and JSON parse failures"""
+    return metrics_response()
+
+
 @app.get("/sitemap.xml", response_class=Response)
 def sitemap(db: Session = Depends(get_db)):
     # Get current date for lastmod
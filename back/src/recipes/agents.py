@@ -1,9 +1,30 @@
-from google.adk.agents import LlmAgent, SequentialAgent
+from google.adk.agents import LlmAgent, SequentialAgent, ParallelAgent
 from google.adk.tools import google_search
 
+from src.config import ANALYSIS_PIPELINE_MODE
+from src.recipes.assembler import AnalysisAssemblerAgent
+from src.recipes.delivery import DeliveryLinksAgent
+from src.recipes.model_backend import stage_model
+from src.recipes.nutrition import answer_from_nutrition_table, apply_nutrition_table
+from src.recipes.health_rules import apply_health_rules
+from src.recipes.instrumentation import (
+  record_stage_start,
+  record_stage_end,
+  record_model_call,
+  record_model_usage,
+)
+
+# Timing and LLM usage hooks shared by every LLM stage
+LLM_STAGE_CALLBACKS = dict(
+  before_agent_callback=record_stage_start,
+  after_agent_callback=record_stage_end,
+  before_model_callback=record_model_call,
+  after_model_callback=record_model_usage,
+)
+
 checking_agent = LlmAgent(
   name="checking_agent",
-  model="gemini-2.0-flash",
+  model=stage_model("checking_agent"),
   instruction="""
       You are an assistant that determines whether the given image contains food that can be used to create a recipe.
 
@@ -28,11 +49,12 @@ checking_agent = LlmAgent(
       Only return JSON — no extra text.
       """,
   description="Determines whether image contains food suitable for recipe generation.",
+  **LLM_STAGE_CALLBACKS,
 )
 
 recipe_agent = LlmAgent(
   name="recipe_agent",
-  model="gemini-2.0-flash",
+  model=stage_model("recipe_agent"),
   instruction=(
       """
       You are a professional chef analyzing food photos to create detailed recipes.
@@ -81,12 +103,13 @@ recipe_agent = LlmAgent(
       """
   ),
   description="Analyze food photos and create detailed homemade recipes, including for packaged items.",
-  output_key="recipe"
+  output_key="recipe",
+  **LLM_STAGE_CALLBACKS,
 )
 
 calories_agent = LlmAgent(
   name="calories_agent",
-  model="gemini-2.0-flash",
+  model=stage_model("calories_agent"),
   instruction=(
       """
       You are a nutritionist that estimates calories in dishes based on their ingredients and preparation method.
@@ -130,24 +153,32 @@ calories_agent = LlmAgent(
   ),
   description="Estimates detailed nutritional information including cooking method impacts.",
   output_key="calories",
+  before_agent_callback=record_stage_start,
+  after_agent_callback=record_stage_end,
+  # The nutrition table goes first so record_model_call only counts real model calls
+  before_model_callback=[answer_from_nutrition_table, record_model_call],
+  after_model_callback=[record_model_usage, apply_nutrition_table],
 )
 
+# Ingredient-determined labels and vegan/halal come from the rule engine
+# (apply_health_rules); the model only judges the nutrient-threshold labels.
 health_categories_agent = LlmAgent(
   name="health_categories_agent",
-  model="gemini-2.0-flash",
+  model=stage_model("health_categories_agent"),
   instruction=(
       """
-      You are a nutritional analyst that assigns health categories to dishes based on their ingredients and nutritional information.
-      Also you have to check if food is vegan and halal.
+      You are a nutritional analyst that assigns nutrient-based health categories to dishes.
       
-      You will receive a JSON with recipe and nutritional data:
+      You will receive the recipe JSON produced by the chef. Nutritional data may or may not
+      be available yet — if it is missing, estimate fiber, sodium, sugar, fat and protein
+      from the ingredients and their measurements yourself:
       {
         "recipe": {
           "dish_name": "string",
           "ingredients": ["string", ...],
           "recipe": "string"
         },
-        "calories": {
+        "calories": {  // optional
           "dish_name": "string",
           "ingredients_calories": {...},
           "estimated_weight_g": number,
@@ -161,23 +192,14 @@ health_categories_agent = LlmAgent(
       - "High Sodium" - dishes with high salt content (>1.5g per 100g)
       - "High Sugar" - dishes with high sugar content (>15g per 100g)
       - "High Saturated Fat" - dishes with high saturated fat content (>5g per 100g)
-      - "Spicy/Irritant" - spicy dishes or containing irritating spices
-      - "Red Meat-Based" - dishes based on red meat (beef, pork, lamb)
-      - "Plant-Based" - dishes without any animal products
-      - "Dairy-Free" - dishes without dairy products
       - "High Protein" - dishes with high protein content (>20g per 100g)
-      - "Contains Nuts" - dishes containing any nuts or tree nuts
       
       ANALYSIS GUIDELINES:
       - Check ingredients for fiber sources (vegetables, whole grains, legumes)
       - Identify sodium sources (salt, soy sauce, processed ingredients)
       - Look for sugar content (added sugars, natural sugars, sweeteners)
       - Analyze fat types (saturated vs unsaturated)
-      - Check for spices (chili, pepper, hot sauce)
       - Identify protein sources (meat, fish, dairy, legumes, nuts)
-      - Check for nuts/tree nuts (almonds, walnuts, peanuts, etc.)
-      - Determine if dish is plant-based (no animal products)
-      - Check for dairy ingredients (milk, cheese, butter, cream)
       
       CATEGORY ASSIGNMENT RULES:
       - Return health_categories as an array of strings
@@ -188,145 +210,55 @@ health_categories_agent = LlmAgent(
       
       Return JSON in this format:
       {
-        "health_categories": ["category1", "category2", ...],
-        "is_vegan": true,
-        "is_halal": false
+        "health_categories": ["category1", "category2", ...]
       }
       
       Only return JSON — no explanations or additional text.
       """
   ),
-  description="Analyzes dishes and assigns health categories based on ingredients and nutritional data.",
+  description="Assigns nutrient-threshold health categories; ingredient-based ones come from rules.",
   output_key="health_categories",
+  before_agent_callback=record_stage_start,
+  after_agent_callback=record_stage_end,
+  before_model_callback=record_model_call,
+  after_model_callback=[record_model_usage, apply_health_rules],
 )
 
-delivery_agent = LlmAgent(
+# Search links are pure string templating, so this stage runs locally instead of calling the model
+delivery_agent = DeliveryLinksAgent(
     name="delivery_agent",
-    model="gemini-2.0-flash",
-    instruction="""
-    STEP 1: Check for "User location:" in message
-    - If NOT found: return exactly []
-    - If found: extract location and continue
-    
-    STEP 2: For each basic or rare ingredient from the recipe, create Google search URLs for delivery:
-    
-    Create search URLs in this format:
-    https://www.google.com/search?q=[ingredient]+[delivery_term]+[location
-    
-    Examples:
-    - For Russian/CIS locations: "заказать+помидоры+алматы", "доставка+мука+москва"
-    - For English locations: "deliver+flour+london", "order+tomatoes+new+york"
-    
-    STEP 3: Generate search URLs for main ingredients:
-    - Bread flour: "https://www.google.com/search?q=заказать+мука+хлебопекарная+[location]"
-    - Mozzarella: "https://www.google.com/search?q=доставка+моцарелла+сыр+[location]"
-    - Cherry tomatoes: "https://www.google.com/search?q=заказать+помидоры+черри+[location]"
-    - Olive oil: "https://www.google.com/search?q=доставка+оливковое+масло+[location]"
-    
-    For English-speaking locations use English terms:
-    - "https://www.google.com/search?q=deliver+bread+flour+[location]"
-    - "https://www.google.com/search?q=order+mozzarella+cheese+[location]"
-    
-    STEP 4: Return array with Google search links:
-    [
-      {
-        "product": "bread flour",
-        "link": "https://www.google.com/search?q=заказать+мука+хлебопекарная+алматы",
-      },
-      {
-        "product": "mozzarella cheese", 
-        "link": "https://www.google.com/search?q=доставка+моцарелла+сыр+алматы",
-      }
-    ]
-    
-    LANGUAGE RULES:
-    - For Kazakhstan, Russia, Belarus: use Russian terms (заказать, доставка)
-    - For USA, UK, Canada, Australia: use English terms (deliver, order)
-    - For other locations: use English terms
-    
-    URL ENCODING:
-    - Replace spaces with + in URLs
-    - Use proper Google search format
-    - Each ingredient gets its own search URL
-    
-    NO google_search tool needed - just generate the search URLs directly.
-    """,
-    tools=[],
-    output_key="delivery",
-    description="Generates Google search URLs for ingredient delivery queries."
+    description="Generates Google search URLs for ingredient delivery queries.",
+    before_agent_callback=record_stage_start,
+    after_agent_callback=record_stage_end,
 )
 
-final_agent = LlmAgent(
+# Merging and validating the stage outputs is deterministic, so it happens in-process
+final_agent = AnalysisAssemblerAgent(
     name="final_agent",
-    model="gemini-2.0-flash", 
-    instruction="""
-    You are a final validator that combines recipe, nutritional information, and delivery data. 
-    
-    You will receive state['recipe'], state['calories'], state['health_categories'], and state['delivery'].
-    
-    VALIDATION RULES:
-    - Ensure recipe is realistic and achievable
-    - Verify ingredients match between recipe and calories
-    - Check that nutritional estimates are reasonable
-    - Ensure no "buy this product" instructions exist
-    - Validate health categories are appropriate for ingredients
-    - Ensure health categories are ONLY from this approved list:
-      ["High in Fiber", "High Sodium", "High Sugar", "High Saturated Fat", 
-       "Spicy/Irritant", "Red Meat-Based", "Plant-Based", "Dairy-Free", 
-       "High Protein", "Contains Nuts"]
-    - Include delivery data if available
-    
-    State['calories'] structure:
-    {
-      "dish_name": "string",
-      "ingredients_calories": {
-        "ingredient1": calories_per_100g,
-        ...
-      },
-      "estimated_weight_g": number,
-      "total_calories_per_100g": number
-    }
-    
-    State['health_categories'] structure:
-    {
-      "health_categories": ["category1", "category2", ...],
-      "is_vegan": true or false,
-      "is_halal": true or false
-    }
-    
-    State['recipe'] structure:
-    {
-      "dish_name": "string",
-      "ingredients": ["string", ...],
-      "recipe": "string"
-    }
-    
-    State['delivery'] structure:
-    [
-      {
-        "product": "specific ingredient name",
-        "link": "https://store.com/specific-product-page",
-      },
-      ...
-    ]
-    
-    Return a JSON object:
-    {
-      "recipe": state['recipe'],
-      "calories": state['calories'],
-      "health_categories": state['health_categories']['health_categories'] if state['health_categories'] else [],
-      "is_vegan": state['health_categories']['is_vegan'] if state['health_categories'] else false,
-      "is_halal": state['health_categories']['is_halal'] if state['health_categories'] else false,
-      "delivery": state['delivery']
-    }
-    
-    Only return JSON — no extra text.
-    Ensure all data is consistent and realistic.
-    """,
-    output_key="final_output"
+    description="Validates and merges the recipe, calories, health and delivery stage outputs.",
+    before_agent_callback=record_stage_start,
+    after_agent_callback=record_stage_end,
 )
 
-root_agent = SequentialAgent(
-  name="root_agent",
-  sub_agents=[recipe_agent, calories_agent, health_categories_agent, delivery_agent, final_agent]
-)
\ No newline at end of file
+if ANALYSIS_PIPELINE_MODE == "sequential":
+  root_agent = SequentialAgent(
+    name="root_agent",
+    sub_agents=[recipe_agent, calories_agent, health_categories_agent, delivery_agent, final_agent],
+    before_agent_callback=record_stage_start,
+    after_agent_callback=record_stage_end,
+  )
+else:
+  # Fan-out/fan-in: everything after the recipe only depends on the recipe,
+  # so those stages run concurrently and final_agent merges their outputs.
+  analysis_fanout_agent = ParallelAgent(
+    name="analysis_fanout_agent",
+    sub_agents=[calories_agent, health_categories_agent, delivery_agent],
+    before_agent_callback=record_stage_start,
+    after_agent_callback=record_stage_end,
+  )
+  root_agent = SequentialAgent(
+    name="root_agent",
+    sub_agents=[recipe_agent, analysis_fanout_agent, final_agent],
+    before_agent_callback=record_stage_start,
+    after_agent_callback=record_stage_end,
+  )
\ No newline at end of file
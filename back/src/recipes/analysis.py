@@ -0,0 +1,436 @@
+import asyncio
+import time
+import uuid
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+
+from google.adk.runners import Runner
+from google.genai import types
+
+from src.config import ANALYSIS_SPECULATIVE, ANALYSIS_BATCH_CONCURRENCY
+from src.recipes.agents import root_agent, checking_agent
+from src.recipes.instrumentation import PipelineTrace, pipeline_trace
+from src.recipes.parsing import parse_agent_json
+from src.services.analysis_cache import get_cached_analysis, cache_analysis, analysis_key
+from src.services.image_preprocessing import PreprocessedImage, preprocess_image
+from src.services.metrics import ANALYSIS_DURATION
+from src.services.redis import redis_client
+from src.services.session_store import create_session_service
+from src.services.single_flight import coalesce
+
+SPECULATION_STATS_KEY = "analysis:speculation"
+# output_key of each root_agent stage whose result is useful on its own
+STAGE_OUTPUT_KEYS = ("recipe", "calories", "health_categories", "delivery")
+
+APP_NAME = "dish_analysis_app"
+session_service = create_session_service()
+runner = Runner(
+    agent=root_agent,
+    app_name=APP_NAME,
+    session_service=session_service,
+)
+checking_runner = Runner(
+    agent=checking_agent,
+    app_name=APP_NAME,
+    session_service=session_service,
+)
+# Shared by every batch request so a few large batches can't exceed the model's concurrency
+batch_semaphore = asyncio.Semaphore(ANALYSIS_BATCH_CONCURRENCY)
+
+
+def build_content(image_data: bytes, mime_type: Optional[str], location: Optional[str]) -> types.Content:
+    content_parts = [types.Part(
+        inline_data=types.Blob(
+            mime_type=mime_type,
+            data=image_data
+        )
+    )]
+
+    if location:
+        content_parts.append(types.Part(text=f"User location: {location}"))
+
+    return types.Content(
+        role="user",
+        parts=content_parts
+    )
+
+
+async def check_food(user_id: str, session_id: str, content: types.Content) -> dict:
+    """Run checking_agent and return its {"is_food", "description"} verdict"""
+    checking_result = "Agent did not respond"
+    trace = PipelineTrace("checking_agent")
+    with pipeline_trace(trace):
+        try:
+            # No early break: the after-callback has to run to close the stage timing
+            async for event in checking_runner.run_async(
+                user_id=user_id,
+                session_id=session_id,
+                new_message=content
+            ):
+                if event.is_final_response() and event.content and event.content.parts:
+                    checking_result = event.content.parts[0].text
+        finally:
+            trace.export()
+
+    return parse_agent_json(checking_result)
+
+
+async def iter_pipeline_outputs(
+    user_id: str,
+    session_id: str,
+    content: types.Content
+) -> AsyncIterator[Tuple[str, str]]:
+    """Yield (output_key, text) as each root_agent stage stores its output in session state"""
+    async for event in runner.run_async(
+        user_id=user_id,
+        session_id=session_id,
+        new_message=content
+    ):
+        if event.actions and event.actions.state_delta:
+            for key, value in event.actions.state_delta.items():
+                yield key, value
+
+
+def _parse_stage_output(text: str):
+    try:
+        return parse_agent_json(text)
+    except ValueError:
+        return text
+
+
+async def run_recipe_pipeline(
+    user_id: str,
+    session_id: str,
+    content: types.Content,
+    trace: Optional[PipelineTrace] = None,
+    on_stage: Optional[Callable[[str, dict], None]] = None
+) -> dict:
+    """
+    Run root_agent and return the parsed output of final_agent.
+
+    Stage timings and LLM usage are recorded on `trace` (a fresh one if not given),
+    which stays readable by the caller even if this coroutine is cancelled.
+    Each stage in STAGE_OUTPUT_KEYS is passed to `on_stage` as soon as it finishes.
+    """
+    trace = trace or PipelineTrace("root_agent")
+    final_response = "Agent did not respond"
+    with pipeline_trace(trace):
+        try:
+            # Drain the whole stream (no early break) so every stage's after-callback
+            # fires and the stage timings are complete.
+            async for key, value in iter_pipeline_outputs(user_id, session_id, content):
+                if key == "final_output":
+                    final_response = value
+                elif on_stage is not None and key in STAGE_OUTPUT_KEYS:
+                    on_stage(key, _parse_stage_output(value))
+        except asyncio.CancelledError:
+            # Stages that have not reached the model yet skip it
+            trace.cancelled = True
+            raise
+        finally:
+            trace.finish()
+
+    return parse_agent_json(final_response)
+
+
+def _not_food_response(checking_data: dict) -> dict:
+    return {
+        "message": "Not food",
+        "description": checking_data.get("description", "Unknown")
+    }
+
+
+async def _create_session(user_id: str) -> str:
+    session_id = str(uuid.uuid4())
+    await session_service.create_session(
+        app_name=APP_NAME,
+        user_id=user_id,
+        session_id=session_id,
+    )
+    return session_id
+
+
+async def _delete_session(user_id: str, session_id: str) -> None:
+    """Sessions carry the uploaded image, so they are dropped as soon as a run finishes"""
+    try:
+        await session_service.delete_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+    except Exception as e:
+        print(f"Session cleanup error: {e}")
+
+
+async def _record_speculation(wasted: Optional[dict]) -> None:
+    """Aggregate speculation outcomes across workers so the waste can be judged per deployment"""
+    try:
+        await redis_client.hincrby(SPECULATION_STATS_KEY, "speculative_runs", 1)
+        if wasted is not None:
+            await redis_client.hincrby(SPECULATION_STATS_KEY, "cancelled_runs", 1)
+            await redis_client.hincrby(SPECULATION_STATS_KEY, "wasted_llm_calls", wasted["calls"])
+            await redis_client.hincrby(SPECULATION_STATS_KEY, "wasted_prompt_tokens", wasted["prompt_tokens"])
+            await redis_client.hincrby(SPECULATION_STATS_KEY, "wasted_response_tokens", wasted["response_tokens"])
+            await redis_client.hincrby(
+                SPECULATION_STATS_KEY, "wasted_unanswered_prompt_tokens", wasted["unanswered_prompt_tokens"]
+            )
+    except Exception as e:
+        print(f"Speculation stats error: {e}")
+
+
+async def get_speculation_stats() -> dict:
+    fields = [
+        "speculative_runs",
+        "cancelled_runs",
+        "wasted_llm_calls",
+        "wasted_prompt_tokens",
+        "wasted_response_tokens",
+        "wasted_unanswered_prompt_tokens",
+    ]
+    stats = await redis_client.hgetall(SPECULATION_STATS_KEY)
+    return {field: int(stats.get(field, 0)) for field in fields}
+
+
+async def _discard_pipeline(pipeline_task: asyncio.Task, trace: PipelineTrace) -> None:
+    """Cancel the speculative pipeline, wait for it to unwind and record what it spent"""
+    trace.cancelled = True
+    pipeline_task.cancel()
+    # Awaited so it is done with its session before that is deleted
+    await asyncio.gather(pipeline_task, return_exceptions=True)
+
+    # Calls cut off by the cancellation never report usage; their prompts are estimated
+    wasted = {**trace.total_llm_usage(), "unanswered_prompt_tokens": trace.unanswered_prompt_tokens()}
+    print(
+        f"🗑 Speculative pipeline discarded: {wasted['calls']} LLM calls, "
+        f"{wasted['prompt_tokens']} prompt / {wasted['response_tokens']} response tokens, "
+        f"~{wasted['unanswered_prompt_tokens']} prompt tokens in unanswered calls"
+    )
+    await _record_speculation(wasted)
+
+
+async def _analyze_speculative(
+    content: types.Content,
+    user_id: str,
+    on_stage: Optional[Callable[[str, dict], None]] = None
+) -> dict:
+    """
+    Start the food check and the recipe pipeline at the same time.
+
+    The pipeline runs in its own session so the two event streams don't interleave.
+    If the image turns out not to be food the pipeline is cancelled and whatever
+    it had already spent is recorded as waste. Stage outputs are held back from
+    `on_stage` until the check has confirmed the photo is food.
+    """
+    check_session_id = await _create_session(user_id)
+    try:
+        # Inside the try: when the store is full the check session is released too
+        pipeline_session_id = await _create_session(user_id)
+        try:
+            return await _run_speculative(content, user_id, check_session_id, pipeline_session_id, on_stage)
+        finally:
+            await _delete_session(user_id, pipeline_session_id)
+    finally:
+        await _delete_session(user_id, check_session_id)
+
+
+async def _run_speculative(
+    content: types.Content,
+    user_id: str,
+    check_session_id: str,
+    pipeline_session_id: str,
+    on_stage: Optional[Callable[[str, dict], None]] = None
+) -> dict:
+    held: List[Tuple[str, dict]] = []
+    confirmed = False
+
+    def hold_stage(key: str, value: dict) -> None:
+        if confirmed:
+            on_stage(key, value)
+        else:
+            held.append((key, value))
+
+    speculative_trace = PipelineTrace("root_agent (speculative)")
+    pipeline_task = asyncio.create_task(run_recipe_pipeline(
+        user_id, pipeline_session_id, content,
+        trace=speculative_trace,
+        on_stage=hold_stage if on_stage is not None else None
+    ))
+
+    try:
+        checking_data = await check_food(user_id, check_session_id, content)
+    except BaseException:
+        await _discard_pipeline(pipeline_task, speculative_trace)
+        raise
+
+    if checking_data.get("is_food"):
+        confirmed = True
+        for key, value in held:
+            on_stage(key, value)
+        analysis = await pipeline_task
+        await _record_speculation(None)
+        return {"analysis": analysis}
+
+    await _discard_pipeline(pipeline_task, speculative_trace)
+    return _not_food_response(checking_data)
+
+
+async def _analyze_uncached(
+    image_data: bytes,
+    mime_type: Optional[str],
+    location: Optional[str],
+    user_id: str,
+    on_stage: Optional[Callable[[str, dict], None]] = None
+) -> dict:
+    content = build_content(image_data, mime_type, location)
+
+    if ANALYSIS_SPECULATIVE:
+        return await _analyze_speculative(content, user_id, on_stage)
+
+    session_id = await _create_session(user_id)
+    try:
+        checking_data = await check_food(user_id, session_id, content)
+        if not checking_data.get("is_food"):
+            return _not_food_response(checking_data)
+
+        return {"analysis": await run_recipe_pipeline(user_id, session_id, content, on_stage=on_stage)}
+    finally:
+        await _delete_session(user_id, session_id)
+
+
+async def analyze_image(
+    image_data: bytes,
+    mime_type: Optional[str],
+    location: Optional[str],
+    user_id: str,
+    on_preprocessed: Optional[Callable[[PreprocessedImage], None]] = None,
+    on_stage: Optional[Callable[[str, dict], None]] = None
+) -> dict:
+    """
+    Analyze a dish photo.
+
+    Returns either {"message": "Not food", "description": ...} or {"analysis": {...}}.
+    Results are cached by image content and location, so repeated uploads of the
+    same photo skip the LLM entirely, and concurrent identical requests share one
+    pipeline run. Only the run that calls the model downscales and re-encodes the
+    upload; it hands that image to `on_preprocessed`, so cache hits and requests
+    that joined another run never decode the upload. That run also passes each
+    finished pipeline stage to `on_stage` (see stream_analysis).
+    """
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        cached = await get_cached_analysis(image_data, location)
+        if cached is not None:
+            outcome = "cached"
+            return cached
+
+        async def compute() -> dict:
+            prepared = await preprocess_image(image_data, mime_type)
+            if on_preprocessed is not None:
+                on_preprocessed(prepared)
+            result = await _analyze_uncached(prepared.data, prepared.mime_type, location, user_id, on_stage)
+            await cache_analysis(image_data, location, result)
+            return result
+
+        # A double-submit or client retry waits for the analysis already running
+        result = await coalesce(analysis_key(image_data, location), compute)
+        outcome = "food" if "analysis" in result else "not_food"
+        return result
+    finally:
+        ANALYSIS_DURATION.labels(outcome=outcome).observe(time.perf_counter() - started)
+
+
+async def analyze_batch(
+    images: List[Tuple[bytes, Optional[str]]],
+    location: Optional[str],
+    user_id: str
+) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+    Analyze several (image_data, mime_type) photos concurrently.
+
+    Yields (index, result, error) in completion order; `result` is what
+    analyze_image returns and `error` is set instead when that image failed.
+    Closing the generator early cancels the analyses still running.
+    """
+    async def analyze_one(index: int, image_data: bytes, mime_type: Optional[str]):
+        async with batch_semaphore:
+            try:
+                return index, await analyze_image(image_data, mime_type, location, user_id), None
+            except Exception as e:
+                print(f"❌ Batch image {index} failed: {e}")
+                return index, None, str(e)
+
+    tasks = [
+        asyncio.create_task(analyze_one(index, image_data, mime_type))
+        for index, (image_data, mime_type) in enumerate(images)
+    ]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _stage_outputs_of(analysis: dict):
+    """Split a merged analysis back into the per-stage payloads stream_analysis emits"""
+    for key in ("recipe", "calories"):
+        if key in analysis:
+            yield key, analysis[key]
+    yield "health_categories", {
+        "health_categories": analysis.get("health_categories", []),
+        "is_vegan": analysis.get("is_vegan", False),
+        "is_halal": analysis.get("is_halal", False),
+    }
+    if "delivery" in analysis:
+        yield "delivery", analysis["delivery"]
+
+
+async def stream_analysis(
+    image_data: bytes,
+    mime_type: Optional[str],
+    location: Optional[str],
+    user_id: str,
+    on_preprocessed: Optional[Callable[[PreprocessedImage], None]] = None
+) -> AsyncIterator[Tuple[str, dict]]:
+    """
+    Analyze a dish photo, yielding (event_name, payload) as results become available.
+
+    Emits one event per finished stage (recipe, calories, health_categories,
+    delivery), then "result" with the same body analyze_image returns, or a
+    single "not_food" event. The analysis itself is analyze_image, so streams
+    share its cache, single-flight, speculative mode and latency metric. A
+    request that hits the cache or joins another run gets all stage events at
+    once when the result arrives. Closing the generator early cancels the run.
+    """
+    stages: asyncio.Queue = asyncio.Queue()
+    run = asyncio.create_task(analyze_image(
+        image_data, mime_type, location, user_id,
+        on_preprocessed=on_preprocessed,
+        on_stage=lambda key, value: stages.put_nowait((key, value))
+    ))
+    streamed = False
+    next_stage = None
+    try:
+        while True:
+            next_stage = asyncio.ensure_future(stages.get())
+            await asyncio.wait({next_stage, run}, return_when=asyncio.FIRST_COMPLETED)
+            if not next_stage.done():
+                next_stage.cancel()
+                break
+            streamed = True
+            yield next_stage.result()
+        while not stages.empty():
+            streamed = True
+            yield stages.get_nowait()
+        result = run.result()
+    finally:
+        if next_stage is not None:
+            next_stage.cancel()
+        if not run.done():
+            run.cancel()
+            await asyncio.gather(run, return_exceptions=True)
+
+    if "analysis" not in result:
+        yield "not_food", result
+        return
+    if not streamed:
+        for key, value in _stage_outputs_of(result["analysis"]):
+            yield key, value
+    yield "result", result
@@ -0,0 +1,94 @@
+from typing import Any, AsyncGenerator, Mapping, Optional, Type, TypeVar
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+from google.genai import types
+from pydantic import BaseModel, ValidationError
+
+from src.recipes.parsing import parse_agent_json
+from src.recipes.schemas import (
+    RecipeStageOutput,
+    CaloriesStageOutput,
+    HealthStageOutput,
+    DeliveryLink,
+    DishAnalysis,
+)
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+def _stage_value(state: Mapping[str, Any], key: str) -> Any:
+    """Stage output from session state, JSON-decoded if the agent stored text"""
+    value = state.get(key)
+    if isinstance(value, str):
+        try:
+            return parse_agent_json(value)
+        except ValueError:
+            print(f"Malformed JSON in stage '{key}': {value[:200]!r}")
+            return None
+    return value
+
+
+def _optional_stage(model: Type[ModelT], value: Any) -> Optional[ModelT]:
+    if not isinstance(value, dict):
+        return None
+    try:
+        return model.model_validate(value)
+    except ValidationError as e:
+        print(f"Invalid {model.__name__}: {e}")
+        return None
+
+
+def assemble_analysis(state: Mapping[str, Any]) -> DishAnalysis:
+    """
+    Merge the recipe, calories, health_categories and delivery stage outputs.
+
+    The recipe is required (ValidationError/ValueError if it is missing or
+    malformed); the other stages fall back to empty values so one bad stage
+    doesn't fail the whole analysis.
+    """
+    recipe_value = _stage_value(state, "recipe")
+    if not isinstance(recipe_value, dict):
+        raise ValueError("Recipe stage produced no usable output")
+    recipe = RecipeStageOutput.model_validate(recipe_value)
+
+    calories = _optional_stage(CaloriesStageOutput, _stage_value(state, "calories")) or CaloriesStageOutput()
+    if not calories.dish_name:
+        calories.dish_name = recipe.dish_name
+
+    health = _optional_stage(HealthStageOutput, _stage_value(state, "health_categories")) or HealthStageOutput()
+
+    delivery_value = _stage_value(state, "delivery")
+    delivery = [
+        link for link in (
+            _optional_stage(DeliveryLink, item)
+            for item in (delivery_value if isinstance(delivery_value, list) else [])
+        )
+        if link is not None
+    ]
+
+    return DishAnalysis(
+        recipe=recipe,
+        calories=calories,
+        health_categories=health.health_categories,
+        is_vegan=health.is_vegan,
+        is_halal=health.is_halal,
+        delivery=delivery,
+    )
+
+
+class AnalysisAssemblerAgent(BaseAgent):
+    """Final pipeline stage: validates and merges stage outputs in-process instead of asking the model"""
+
+    output_key: str = "final_output"
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        output = assemble_analysis(ctx.session.state).model_dump_json()
+        yield Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            content=types.Content(role="model", parts=[types.Part(text=output)]),
+            actions=EventActions(state_delta={self.output_key: output}),
+        )
@@ -0,0 +1,210 @@
+import json
+import re
+from typing import AsyncGenerator, Dict, List, Optional
+from urllib.parse import quote_plus
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+from google.genai import types
+
+from src.recipes.parsing import parse_agent_json
+
+GOOGLE_SEARCH_URL = "https://www.google.com/search?q="
+LOCATION_PREFIX = "User location:"
+
+# Lower-cased location fragments (countries and major cities) that get Russian search terms
+RUSSIAN_LOCATIONS = (
+    "kazakhstan", "казахстан", "қазақстан",
+    "russia", "россия", "russian federation",
+    "belarus", "беларусь", "белоруссия",
+    "almaty", "алматы", "astana", "астана", "shymkent", "шымкент", "karaganda", "караганда",
+    "moscow", "москва", "saint petersburg", "st. petersburg", "санкт-петербург",
+    "novosibirsk", "новосибирск", "yekaterinburg", "екатеринбург", "kazan", "казань",
+    "minsk", "минск", "gomel", "гомель", "brest", "брест",
+)
+# Whole words or phrases only, so "Prussia Cove" doesn't match "russia"
+_RUSSIAN_LOCATION = re.compile(
+    r"(?<!\w)(?:" + "|".join(re.escape(name) for name in sorted(RUSSIAN_LOCATIONS, key=len, reverse=True)) + r")(?!\w)"
+)
+# Placeholders the frontend sends when reverse geocoding has no answer
+_UNKNOWN_LOCATION_PARTS = {"unknown city", "unknown country"}
+
+DELIVERY_TERMS = {
+    "ru": "доставка",
+    "en": "delivery",
+}
+
+# English ingredient -> Russian search term; longer keys are matched first
+RUSSIAN_INGREDIENTS = {
+    "all-purpose flour": "мука пшеничная",
+    "bread flour": "мука хлебопекарная",
+    "flour": "мука",
+    "sugar": "сахар",
+    "brown sugar": "коричневый сахар",
+    "salt": "соль",
+    "black pepper": "черный перец",
+    "olive oil": "оливковое масло",
+    "vegetable oil": "растительное масло",
+    "sunflower oil": "подсолнечное масло",
+    "butter": "сливочное масло",
+    "milk": "молоко",
+    "cream": "сливки",
+    "sour cream": "сметана",
+    "cheese": "сыр",
+    "mozzarella": "моцарелла сыр",
+    "parmesan": "пармезан сыр",
+    "egg": "яйца",
+    "eggs": "яйца",
+    "cherry tomatoes": "помидоры черри",
+    "tomato": "помидоры",
+    "tomatoes": "помидоры",
+    "tomato paste": "томатная паста",
+    "onion": "лук",
+    "onions": "лук",
+    "garlic": "чеснок",
+    "potato": "картофель",
+    "potatoes": "картофель",
+    "carrot": "морковь",
+    "carrots": "морковь",
+    "cucumber": "огурцы",
+    "bell pepper": "болгарский перец",
+    "cabbage": "капуста",
+    "mushrooms": "грибы",
+    "lemon": "лимон",
+    "rice": "рис",
+    "pasta": "макароны",
+    "spaghetti": "спагетти",
+    "beef": "говядина",
+    "ground beef": "говяжий фарш",
+    "pork": "свинина",
+    "lamb": "баранина",
+    "chicken": "курица",
+    "chicken breast": "куриная грудка",
+    "fish": "рыба",
+    "salmon": "лосось",
+    "shrimp": "креветки",
+    "yeast": "дрожжи",
+    "baking powder": "разрыхлитель",
+    "honey": "мед",
+    "chocolate": "шоколад",
+    "cocoa powder": "какао порошок",
+    "vanilla extract": "ванильный экстракт",
+    "basil": "базилик",
+    "parsley": "петрушка",
+    "dill": "укроп",
+    "cinnamon": "корица",
+    "soy sauce": "соевый соус",
+    "mayonnaise": "майонез",
+    "walnuts": "грецкие орехи",
+    "almonds": "миндаль",
+}
+_RUSSIAN_KEYS = sorted(RUSSIAN_INGREDIENTS, key=len, reverse=True)
+
+# Not worth a delivery link
+SKIPPED_INGREDIENTS = {"water", "ice", "hot water", "cold water", "warm water", "ice cubes"}
+
+_QUANTITY = r"(?:\d+(?:[.,/]\d+)?|[½⅓⅔¼¾⅛])(?:\s*-\s*\d+(?:[.,/]\d+)?)?"
+_UNITS = (
+    r"(?:kg|g|gr|grams?|mg|ml|l|liters?|litres?|cups?|tbsp|tsp|tablespoons?|teaspoons?|"
+    r"oz|ounces?|lbs?|pounds?|pinch(?:es)?|cloves?|pieces?|slices?|cans?|bunch(?:es)?|"
+    r"handfuls?|sprigs?|sticks?|packs?|packages?)\.?"
+)
+_LEADING_AMOUNT = re.compile(rf"^\s*(?:{_QUANTITY}\s*)+(?:{_UNITS}\s+)?(?:of\s+)?", re.IGNORECASE)
+_LEADING_UNIT = re.compile(rf"^\s*{_UNITS}\s+(?:of\s+)?", re.IGNORECASE)
+_SIZE_WORDS = re.compile(r"^\s*(?:large|medium|small|big|whole|fresh)\s+", re.IGNORECASE)
+
+
+def detect_language(location: str) -> str:
+    """
+    Russian terms for Kazakhstan, Russia and Belarus, English everywhere else.
+
+    Locations come as "City, Country"; when a country is given it alone decides,
+    so "Brest, France" stays English. A bare name is matched against the cities too.
+    """
+    parts = [
+        part.strip() for part in location.lower().split(",")
+        if part.strip() and part.strip() not in _UNKNOWN_LOCATION_PARTS
+    ]
+    if not parts:
+        return "en"
+    return "ru" if _RUSSIAN_LOCATION.search(parts[-1]) else "en"
+
+
+def ingredient_product_name(ingredient: str) -> str:
+    """'200 g bread flour, sifted' -> 'bread flour'"""
+    name = re.sub(r"\([^)]*\)", " ", ingredient)
+    name = name.split(",")[0]
+    name = _LEADING_AMOUNT.sub("", name)
+    name = _LEADING_UNIT.sub("", name)
+    name = _SIZE_WORDS.sub("", name)
+    name = re.sub(r"\b(?:to taste|optional|for serving|for garnish)\b", " ", name, flags=re.IGNORECASE)
+    return " ".join(name.split()).strip(" .-").lower()
+
+
+def _search_term(product: str, language: str) -> str:
+    if language != "ru":
+        return product
+    for key in _RUSSIAN_KEYS:
+        if re.search(rf"\b{re.escape(key)}\b", product):
+            return RUSSIAN_INGREDIENTS[key]
+    return product
+
+
+def build_delivery_links(ingredients: List[str], location: Optional[str]) -> List[Dict[str, str]]:
+    """Google search links for ordering each ingredient near `location`"""
+    if not location or not location.strip():
+        return []
+
+    location = location.strip()
+    language = detect_language(location)
+    links = []
+    seen = set()
+    for ingredient in ingredients:
+        product = ingredient_product_name(ingredient)
+        if not product or product in SKIPPED_INGREDIENTS or product in seen:
+            continue
+        seen.add(product)
+
+        query = f"{DELIVERY_TERMS[language]} {_search_term(product, language)} {location}"
+        links.append({
+            "product": product,
+            "link": GOOGLE_SEARCH_URL + quote_plus(query),
+        })
+    return links
+
+
+def location_from_content(content: Optional[types.Content]) -> Optional[str]:
+    """Pull the location out of the 'User location: ...' part of the upload message"""
+    if not content or not content.parts:
+        return None
+    for part in content.parts:
+        if part.text and part.text.startswith(LOCATION_PREFIX):
+            return part.text[len(LOCATION_PREFIX):].strip() or None
+    return None
+
+
+class DeliveryLinksAgent(BaseAgent):
+    """Drop-in replacement for the LLM delivery stage: templated search links, no model call"""
+
+    output_key: str = "delivery"
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        try:
+            recipe = parse_agent_json(ctx.session.state.get("recipe"))
+            ingredients = recipe.get("ingredients", []) if isinstance(recipe, dict) else []
+        except ValueError:
+            ingredients = []
+
+        links = build_delivery_links(ingredients, location_from_content(ctx.user_content))
+        output = json.dumps(links, ensure_ascii=False)
+
+        # Text content keeps the links visible to later LLM stages, the state
+        # delta makes them available under output_key like any LlmAgent.
+        yield Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            content=types.Content(role="model", parts=[types.Part(text=output)]),
+            actions=EventActions(state_delta={self.output_key: output}),
+        )
@@ -0,0 +1,103 @@
+from typing import Iterable, List
+
+from sqlalchemy import Boolean, event, inspect
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ColumnElement, FunctionElement, bindparam
+
+from src.recipes.models import Recipe
+from src.recipes.schemas import CategoryMatch, RecipeFilter
+
+# Recipe.filter_tags holds the recipe's health category names plus these
+VEGAN_TAG = "vegan"
+HALAL_TAG = "halal"
+
+# text[] on Postgres, a JSON array elsewhere
+TAGS_TYPE = Recipe.__table__.c.filter_tags.type
+
+
+def filter_tags(category_names: Iterable[str], is_vegan: bool, is_halal: bool) -> List[str]:
+    tags = sorted(set(category_names))
+    if is_vegan:
+        tags.append(VEGAN_TAG)
+    if is_halal:
+        tags.append(HALAL_TAG)
+    return tags
+
+
+class tags_contain_all(FunctionElement):
+    """filter_tags has every one of the given tags"""
+    type = Boolean()
+    inherit_cache = True
+
+
+class tags_contain_any(FunctionElement):
+    """filter_tags has at least one of the given tags"""
+    type = Boolean()
+    inherit_cache = True
+
+
+# On Postgres both are GIN-indexable array operators on the same index, so
+# any AND/OR mix of them is answered by one scan of ix_recipes_filter_tags
+@compiles(tags_contain_all, "postgresql")
+def _contain_all_pg(element, compiler, **kw):
+    column, tags = element.clauses
+    return f"{compiler.process(column, **kw)} @> {compiler.process(tags, **kw)}"
+
+
+@compiles(tags_contain_any, "postgresql")
+def _contain_any_pg(element, compiler, **kw):
+    column, tags = element.clauses
+    return f"{compiler.process(column, **kw)} && {compiler.process(tags, **kw)}"
+
+
+# Elsewhere (the SQLite test databases) the tags are a JSON array
+@compiles(tags_contain_all)
+def _contain_all_json(element, compiler, **kw):
+    column, tags = element.clauses
+    return (
+        f"NOT EXISTS (SELECT 1 FROM json_each({compiler.process(tags, **kw)}) "
+        f"WHERE value NOT IN (SELECT value FROM json_each({compiler.process(column, **kw)})))"
+    )
+
+
+@compiles(tags_contain_any)
+def _contain_any_json(element, compiler, **kw):
+    column, tags = element.clauses
+    return (
+        f"EXISTS (SELECT 1 FROM json_each({compiler.process(tags, **kw)}) "
+        f"WHERE value IN (SELECT value FROM json_each({compiler.process(column, **kw)})))"
+    )
+
+
+def filter_conditions(recipe_filter: RecipeFilter) -> List[ColumnElement]:
+    """WHERE clauses on Recipe for the filter; empty when it filters nothing"""
+    required = []
+    conditions = []
+    if recipe_filter.categories:
+        if recipe_filter.category_match == CategoryMatch.ANY and len(recipe_filter.categories) > 1:
+            conditions.append(tags_contain_any(Recipe.filter_tags, bindparam(None, recipe_filter.categories, type_=TAGS_TYPE)))
+        else:
+            required += recipe_filter.categories
+    if recipe_filter.vegan:
+        required.append(VEGAN_TAG)
+    if recipe_filter.halal:
+        required.append(HALAL_TAG)
+    if required:
+        conditions.append(tags_contain_all(Recipe.filter_tags, bindparam(None, required, type_=TAGS_TYPE)))
+    return conditions
+
+
+def _tag_inputs_changed(recipe: Recipe) -> bool:
+    attrs = inspect(recipe).attrs
+    return any(attrs[name].history.has_changes() for name in ("categories", "is_vegan", "is_halal"))
+
+
+@event.listens_for(Recipe, "before_insert")
+def _tags_on_insert(mapper, connection, recipe):
+    recipe.filter_tags = filter_tags((c.name for c in recipe.categories), recipe.is_vegan, recipe.is_halal)
+
+
+@event.listens_for(Recipe, "before_update")
+def _tags_on_update(mapper, connection, recipe):
+    if _tag_inputs_changed(recipe):
+        recipe.filter_tags = filter_tags((c.name for c in recipe.categories), recipe.is_vegan, recipe.is_halal)
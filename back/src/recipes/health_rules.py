@@ -0,0 +1,162 @@
+import re
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Set
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+from pydantic import ValidationError
+
+from src.recipes.parsing import parse_agent_json
+from src.recipes.schemas import RecipeStageOutput, HealthStageOutput
+
+# Labels that depend on nutrient amounts per 100 g; everything else is decided here
+THRESHOLD_CATEGORIES = ["High in Fiber", "High Sodium", "High Sugar", "High Saturated Fat", "High Protein"]
+
+NUT = "nut"
+RED_MEAT = "red_meat"
+PORK = "pork"
+MEAT = "meat"
+FISH = "fish"
+DAIRY = "dairy"
+EGG = "egg"
+HONEY = "honey"
+GELATIN = "gelatin"
+ALCOHOL = "alcohol"
+SPICY = "spicy"
+
+
+def _terms(flags: Set[str], *terms: str) -> Dict[str, FrozenSet[str]]:
+    return {term: frozenset(flags) for term in terms}
+
+
+# Ingredient term -> what it implies. Longer terms win over the words inside
+# them, so "peanut butter" is a nut and not dairy, "wine vinegar" is not alcohol.
+LEXICON: Dict[str, FrozenSet[str]] = {
+    **_terms({NUT},
+             "almond", "walnut", "peanut", "hazelnut", "cashew", "pecan", "pistachio", "macadamia",
+             "pine nut", "brazil nut", "nut", "mixed nuts", "praline", "marzipan", "nutella",
+             "peanut butter", "almond butter", "almond milk", "almond flour", "cashew milk",
+             "cashew butter", "cashew cream", "almond yogurt"),
+    **_terms({PORK, RED_MEAT, MEAT},
+             "pork", "bacon", "ham", "prosciutto", "pancetta", "guanciale", "lard", "salami",
+             "pepperoni", "chorizo", "pork belly", "spare ribs"),
+    **_terms({RED_MEAT, MEAT},
+             "beef", "lamb", "mutton", "veal", "venison", "goat", "steak", "ground beef",
+             "minced meat", "ground meat", "brisket", "oxtail"),
+    **_terms({MEAT},
+             "chicken", "turkey", "duck", "goose", "quail", "rabbit", "sausage", "meat", "meatball",
+             "liver", "bone broth"),
+    **_terms({FISH},
+             "fish", "salmon", "tuna", "cod", "trout", "tilapia", "mackerel", "sardine", "anchovy",
+             "anchovies", "herring", "shrimp", "prawn", "crab", "lobster", "mussel", "clam", "oyster",
+             "squid", "octopus", "scallop", "caviar", "roe", "fish sauce", "oyster sauce"),
+    **_terms({DAIRY},
+             "milk", "cheese", "butter", "cream", "yogurt", "yoghurt", "kefir", "ghee", "whey",
+             "casein", "sour cream", "buttermilk", "custard", "ice cream", "condensed milk",
+             "parmesan", "mozzarella", "cheddar", "feta", "ricotta", "mascarpone", "brie", "gouda",
+             "camembert", "halloumi", "paneer", "cottage cheese", "cream cheese", "creme fraiche",
+             "crème fraîche", "heavy cream", "whipped cream",
+             # Milk of animals listed as meat above
+             "goat cheese", "goat's cheese", "goats cheese", "goat milk", "goat's milk", "goats milk",
+             "goat yogurt", "sheep cheese", "sheep's cheese", "sheep milk", "sheep's milk"),
+    **_terms({EGG}, "egg", "egg yolk", "egg white", "mayonnaise", "mayo", "meringue", "aioli",
+             "duck egg", "quail egg", "goose egg"),
+    **_terms({HONEY}, "honey"),
+    **_terms({GELATIN}, "gelatin", "gelatine"),
+    **_terms({ALCOHOL},
+             "wine", "red wine", "white wine", "beer", "rum", "vodka", "brandy", "cognac", "whiskey",
+             "whisky", "bourbon", "tequila", "gin", "sake", "mirin", "liqueur", "sherry", "champagne",
+             "prosecco", "marsala", "kahlua", "amaretto", "cider"),
+    **_terms({SPICY},
+             "chili", "chilli", "chile", "chili pepper", "chili flakes", "red pepper flakes",
+             "jalapeno", "jalapeño", "habanero", "cayenne", "sriracha", "hot sauce", "tabasco",
+             "wasabi", "horseradish", "harissa", "gochujang", "chipotle", "hot pepper", "sambal"),
+    # Look like the terms above but imply nothing
+    **_terms(set(),
+             "coconut milk", "coconut cream", "oat milk", "soy milk", "rice milk", "cocoa butter",
+             "shea butter", "cream of tartar", "wine vinegar", "red wine vinegar", "white wine vinegar",
+             "rice vinegar", "apple cider vinegar", "cider vinegar", "sweet chili sauce",
+             "vegan cheese", "vegan butter", "vegan mayonnaise", "plant milk", "nutmeg",
+             "butternut squash", "agar", "halal gelatin", "eggplant", "bell pepper",
+             # Plants and sauces named after animal products
+             "butter bean", "butter lettuce", "butterhead lettuce", "apple butter",
+             "coconut butter", "coconut yogurt", "soy yogurt", "oat cream", "soy cream",
+             "duck sauce", "oyster mushroom", "beefsteak tomato", "chicken of the woods",
+             "hen of the woods", "lamb's lettuce", "lambs lettuce", "crab apple"),
+}
+
+_ENTRIES = sorted(LEXICON, key=len, reverse=True)
+_FLAGS = [LEXICON[term] for term in _ENTRIES]
+# One alternation with a group per term: a single left-to-right pass over the
+# ingredient text, where m.lastindex says which term matched
+_MATCHER = re.compile(
+    "|".join(r"\b(" + r"\s+".join(map(re.escape, term.split())) + r"(?:s|es)?)\b" for term in _ENTRIES),
+    re.IGNORECASE,
+)
+
+
+class HealthRuleResult(NamedTuple):
+    health_categories: List[str]
+    is_vegan: bool
+    is_halal: bool
+
+
+def ingredient_flags(ingredients: Iterable[str]) -> Set[str]:
+    flags: Set[str] = set()
+    for ingredient in ingredients:
+        for match in _MATCHER.finditer(ingredient):
+            flags |= _FLAGS[match.lastindex - 1]
+    return flags
+
+
+def evaluate(ingredients: Iterable[str]) -> HealthRuleResult:
+    """Ingredient-determined health labels plus vegan/halal"""
+    flags = ingredient_flags(ingredients)
+    is_vegan = not flags & {MEAT, FISH, DAIRY, EGG, HONEY, GELATIN}
+    is_halal = not flags & {PORK, ALCOHOL, GELATIN}
+
+    categories = []
+    if SPICY in flags:
+        categories.append("Spicy/Irritant")
+    if RED_MEAT in flags:
+        categories.append("Red Meat-Based")
+    if is_vegan:
+        categories.append("Plant-Based")
+    if DAIRY not in flags:
+        categories.append("Dairy-Free")
+    if NUT in flags:
+        categories.append("Contains Nuts")
+    return HealthRuleResult(categories, is_vegan, is_halal)
+
+
+def apply_health_rules(callback_context: CallbackContext, llm_response: LlmResponse) -> LlmResponse | None:
+    """
+    after_model_callback for health_categories_agent.
+
+    Keeps only the threshold labels from the model and adds the rule-based
+    labels and vegan/halal flags, so those are the same for the same ingredients every time.
+    """
+    try:
+        recipe = RecipeStageOutput.model_validate(parse_agent_json(callback_context.state.get("recipe")))
+    except (ValueError, ValidationError):
+        return None
+
+    model_labels: List[str] = []
+    if llm_response.content and llm_response.content.parts:
+        try:
+            model_labels = HealthStageOutput.model_validate(
+                parse_agent_json(llm_response.content.parts[0].text)
+            ).health_categories
+        except (ValueError, ValidationError):
+            pass
+
+    rules = evaluate(recipe.ingredients)
+    health = HealthStageOutput(
+        health_categories=[label for label in model_labels if label in THRESHOLD_CATEGORIES] + rules.health_categories,
+        is_vegan=rules.is_vegan,
+        is_halal=rules.is_halal,
+    )
+    return LlmResponse(
+        content=types.Content(role="model", parts=[types.Part(text=health.model_dump_json())]),
+        usage_metadata=llm_response.usage_metadata,
+    )
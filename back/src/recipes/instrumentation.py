@@ -0,0 +1,195 @@
+import io
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from PIL import Image
+
+from src.services.metrics import AGENT_DURATION, AGENT_LLM_CALLS, AGENT_TOKENS
+
+# Rough Gemini prompt sizes, for calls that never report usage: about four
+# characters per text token, and 258 tokens per 768 px tile of an image (one
+# tile when both sides are at most 384 px)
+CHARS_PER_TOKEN = 4
+IMAGE_TILE_TOKENS = 258
+IMAGE_TILE_EDGE = 768
+IMAGE_SMALL_EDGE = 384
+
+
+class PipelineTrace:
+    """Per-run record of agent stage timings and LLM usage"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.origin = time.perf_counter()
+        # agent_name -> {"start": float, "end": float}
+        self.stages: Dict[str, Dict[str, float]] = {}
+        # agent_name -> {"calls": int, "prompt_tokens": int, "response_tokens": int}
+        self.llm_usage: Dict[str, Dict[str, int]] = {}
+        # agent_name -> estimated prompt tokens of each call still waiting for a response
+        self.pending_prompt_tokens: Dict[str, List[int]] = {}
+        # Set when the caller abandons the run; stages that have not called the model yet skip it
+        self.cancelled = False
+
+    def stage_timings(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """Stage start/end/duration in seconds relative to the start of the run"""
+        timings = {}
+        for agent_name, stage in sorted(self.stages.items(), key=lambda item: item[1]["start"]):
+            end = stage.get("end")
+            timings[agent_name] = {
+                "start": round(stage["start"] - self.origin, 3),
+                "end": round(end - self.origin, 3) if end is not None else None,
+                "duration": round(end - stage["start"], 3) if end is not None else None,
+            }
+        return timings
+
+    def total_llm_usage(self) -> Dict[str, int]:
+        totals = {"calls": 0, "prompt_tokens": 0, "response_tokens": 0}
+        for agent_usage in self.llm_usage.values():
+            for field in totals:
+                totals[field] += agent_usage[field]
+        return totals
+
+    def unanswered_prompt_tokens(self) -> int:
+        """Estimated prompt tokens of calls that got no response, e.g. cut off by a cancellation"""
+        return sum(sum(pending) for pending in self.pending_prompt_tokens.values())
+
+    def log(self) -> None:
+        """Print per-stage timings so the critical path of the pipeline is visible"""
+        timings = self.stage_timings()
+        if not timings:
+            return
+        parts = [
+            f"{name} {t['start']:.2f}s→{t['end']:.2f}s ({t['duration']:.2f}s)"
+            if t["end"] is not None else f"{name} {t['start']:.2f}s→?"
+            for name, t in timings.items()
+        ]
+        print(f"⏱ {self.name} stages: " + ", ".join(parts))
+
+    def export(self) -> None:
+        """Add this run's stage durations and LLM usage to the Prometheus metrics"""
+        now = time.perf_counter()
+        for agent_name, stage in self.stages.items():
+            if "end" in stage:
+                outcome = "ok"
+            else:
+                outcome = "cancelled" if self.cancelled else "error"
+            AGENT_DURATION.labels(agent=agent_name, outcome=outcome).observe(stage.get("end", now) - stage["start"])
+
+        for agent_name, usage in self.llm_usage.items():
+            AGENT_LLM_CALLS.labels(agent=agent_name).inc(usage["calls"])
+            AGENT_TOKENS.labels(agent=agent_name, kind="prompt").inc(usage["prompt_tokens"])
+            AGENT_TOKENS.labels(agent=agent_name, kind="response").inc(usage["response_tokens"])
+
+    def finish(self) -> None:
+        self.log()
+        self.export()
+
+
+# Agent callbacks run inside the task (or child tasks) of the run that set this,
+# so concurrent runs each see their own trace.
+_current_trace: ContextVar[Optional[PipelineTrace]] = ContextVar("pipeline_trace", default=None)
+
+
+def current_trace() -> Optional[PipelineTrace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def pipeline_trace(trace: PipelineTrace) -> Iterator[PipelineTrace]:
+    """Make `trace` the target of the agent callbacks for the enclosed run"""
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        try:
+            _current_trace.reset(token)
+        except ValueError:
+            # Async generators can be finalized from another context
+            pass
+
+
+def record_stage_start(callback_context: CallbackContext) -> None:
+    """before_agent_callback: remember when an agent stage started"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.stages[callback_context.agent_name] = {"start": time.perf_counter()}
+    return None
+
+
+def record_stage_end(callback_context: CallbackContext) -> None:
+    """after_agent_callback: remember when an agent stage finished"""
+    trace = _current_trace.get()
+    stage = trace.stages.get(callback_context.agent_name) if trace is not None else None
+    if stage is not None:
+        stage["end"] = time.perf_counter()
+    return None
+
+
+def _image_tokens(image_data: bytes) -> int:
+    try:
+        # Only the header is read
+        with Image.open(io.BytesIO(image_data)) as img:
+            width, height = img.size
+    except Exception:
+        return IMAGE_TILE_TOKENS
+    if max(width, height) <= IMAGE_SMALL_EDGE:
+        return IMAGE_TILE_TOKENS
+    return math.ceil(width / IMAGE_TILE_EDGE) * math.ceil(height / IMAGE_TILE_EDGE) * IMAGE_TILE_TOKENS
+
+
+def estimate_prompt_tokens(llm_request: LlmRequest) -> int:
+    """Approximate prompt size of a request, before the model reports the real one"""
+    chars = 0
+    tokens = 0
+    system = llm_request.config.system_instruction if llm_request.config else None
+    contents = list(llm_request.contents or [])
+    if isinstance(system, str):
+        chars += len(system)
+    elif system is not None and hasattr(system, "parts"):
+        contents.append(system)
+    for content in contents:
+        for part in content.parts or []:
+            if part.text:
+                chars += len(part.text)
+            if part.inline_data and part.inline_data.data:
+                tokens += _image_tokens(part.inline_data.data)
+    return tokens + chars // CHARS_PER_TOKEN
+
+
+def record_model_call(callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+    """before_model_callback: count every LLM request an agent issues"""
+    trace = _current_trace.get()
+    if trace is not None and trace.cancelled:
+        # Returning a response skips the model call entirely
+        return LlmResponse(error_code="CANCELLED", error_message="Pipeline run was cancelled")
+    if trace is not None:
+        usage = trace.llm_usage.setdefault(
+            callback_context.agent_name,
+            {"calls": 0, "prompt_tokens": 0, "response_tokens": 0}
+        )
+        usage["calls"] += 1
+        # Replaced by the reported usage when the response arrives
+        trace.pending_prompt_tokens.setdefault(callback_context.agent_name, []).append(
+            estimate_prompt_tokens(llm_request)
+        )
+    return None
+
+
+def record_model_usage(callback_context: CallbackContext, llm_response: LlmResponse) -> None:
+    """after_model_callback: add the token counts reported by the model"""
+    trace = _current_trace.get()
+    usage = trace.llm_usage.get(callback_context.agent_name) if trace is not None else None
+    pending = trace.pending_prompt_tokens.get(callback_context.agent_name) if trace is not None else None
+    if pending:
+        pending.pop(0)
+    metadata = llm_response.usage_metadata
+    if usage is not None and metadata is not None:
+        usage["prompt_tokens"] += metadata.prompt_token_count or 0
+        usage["response_tokens"] += metadata.candidates_token_count or 0
+    return None
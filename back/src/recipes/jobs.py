@@ -0,0 +1,273 @@
+import asyncio
+import base64
+import json
+import time
+import uuid
+from typing import List, Optional
+
+from redis.exceptions import WatchError
+
+from src.config import (
+    ANALYSIS_JOB_WORKERS,
+    ANALYSIS_JOB_TTL_SECONDS,
+    ANALYSIS_JOB_MAX_PENDING_PER_USER,
+    ANALYSIS_JOB_VISIBILITY_TIMEOUT_SECONDS,
+    ANALYSIS_JOB_MAX_ATTEMPTS,
+)
+from src.recipes.analysis import analyze_image
+from src.recipes.schemas import JobStatus
+from src.services.redis import redis_client
+from src.services.session_store import SessionStoreFull
+
+JOB_PREFIX = "analysis:job:"
+USER_QUEUE_PREFIX = "analysis:jobs:user:"
+# Round-robin ring of users that have queued jobs; a worker serves one job
+# per turn and sends the user to the back, so one user's burst can't starve others.
+# A user is in the ring exactly when their queue is non-empty: every change to
+# a queue updates the ring in the same WATCHed transaction.
+READY_USERS_KEY = "analysis:jobs:ready_users"
+# Jobs taken by a worker, scored by the time after which they count as abandoned
+# (the worker was killed) and are put back in their user's queue
+PROCESSING_KEY = "analysis:jobs:processing"
+STATS_KEY = "analysis:jobs:stats"
+
+
+class QueueFullError(Exception):
+    """The user already has the maximum number of pending jobs"""
+
+
+def _job_key(job_id: str) -> str:
+    return f"{JOB_PREFIX}{job_id}"
+
+
+def _user_queue_key(user_id: str) -> str:
+    return f"{USER_QUEUE_PREFIX}{user_id}"
+
+
+async def enqueue_job(
+    user_id: str,
+    image_data: bytes,
+    mime_type: Optional[str],
+    filename: Optional[str],
+    location: Optional[str]
+) -> str:
+    """Queue a dish analysis and return its job id"""
+    job_id = uuid.uuid4().hex
+    job_key = _job_key(job_id)
+    user_queue = _user_queue_key(user_id)
+    async with redis_client.pipeline(transaction=True) as pipe:
+        while True:
+            try:
+                # The cap check and the push are one transaction
+                await pipe.watch(user_queue)
+                depth = await pipe.llen(user_queue)
+                if depth >= ANALYSIS_JOB_MAX_PENDING_PER_USER:
+                    await pipe.unwatch()
+                    raise QueueFullError(f"At most {ANALYSIS_JOB_MAX_PENDING_PER_USER} pending analyses per user")
+
+                pipe.multi()
+                pipe.hset(job_key, mapping={
+                    "status": JobStatus.QUEUED.value,
+                    "user_id": user_id,
+                    "filename": filename or "",
+                    "mime_type": mime_type or "",
+                    "location": location or "",
+                    # The shared client decodes responses, so the bytes travel as base64
+                    "image": base64.b64encode(image_data).decode(),
+                    "created_at": time.time(),
+                })
+                pipe.expire(job_key, ANALYSIS_JOB_TTL_SECONDS)
+                pipe.rpush(user_queue, job_id)
+                if depth == 0:
+                    pipe.rpush(READY_USERS_KEY, user_id)
+                pipe.hincrby(STATS_KEY, "enqueued", 1)
+                await pipe.execute()
+                return job_id
+            except WatchError:
+                continue
+
+
+async def get_job(job_id: str) -> Optional[dict]:
+    """Job status without the image payload, or None if unknown/expired"""
+    job = await redis_client.hgetall(_job_key(job_id))
+    if not job:
+        return None
+
+    return {
+        "job_id": job_id,
+        "user_id": job["user_id"],
+        "status": job["status"],
+        "result": json.loads(job["result"]) if job.get("result") else None,
+        "error": job.get("error") or None,
+        "created_at": float(job["created_at"]) if job.get("created_at") else None,
+        "finished_at": float(job["finished_at"]) if job.get("finished_at") else None,
+    }
+
+
+async def next_job(timeout: int = 5) -> Optional[str]:
+    """Take the next job id in round-robin order over users, waiting up to `timeout` seconds"""
+    # Rotating instead of popping keeps the user in the ring if this worker dies
+    user_id = await redis_client.blmove(READY_USERS_KEY, READY_USERS_KEY, timeout, "LEFT", "RIGHT")
+    if user_id is None:
+        return None
+
+    user_queue = _user_queue_key(user_id)
+    async with redis_client.pipeline(transaction=True) as pipe:
+        while True:
+            try:
+                await pipe.watch(user_queue)
+                depth = await pipe.llen(user_queue)
+                job_id = await pipe.lindex(user_queue, 0)
+                pipe.multi()
+                if job_id is not None:
+                    pipe.lpop(user_queue)
+                    pipe.zadd(PROCESSING_KEY, {job_id: time.time() + ANALYSIS_JOB_VISIBILITY_TIMEOUT_SECONDS})
+                if depth <= 1:
+                    pipe.lrem(READY_USERS_KEY, 0, user_id)
+                await pipe.execute()
+                return job_id
+            except WatchError:
+                continue
+
+
+async def _requeue(job_id: str, user_id: str) -> bool:
+    """Put a taken job back at the front of its user's queue; False if no worker holds it"""
+    user_queue = _user_queue_key(user_id)
+    async with redis_client.pipeline(transaction=True) as pipe:
+        while True:
+            try:
+                # Watching PROCESSING_KEY makes sure only one caller puts the job back
+                await pipe.watch(user_queue, PROCESSING_KEY)
+                if await pipe.zscore(PROCESSING_KEY, job_id) is None:
+                    await pipe.unwatch()
+                    return False
+                depth = await pipe.llen(user_queue)
+                pipe.multi()
+                pipe.zrem(PROCESSING_KEY, job_id)
+                pipe.hset(_job_key(job_id), "status", JobStatus.QUEUED.value)
+                pipe.lpush(user_queue, job_id)
+                if depth == 0:
+                    pipe.rpush(READY_USERS_KEY, user_id)
+                await pipe.execute()
+                return True
+            except WatchError:
+                continue
+
+
+async def requeue_expired_jobs() -> int:
+    """Requeue jobs whose worker died mid-run; after ANALYSIS_JOB_MAX_ATTEMPTS they fail instead"""
+    requeued = 0
+    for job_id in await redis_client.zrangebyscore(PROCESSING_KEY, "-inf", time.time()):
+        job_key = _job_key(job_id)
+        user_id = await redis_client.hget(job_key, "user_id")
+        if user_id is None:
+            # Expired while it was held
+            await redis_client.zrem(PROCESSING_KEY, job_id)
+            continue
+        if await redis_client.hincrby(job_key, "attempts", 1) >= ANALYSIS_JOB_MAX_ATTEMPTS:
+            if await redis_client.zrem(PROCESSING_KEY, job_id):
+                await redis_client.hset(job_key, mapping={
+                    "status": JobStatus.FAILED.value,
+                    "error": "Failed to analyze dish: the analysis was interrupted too many times",
+                    "finished_at": time.time(),
+                })
+                await redis_client.hdel(job_key, "image")
+                await redis_client.hincrby(STATS_KEY, "failed", 1)
+            continue
+        if await _requeue(job_id, user_id):
+            print(f"♻️ Analysis job {job_id} requeued after its worker stopped")
+            requeued += 1
+    return requeued
+
+
+async def process_job(job_id: str) -> None:
+    job_key = _job_key(job_id)
+    job = await redis_client.hgetall(job_key)
+    if not job or job["status"] in (JobStatus.DONE.value, JobStatus.FAILED.value):
+        # Expired before a worker got to it, or finished by a worker thought dead
+        await redis_client.zrem(PROCESSING_KEY, job_id)
+        return
+
+    await redis_client.hset(job_key, mapping={"status": JobStatus.RUNNING.value, "started_at": time.time()})
+    requeued = False
+    try:
+        result = await analyze_image(
+            image_data=base64.b64decode(job["image"]),
+            mime_type=job["mime_type"] or None,
+            location=job["location"] or None,
+            user_id=job["user_id"],
+        )
+        if "analysis" in result:
+            result = {"filename": job["filename"] or None, "analysis": result["analysis"]}
+
+        await redis_client.hset(job_key, mapping={
+            "status": JobStatus.DONE.value,
+            "result": json.dumps(result),
+            "finished_at": time.time(),
+        })
+        await redis_client.hincrby(STATS_KEY, "completed", 1)
+    except SessionStoreFull:
+        # Every analysis slot is busy; the job waits at the front of its user's queue
+        requeued = await _requeue(job_id, job["user_id"])
+    except asyncio.CancelledError:
+        # The worker is shutting down; another one picks the job up
+        requeued = await _requeue(job_id, job["user_id"])
+        raise
+    except Exception as e:
+        print(f"❌ Analysis job {job_id} failed: {e}")
+        await redis_client.hset(job_key, mapping={
+            "status": JobStatus.FAILED.value,
+            "error": f"Failed to analyze dish: {str(e)}",
+            "finished_at": time.time(),
+        })
+        await redis_client.hincrby(STATS_KEY, "failed", 1)
+    finally:
+        if not requeued:
+            await redis_client.zrem(PROCESSING_KEY, job_id)
+            await redis_client.hdel(job_key, "image")
+            await redis_client.expire(job_key, ANALYSIS_JOB_TTL_SECONDS)
+
+    if requeued:
+        # Back off so the worker doesn't spin on the same full store
+        await asyncio.sleep(1)
+
+
+async def run_worker(worker_id: int) -> None:
+    while True:
+        try:
+            await requeue_expired_jobs()
+            job_id = await next_job()
+            if job_id:
+                await process_job(job_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Analysis worker {worker_id} error: {e}")
+            await asyncio.sleep(1)
+
+
+def start_workers(count: int = ANALYSIS_JOB_WORKERS) -> List[asyncio.Task]:
+    return [asyncio.create_task(run_worker(i)) for i in range(count)]
+
+
+async def stop_workers(workers: List[asyncio.Task]) -> None:
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+
+
+async def get_queue_metrics() -> dict:
+    users = set(await redis_client.lrange(READY_USERS_KEY, 0, -1))
+    depths = [await redis_client.llen(_user_queue_key(user_id)) for user_id in users]
+    stats = await redis_client.hgetall(STATS_KEY)
+    return {
+        "queue_depth": sum(depths),
+        "users_waiting": sum(1 for depth in depths if depth),
+        "max_user_depth": max(depths, default=0),
+        # Taken jobs, so it can't drift when a worker dies mid-run
+        "running": await redis_client.zcard(PROCESSING_KEY),
+        "enqueued": int(stats.get("enqueued", 0)),
+        "completed": int(stats.get("completed", 0)),
+        "failed": int(stats.get("failed", 0)),
+        "workers_per_process": ANALYSIS_JOB_WORKERS,
+    }
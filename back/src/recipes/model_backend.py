@@ -0,0 +1,128 @@
+import asyncio
+import json
+import math
+import random
+from typing import AsyncGenerator
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.models.registry import LLMRegistry
+from google.genai import types
+
+from src.config import (
+    ANALYSIS_MODEL_BACKEND,
+    ANALYSIS_MODEL,
+    FAKE_MODEL_LATENCY_MEDIAN_MS,
+    FAKE_MODEL_LATENCY_SIGMA,
+    FAKE_MODEL_SEED,
+)
+from src.recipes.resilience import ResilientLlm
+
+# Gemini bills a fixed number of tokens per image regardless of its size
+IMAGE_TOKENS = 258
+
+# Canned stage outputs, in exactly the shapes the prompts in agents.py ask Gemini for
+FAKE_STAGE_OUTPUTS = {
+    "checking_agent": {
+        "is_food": True,
+        "description": "A plate of margherita pizza, suitable for recipe generation.",
+    },
+    "recipe_agent": {
+        "dish_name": "Margherita Pizza",
+        "ingredients": [
+            "300 g bread flour",
+            "200 ml warm water",
+            "7 g dry yeast",
+            "1 tsp salt",
+            "2 tbsp olive oil",
+            "150 g tomato sauce",
+            "200 g mozzarella",
+            "fresh basil",
+        ],
+        "recipe": (
+            "1. Mix flour, yeast, salt, water and oil into a smooth dough.\n"
+            "2. Let the dough rise for 1 hour.\n"
+            "3. Roll out the dough and spread the tomato sauce over it.\n"
+            "4. Top with mozzarella and bake at 250°C for 10 minutes.\n"
+            "5. Finish with fresh basil."
+        ),
+    },
+    "calories_agent": {
+        "dish_name": "Margherita Pizza",
+        # Calories per 100 g of each ingredient
+        "ingredients_calories": {
+            "bread flour": 361,
+            "warm water": 0,
+            "dry yeast": 325,
+            "salt": 0,
+            "olive oil": 884,
+            "tomato sauce": 29,
+            "mozzarella": 280,
+            "fresh basil": 23,
+        },
+        "estimated_weight_g": 850,
+        "total_calories_per_100g": 230,
+    },
+    "health_categories_agent": {
+        "health_categories": ["High Saturated Fat"],
+    },
+}
+
+
+class FakeLlm(BaseLlm):
+    """
+    Local stand-in for Gemini that answers one pipeline stage with canned JSON.
+
+    Each call sleeps for a log-normally distributed latency (median
+    FAKE_MODEL_LATENCY_MEDIAN_MS, shape FAKE_MODEL_LATENCY_SIGMA) drawn from a
+    seeded generator, so load tests are repeatable without network access.
+    """
+
+    model: str = "fake"
+    stage: str
+
+    @staticmethod
+    def _estimate_prompt_tokens(llm_request: LlmRequest) -> int:
+        tokens = 0
+        for content in llm_request.contents:
+            for part in content.parts or []:
+                if part.inline_data:
+                    tokens += IMAGE_TOKENS
+                if part.text:
+                    tokens += len(part.text) // 4
+        return tokens
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        await asyncio.sleep(sample_latency())
+        text = json.dumps(FAKE_STAGE_OUTPUTS[self.stage], ensure_ascii=False)
+        yield LlmResponse(
+            content=types.Content(role="model", parts=[types.Part(text=text)]),
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=self._estimate_prompt_tokens(llm_request),
+                candidates_token_count=len(text) // 4,
+            ),
+        )
+
+
+_latency_rng = random.Random(FAKE_MODEL_SEED)
+
+
+def sample_latency() -> float:
+    """Seconds the fake model waits before answering"""
+    return _latency_rng.lognormvariate(math.log(FAKE_MODEL_LATENCY_MEDIAN_MS / 1000), FAKE_MODEL_LATENCY_SIGMA)
+
+
+def stage_model(stage: str) -> BaseLlm:
+    """
+    Model for an LlmAgent stage: the configured Gemini model, or a FakeLlm.
+
+    Either way it is wrapped in ResilientLlm for the stage's deadline, hedging and retries.
+    """
+    if ANALYSIS_MODEL_BACKEND == "fake":
+        inner = FakeLlm(stage=stage)
+    else:
+        inner = LLMRegistry.new_llm(ANALYSIS_MODEL)
+    return ResilientLlm(model=inner.model, inner=inner, stage=stage)
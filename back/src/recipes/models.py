@@ -1,5 +1,9 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, UniqueConstraint, Table, DateTime
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, UniqueConstraint, Table, DateTime, Index, Computed
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR
+from sqlalchemy.types import JSON
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import relationship
+from sqlalchemy.schema import CreateColumn
 from sqlalchemy.sql import func
 from src.database import Base
 from slugify import slugify
@@ -17,6 +21,25 @@ HEALTH_CATEGORIES = [
     "Contains Nuts"
 ]
 
+# Text search configuration of Recipe.search_vector; queries must use the same one
+SEARCH_CONFIG = "english"
+
+# Dish name outranks ingredients, which outrank the method text
+SEARCH_VECTOR_SQL = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(dish_name, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(ingredients_text, '')), 'B') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(recipe, '')), 'C')"
+)
+
+
+@compiles(CreateColumn)
+def _create_column(element, compiler, **kw):
+    # Columns marked postgresql_only (the tsvector) are left out elsewhere, e.g. the SQLite test databases
+    if element.element.info.get("postgresql_only") and compiler.dialect.name != "postgresql":
+        return None
+    return compiler.visit_create_column(element, **kw)
+
+
 recipe_categories = Table(
     'recipe_categories',
     Base.metadata,
@@ -39,6 +62,29 @@ class Recipe(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     is_vegan = Column(Boolean, default=False)
     is_halal = Column(Boolean, default=False)
+    # Health category names plus "vegan"/"halal", kept in sync by src.recipes.filters
+    filter_tags = Column(ARRAY(String).with_variant(JSON(), "sqlite"), nullable=False, default=list)
+    # Ingredient names joined, so the generated search vector can cover them
+    ingredients_text = Column(Text)
+    # Only queried through the table, never loaded on the model (see __mapper_args__)
+    search_vector = Column(TSVECTOR, Computed(SEARCH_VECTOR_SQL, persisted=True), info={"postgresql_only": True})
+
+    # One index per listing and sort column, ending in id like the ORDER BY and
+    # the cursor do, so a page is an index range read in either direction.
+    # The published ones are partial: the public listing never reads drafts.
+    __table_args__ = (
+        Index('ix_recipes_created_at_id', created_at, id),
+        Index('ix_recipes_dish_name_id', dish_name, id),
+        Index('ix_recipes_published_created_at_id', created_at, id,
+              postgresql_where=is_published == True, sqlite_where=is_published == True),  # noqa: E712
+        Index('ix_recipes_published_dish_name_id', dish_name, id,
+              postgresql_where=is_published == True, sqlite_where=is_published == True),  # noqa: E712
+        Index('ix_recipes_user_id_created_at_id', user_id, created_at, id),
+        Index('ix_recipes_user_id_dish_name_id', user_id, dish_name, id),
+        Index('ix_recipes_search_vector', search_vector, postgresql_using='gin').ddl_if(dialect='postgresql'),
+        Index('ix_recipes_filter_tags', filter_tags, postgresql_using='gin').ddl_if(dialect='postgresql'),
+    )
+    __mapper_args__ = {"exclude_properties": ["search_vector"]}
 
     user = relationship("Users", back_populates="recipes")
     
@@ -64,7 +110,7 @@ class IngredientCalories(Base):
     __tablename__ = "ingredient_calories"
 
     id = Column(Integer, primary_key=True, index=True)
-    recipe_id = Column(Integer, ForeignKey("recipes.id", ondelete="CASCADE"))
+    recipe_id = Column(Integer, ForeignKey("recipes.id", ondelete="CASCADE"), index=True)
     ingredient = Column(String)
     calories = Column(Integer)
 
@@ -0,0 +1,356 @@
+import csv
+import json
+import os
+import re
+from array import array
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+from pydantic import ValidationError
+
+from src.config import NUTRITION_TABLE_ENABLED
+from src.recipes.delivery import ingredient_product_name
+from src.recipes.parsing import parse_agent_json
+from src.recipes.schemas import RecipeStageOutput, CaloriesStageOutput
+from src.services.redis import redis_client
+
+NUTRITION_STATS_KEY = "analysis:nutrition"
+NUTRITION_CSV = os.path.join(os.path.dirname(__file__), "data", "nutrition.csv")
+
+# Minimum trigram (Dice) similarity for a fuzzy match, e.g. "mozarella" -> "mozzarella"
+FUZZY_THRESHOLD = 0.7
+# Minimum share of the query's tokens a partial name match must cover,
+# e.g. "red bell pepper" -> "bell pepper" (2/3) but not "baby spinach" -> "spinach"
+SUBSET_THRESHOLD = 0.6
+# A line like "salt and pepper" names several ingredients, so no single row fits it
+_CONJUNCTIONS = {"and", "or"}
+
+# Preparation words that don't change what the ingredient is
+_DESCRIPTORS = {
+    "chopped", "diced", "minced", "sliced", "grated", "shredded", "crushed", "peeled",
+    "cooked", "boiled", "raw", "softened", "melted", "beaten", "finely", "roughly",
+    "thinly", "freshly", "fresh", "large", "medium", "small", "ripe", "leaf", "leave",
+    "clove", "unsalted", "salted", "extra", "virgin", "boneless", "skinless", "of",
+}
+
+# Grams per unit; millilitres are counted as grams
+UNIT_GRAMS = {
+    "g": 1, "gr": 1, "gram": 1, "grams": 1,
+    "kg": 1000, "mg": 0.001,
+    "ml": 1, "l": 1000, "liter": 1000, "liters": 1000, "litre": 1000, "litres": 1000,
+    "cup": 240, "cups": 240,
+    "tbsp": 15, "tablespoon": 15, "tablespoons": 15,
+    "tsp": 5, "teaspoon": 5, "teaspoons": 5,
+    "oz": 28.35, "ounce": 28.35, "ounces": 28.35,
+    "lb": 453.6, "lbs": 453.6, "pound": 453.6, "pounds": 453.6,
+    "pinch": 0.5, "pinches": 0.5,
+    "clove": 5, "cloves": 5,
+    "slice": 30, "slices": 30,
+}
+
+_FRACTIONS = {"½": 0.5, "⅓": 1 / 3, "⅔": 2 / 3, "¼": 0.25, "¾": 0.75, "⅛": 0.125}
+_NUMBER = r"\d+(?:[.,]\d+)?(?:/\d+)?|[½⅓⅔¼¾⅛]"
+_AMOUNT = re.compile(
+    rf"^\s*(?P<amount>{_NUMBER})(?:\s*(?P<extra>{_NUMBER}))?(?:\s*-\s*(?P<upper>{_NUMBER}))?"
+    rf"\s*(?P<unit>[a-zA-Z]+\b\.?)?",
+)
+
+
+class NutritionMatch(NamedTuple):
+    name: str
+    kcal_per_100g: int
+    score: float
+
+
+def _singular(token: str) -> str:
+    if len(token) <= 3 or token.endswith(("ss", "us")):
+        return token
+    if token.endswith("ies"):
+        return token[:-3] + "y"
+    if token.endswith("oes"):
+        return token[:-2]
+    if token.endswith("s"):
+        return token[:-1]
+    return token
+
+
+def normalize_ingredient(text: str) -> str:
+    """'2 large Tomatoes, diced' -> 'tomato'"""
+    name = ingredient_product_name(text)
+    tokens = [_singular(token) for token in re.findall(r"[a-z]+", name)]
+    return " ".join(token for token in tokens if token not in _DESCRIPTORS)
+
+
+def _trigrams(name: str) -> set:
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _number(text: str) -> float:
+    if text in _FRACTIONS:
+        return _FRACTIONS[text]
+    if "/" in text:
+        numerator, denominator = text.split("/")
+        return float(numerator) / float(denominator) if float(denominator) else 0.0
+    return float(text.replace(",", "."))
+
+
+class NutritionIndex:
+    """
+    Calories per 100 g for common ingredients, held in flat arrays.
+
+    Row i is names[i] / kcal[i] / piece_g[i]. Lookup tries the normalized name,
+    then the most specific table entry whose tokens all appear in the query
+    (and which contains the query's head noun and covers most of it), then
+    trigram similarity. Lines joining several ingredients never match.
+    """
+
+    def __init__(self, rows: List[Tuple[str, float, float]]):
+        self.names: List[str] = []
+        self.kcal = array("f")
+        self.piece_g = array("f")
+        self._exact: Dict[str, int] = {}
+        self._by_token: Dict[str, array] = defaultdict(lambda: array("H"))
+        self._by_trigram: Dict[str, array] = defaultdict(lambda: array("H"))
+
+        for name, kcal, piece_g in rows:
+            normalized = normalize_ingredient(name)
+            if not normalized or normalized in self._exact:
+                continue
+            row = len(self.names)
+            self.names.append(normalized)
+            self.kcal.append(kcal)
+            self.piece_g.append(piece_g)
+            self._exact[normalized] = row
+            for token in set(normalized.split()):
+                self._by_token[token].append(row)
+            for trigram in _trigrams(normalized):
+                self._by_trigram[trigram].append(row)
+
+        self._by_token = dict(self._by_token)
+        self._by_trigram = dict(self._by_trigram)
+
+    @classmethod
+    def from_csv(cls, path: str = NUTRITION_CSV) -> "NutritionIndex":
+        with open(path, newline="", encoding="utf-8") as f:
+            return cls([
+                (row["name"], float(row["kcal_per_100g"]), float(row["piece_g"] or 0))
+                for row in csv.DictReader(f)
+            ])
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _match(self, row: int, score: float) -> NutritionMatch:
+        return NutritionMatch(self.names[row], round(self.kcal[row]), score)
+
+    def lookup_row(self, ingredient: str) -> Optional[Tuple[int, float]]:
+        name = normalize_ingredient(ingredient)
+        if not name:
+            return None
+        if name in self._exact:
+            return self._exact[name], 1.0
+
+        tokens = name.split()
+        if _CONJUNCTIONS.intersection(tokens):
+            return None
+        head = tokens[-1]
+        best_row, best_size = None, 0
+        for row in self._by_token.get(head, ()):
+            entry_tokens = self.names[row].split()
+            if len(entry_tokens) > best_size and set(entry_tokens) <= set(tokens):
+                best_row, best_size = row, len(entry_tokens)
+        if best_row is not None and best_size / len(tokens) >= SUBSET_THRESHOLD:
+            return best_row, best_size / len(tokens)
+
+        query = _trigrams(name)
+        shared: Dict[int, int] = defaultdict(int)
+        for trigram in query:
+            for row in self._by_trigram.get(trigram, ()):
+                shared[row] += 1
+        best_row, best_score = None, 0.0
+        for row, count in shared.items():
+            score = 2 * count / (len(query) + len(_trigrams(self.names[row])))
+            if score > best_score:
+                best_row, best_score = row, score
+        if best_row is not None and best_score >= FUZZY_THRESHOLD:
+            return best_row, best_score
+        return None
+
+    def lookup(self, ingredient: str) -> Optional[NutritionMatch]:
+        found = self.lookup_row(ingredient)
+        return self._match(*found) if found else None
+
+    def grams(self, ingredient: str, row: int) -> Optional[float]:
+        """Weight of an ingredient line like '2 tbsp olive oil' or '3 eggs', None if it has no usable amount"""
+        match = _AMOUNT.match(ingredient)
+        if not match:
+            return None
+        amount = _number(match["amount"])
+        if match["extra"]:
+            # "1 1/2 cups"
+            amount += _number(match["extra"])
+        if match["upper"]:
+            amount = (amount + _number(match["upper"])) / 2
+
+        unit = (match["unit"] or "").rstrip(".").lower()
+        if unit in UNIT_GRAMS:
+            return amount * UNIT_GRAMS[unit]
+        if self.piece_g[row]:
+            # "3 eggs", "2 large onions"
+            return amount * self.piece_g[row]
+        return None
+
+
+nutrition_index = NutritionIndex.from_csv()
+
+
+class CaloriesEstimate(NamedTuple):
+    ingredients_calories: Dict[str, int]
+    unmatched: List[str]
+    estimated_weight_g: Optional[int]
+    total_calories_per_100g: Optional[int]
+
+    @property
+    def complete(self) -> bool:
+        return not self.unmatched and self.estimated_weight_g is not None
+
+
+def estimate_calories(ingredients: List[str], index: NutritionIndex = nutrition_index) -> CaloriesEstimate:
+    """
+    Per-100g calories for every ingredient the table knows.
+
+    Weight and calories per 100 g of the dish are only computed when every
+    ingredient matched and has a measurable amount.
+    """
+    ingredients_calories: Dict[str, int] = {}
+    unmatched: List[str] = []
+    total_grams = total_kcal = 0.0
+    weighable = True
+    for ingredient in ingredients:
+        found = index.lookup_row(ingredient)
+        if found is None:
+            unmatched.append(ingredient)
+            continue
+        row, _ = found
+        ingredients_calories[ingredient_product_name(ingredient) or ingredient] = round(index.kcal[row])
+
+        grams = index.grams(ingredient, row)
+        if grams is None:
+            weighable = False
+        else:
+            total_grams += grams
+            total_kcal += grams * index.kcal[row] / 100
+
+    if unmatched or not weighable or total_grams <= 0:
+        return CaloriesEstimate(ingredients_calories, unmatched, None, None)
+    return CaloriesEstimate(
+        ingredients_calories,
+        unmatched,
+        round(total_grams),
+        round(total_kcal / total_grams * 100),
+    )
+
+
+def calories_stage_output(dish_name: Optional[str], estimate: CaloriesEstimate) -> str:
+    """calories_agent-shaped JSON for an estimate that needs no model call"""
+    return json.dumps({
+        "dish_name": dish_name,
+        "ingredients_calories": estimate.ingredients_calories,
+        "estimated_weight_g": estimate.estimated_weight_g,
+        "total_calories_per_100g": estimate.total_calories_per_100g,
+    }, ensure_ascii=False)
+
+
+def _recipe_from_state(callback_context: CallbackContext) -> Optional[RecipeStageOutput]:
+    try:
+        return RecipeStageOutput.model_validate(parse_agent_json(callback_context.state.get("recipe")))
+    except (ValueError, ValidationError):
+        return None
+
+
+async def _record_lookups(estimate: CaloriesEstimate, stage_skipped: bool) -> None:
+    try:
+        await redis_client.hincrby(NUTRITION_STATS_KEY, "stages", 1)
+        await redis_client.hincrby(NUTRITION_STATS_KEY, "stages_skipped", int(stage_skipped))
+        await redis_client.hincrby(
+            NUTRITION_STATS_KEY, "ingredients", len(estimate.ingredients_calories) + len(estimate.unmatched)
+        )
+        await redis_client.hincrby(NUTRITION_STATS_KEY, "matched", len(estimate.ingredients_calories))
+    except Exception as e:
+        print(f"Nutrition stats error: {e}")
+
+
+async def get_nutrition_stats() -> dict:
+    stats = await redis_client.hgetall(NUTRITION_STATS_KEY)
+    counts = {field: int(stats.get(field, 0)) for field in ("ingredients", "matched", "stages", "stages_skipped")}
+    counts["hit_rate"] = counts["matched"] / counts["ingredients"] if counts["ingredients"] else 0.0
+    return counts
+
+
+async def answer_from_nutrition_table(
+    callback_context: CallbackContext,
+    llm_request: LlmRequest
+) -> Optional[LlmResponse]:
+    """
+    before_model_callback for calories_agent.
+
+    Answers the stage without the model when the table covers every ingredient;
+    otherwise hands the model the known values so it only estimates the rest.
+    """
+    if not NUTRITION_TABLE_ENABLED:
+        return None
+    recipe = _recipe_from_state(callback_context)
+    if recipe is None or not recipe.ingredients:
+        return None
+
+    estimate = estimate_calories(recipe.ingredients)
+    await _record_lookups(estimate, estimate.complete)
+    if estimate.complete:
+        output = calories_stage_output(recipe.dish_name, estimate)
+        return LlmResponse(content=types.Content(role="model", parts=[types.Part(text=output)]))
+
+    if estimate.ingredients_calories:
+        if estimate.unmatched:
+            task = f"Estimate calories per 100g only for: {json.dumps(estimate.unmatched, ensure_ascii=False)}."
+        else:
+            task = "Calories of every ingredient are known; estimate only the dish weight and calories per 100g."
+        llm_request.contents.append(types.Content(role="user", parts=[types.Part(text=(
+            "Calories per 100g from the nutrition table — copy them into ingredients_calories unchanged: "
+            f"{json.dumps(estimate.ingredients_calories, ensure_ascii=False)}. {task}"
+        ))]))
+    return None
+
+
+def apply_nutrition_table(callback_context: CallbackContext, llm_response: LlmResponse) -> Optional[LlmResponse]:
+    """after_model_callback for calories_agent: table values win over the model's for matched ingredients"""
+    if not NUTRITION_TABLE_ENABLED or not llm_response.content or not llm_response.content.parts:
+        return None
+    recipe = _recipe_from_state(callback_context)
+    if recipe is None:
+        return None
+    estimate = estimate_calories(recipe.ingredients)
+    if not estimate.ingredients_calories:
+        return None
+
+    try:
+        calories = CaloriesStageOutput.model_validate(parse_agent_json(llm_response.content.parts[0].text))
+    except (ValueError, ValidationError):
+        return None
+
+    known = {normalize_ingredient(name) for name in estimate.ingredients_calories}
+    merged = {
+        name: amount for name, amount in calories.ingredients_calories.items()
+        if normalize_ingredient(name) not in known
+    }
+    merged.update(estimate.ingredients_calories)
+    calories.ingredients_calories = merged
+
+    return LlmResponse(
+        content=types.Content(role="model", parts=[types.Part(text=calories.model_dump_json())]),
+        usage_metadata=llm_response.usage_metadata,
+    )
@@ -0,0 +1,9 @@
+import json
+import re
+from typing import Optional
+
+
+def parse_agent_json(text: Optional[str]):
+    """Strip markdown code fences from an agent reply and parse it as JSON"""
+    cleaned = re.sub(r"^```(?:json)?\s*|\s*```$", "", (text or "").strip(), flags=re.MULTILINE)
+    return json.loads(cleaned)
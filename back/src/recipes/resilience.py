@@ -0,0 +1,204 @@
+import asyncio
+import time
+from collections import deque
+from typing import AsyncGenerator, Deque, Dict, List, Optional
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from src.config import (
+    ANALYSIS_STAGE_TIMEOUT_SECONDS,
+    ANALYSIS_STAGE_TIMEOUTS,
+    ANALYSIS_STAGE_MAX_RETRIES,
+    ANALYSIS_HEDGE_ENABLED,
+    ANALYSIS_HEDGE_PERCENTILE,
+    ANALYSIS_HEDGE_DEFAULT_DELAY_MS,
+    ANALYSIS_RETRY_BUDGET_RATIO,
+    ANALYSIS_RETRY_BUDGET_CAPACITY,
+)
+from src.recipes.instrumentation import current_trace
+from src.recipes.parsing import parse_agent_json
+from src.services.metrics import JSON_PARSE_FAILURES
+
+# Latency samples needed before the hedge delay follows the observed percentile
+MIN_HEDGE_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+JSON_REMINDER = "Your previous reply was not valid JSON. Reply again with only the JSON object, no other text."
+
+
+class StageTimeoutError(Exception):
+    """A pipeline stage got no model response within its deadline"""
+
+
+class MalformedResponseError(Exception):
+    """The model answered, but not with parseable JSON"""
+
+    def __init__(self, responses: List[LlmResponse]):
+        super().__init__("Model response is not valid JSON")
+        self.responses = responses
+
+
+def _stage_timeouts() -> Dict[str, float]:
+    """ANALYSIS_STAGE_TIMEOUTS="recipe_agent=40,calories_agent=15" -> {"recipe_agent": 40.0, ...}"""
+    timeouts = {}
+    for item in ANALYSIS_STAGE_TIMEOUTS.split(","):
+        stage, _, seconds = item.partition("=")
+        if stage.strip() and seconds.strip():
+            timeouts[stage.strip()] = float(seconds)
+    return timeouts
+
+
+STAGE_TIMEOUTS = _stage_timeouts()
+
+
+class RetryBudget:
+    """
+    Caps retries and hedges at a fraction of first attempts.
+
+    Every first attempt deposits `ratio` tokens (up to `capacity`) and every
+    extra attempt spends one, so during an outage retries stop long before
+    they can multiply the load on the model.
+    """
+
+    def __init__(self, ratio: float, capacity: float):
+        self.ratio = ratio
+        self.capacity = capacity
+        self.tokens = capacity
+
+    def record_request(self) -> None:
+        self.tokens = min(self.capacity, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+retry_budget = RetryBudget(ANALYSIS_RETRY_BUDGET_RATIO, ANALYSIS_RETRY_BUDGET_CAPACITY)
+
+_latencies: Dict[str, Deque[float]] = {}
+
+
+def hedge_delay(stage: str) -> float:
+    """Seconds to wait before a hedged request: the stage's observed latency percentile"""
+    samples = _latencies.get(stage)
+    if not samples or len(samples) < MIN_HEDGE_SAMPLES:
+        return ANALYSIS_HEDGE_DEFAULT_DELAY_MS / 1000
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * ANALYSIS_HEDGE_PERCENTILE / 100))]
+
+
+def _record_latency(stage: str, seconds: float) -> None:
+    _latencies.setdefault(stage, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+
+def _is_valid_json(responses: List[LlmResponse]) -> bool:
+    text = "".join(
+        part.text
+        for response in responses if response.content and response.content.parts
+        for part in response.content.parts if part.text
+    )
+    try:
+        parse_agent_json(text)
+        return True
+    except ValueError:
+        return False
+
+
+def _count_extra_attempt(stage: str, kind: str) -> None:
+    print(f"🔁 {stage}: {kind}")
+    trace = current_trace()
+    if trace is not None:
+        usage = trace.llm_usage.setdefault(stage, {"calls": 0, "prompt_tokens": 0, "response_tokens": 0})
+        usage["calls"] += 1
+
+
+class ResilientLlm(BaseLlm):
+    """
+    Wraps a stage's model with a deadline, optional hedging and JSON validation.
+
+    Each attempt must finish within the stage deadline. With hedging on, a second
+    identical request starts once the first has taken longer than the stage's
+    usual p95, and whichever answers first wins. Timeouts, errors and non-JSON
+    replies are retried — re-prompting only this stage — while the process-wide
+    retry budget allows it.
+    """
+
+    inner: BaseLlm
+    stage: str
+
+    @property
+    def timeout(self) -> float:
+        return STAGE_TIMEOUTS.get(self.stage, ANALYSIS_STAGE_TIMEOUT_SECONDS)
+
+    async def _call(self, llm_request: LlmRequest) -> List[LlmResponse]:
+        started = time.perf_counter()
+        responses = [response async for response in self.inner.generate_content_async(llm_request)]
+        _record_latency(self.stage, time.perf_counter() - started)
+        if not _is_valid_json(responses):
+            JSON_PARSE_FAILURES.labels(agent=self.stage).inc()
+            raise MalformedResponseError(responses)
+        return responses
+
+    async def _hedged_call(self, llm_request: LlmRequest) -> List[LlmResponse]:
+        primary = asyncio.create_task(self._call(llm_request))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay(self.stage))
+            if not done and retry_budget.try_spend():
+                _count_extra_attempt(self.stage, f"hedged after {hedge_delay(self.stage):.2f}s")
+                tasks.append(asyncio.create_task(self._call(llm_request)))
+
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            # Every attempt failed; surface the primary's error
+            return primary.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _attempt(self, llm_request: LlmRequest) -> List[LlmResponse]:
+        call = self._hedged_call(llm_request) if ANALYSIS_HEDGE_ENABLED else self._call(llm_request)
+        try:
+            return await asyncio.wait_for(call, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            raise StageTimeoutError(f"{self.stage} got no response within {self.timeout:.0f}s") from None
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        retry_budget.record_request()
+        request = llm_request
+        attempt = 0
+        while True:
+            try:
+                responses = await self._attempt(request)
+                break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                trace = current_trace()
+                cancelled = trace is not None and trace.cancelled
+                if cancelled or attempt >= ANALYSIS_STAGE_MAX_RETRIES or not retry_budget.try_spend():
+                    if isinstance(e, MalformedResponseError):
+                        # Out of retries: let the stage's own parsing deal with it
+                        responses = e.responses
+                        break
+                    raise
+                attempt += 1
+                _count_extra_attempt(self.stage, f"retry {attempt} after {e}")
+                if isinstance(e, MalformedResponseError):
+                    request = llm_request.model_copy(update={"contents": llm_request.contents + [
+                        types.Content(role="user", parts=[types.Part(text=JSON_REMINDER)])
+                    ]})
+
+        for response in responses:
+            yield response
@@ -1,10 +1,10 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Form, status, Path, Body, Query, Request
 from fastapi.responses import StreamingResponse
-from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
-from google.genai import types
-from sqlalchemy.orm import Session
-from typing import List
+from sse_starlette.sse import EventSourceResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+import asyncio
 import uuid
 import json
 import re
@@ -13,22 +13,32 @@ from datetime import datetime
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
+from pydantic import ValidationError
 
 from src.auth.service import get_current_user
 from src.auth.models import Users
-from src.gcs.uploader import upload_large_file_to_gcs
-from src.dependencies import get_db
-from src.recipes.models import Recipe, IngredientCalories
+from src.gcs.uploader import upload_large_file_to_gcs, upload_bytes_to_gcs
+from src.dependencies import get_async_db
+from src.recipes.models import Recipe
 from src.recipes.schemas import (
     FavoriteStatusResponse,
     RecipeResponse, 
     RecipePatchRequest, 
     PaginatedRecipesResponse, 
     PaginatedFavoriteRecipesResponse,
+    RecipeSearchResponse,
+    RecipeFilter,
+    CategoryMatch,
     FavoriteStatusResponse,
     CategoryResponse,
     CategoryListResponse,
-    SortOrder
+    SortOrder,
+    AnalysisJobCreatedResponse,
+    AnalysisJobResponse,
+    JobStatus,
+    BatchAnalysisItem,
+    BatchAnalysisResponse,
+    DishAnalysis
 )
 from src.recipes.service import (
     get_recipe_by_slug, 
@@ -41,7 +51,9 @@ from src.recipes.service import (
     remove_from_favorites,
     is_recipe_favorited,
     get_categories,
-    create_recipe_with_categories
+    create_recipe_with_categories,
+    search_recipes,
+    RECIPE_RESPONSE_LOADS,
 )
 from src.services.redis import (
     redis_client, 
@@ -50,8 +62,13 @@ from src.services.redis import (
     invalidate_favorite_caches
 )
 
-from src.recipes.agents import root_agent, checking_agent
+from src.recipes.analysis import analyze_image, stream_analysis, analyze_batch
+from src.services.analysis_staging import stage_analysis, get_staged_analysis, discard_staged_analysis
+from src.services.image_preprocessing import PreprocessedImage, preprocess_image
+from src.services.session_store import SessionStoreFull
+from src.recipes.jobs import enqueue_job, get_job, QueueFullError
 from src.gcs.signed_urls import signed_url_service
+from src.config import ANALYSIS_BATCH_MAX_IMAGES
 
 # Custom JSON encoder for datetime objects
 class DateTimeEncoder(json.JSONEncoder):
@@ -60,40 +77,46 @@ class DateTimeEncoder(json.JSONEncoder):
             return obj.isoformat()
         return super().default(obj)
 
-APP_NAME = "dish_analysis_app"
-session_service = InMemorySessionService()
-runner = Runner(
-    agent=root_agent,
-    app_name=APP_NAME,
-    session_service=session_service,
-)
-checking_runner = Runner(
-    agent=checking_agent,
-    app_name=APP_NAME,
-    session_service=session_service,
-)
-
 limiter = Limiter(key_func=get_remote_address)
 
+# Retry-After (seconds) when every analysis session slot is taken
+ANALYSIS_BUSY_RETRY_AFTER = "5"
+
 
 router = APIRouter(prefix="/dish", tags=["dish"])
 
+def recipe_filter_params(
+    category: List[str] = Query([], description="Health category; repeat for several"),
+    category_match: CategoryMatch = Query(CategoryMatch.ALL, description="Whether recipes need all or any of the categories"),
+    vegan: bool = Query(False, description="Only vegan recipes"),
+    halal: bool = Query(False, description="Only halal recipes"),
+) -> RecipeFilter:
+    try:
+        return RecipeFilter(categories=category, category_match=category_match, vegan=vegan, halal=halal)
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=e.errors()[0]["msg"])
+
 @router.get("/", response_model=PaginatedRecipesResponse, status_code=status.HTTP_200_OK)
 @limiter.limit("3/minute")
 async def get_all_dishes(
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(20, ge=1, le=100, description="Number of items per page"),
-    sort_by: SortOrder = Query(SortOrder.NEWEST, description="Sort order for recipes")
+    sort_by: SortOrder = Query(SortOrder.NEWEST, description="Sort order for recipes"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces page"),
+    recipe_filter: RecipeFilter = Depends(recipe_filter_params)
 ):
-    cache_key = f"recipes:page={page}:size={page_size}:sort={sort_by}"
+    cache_key = f"recipes:page={page}:size={page_size}:sort={sort_by}:cursor={cursor}:{recipe_filter.cache_key}"
     
     cached_data = await redis_client.get(cache_key)
     if cached_data:
         return PaginatedRecipesResponse(**json.loads(cached_data))
 
-    response: PaginatedRecipesResponse = get_recipes_paginated(db, page=page, page_size=page_size, sort_by=sort_by)
+    try:
+        response: PaginatedRecipesResponse = await get_recipes_paginated(db, page=page, page_size=page_size, sort_by=sort_by, cursor=cursor, recipe_filter=recipe_filter)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     await redis_client.set(cache_key, json.dumps(response.model_dump(), cls=DateTimeEncoder), ex=300)
 
@@ -101,14 +124,14 @@ async def get_all_dishes(
 
 @router.get("/recipes/{slug}/", response_model=RecipeResponse)
 @limiter.limit("10/minute")
-async def get_recipe(request: Request, slug: str, db: Session = Depends(get_db)):
+async def get_recipe(request: Request, slug: str, db: AsyncSession = Depends(get_async_db)):
     cache_key = f"recipe:slug={slug}"
     cached_data = await redis_client.get(cache_key)
 
     if cached_data:
         return RecipeResponse(**json.loads(cached_data))
 
-    recipe_response = get_recipe_response_by_slug(db, slug)
+    recipe_response = await get_recipe_response_by_slug(db, slug)
     if not recipe_response:
         raise HTTPException(status_code=404, detail="Recipe not found")
 
@@ -121,11 +144,11 @@ async def get_recipe(request: Request, slug: str, db: Session = Depends(get_db))
 async def proxy_recipe_image(
     request: Request,
     recipe_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Proxy recipe image to avoid CORS issues"""
     try:
-        recipe = db.query(Recipe).filter(Recipe.id == recipe_id).first()
+        recipe = await db.scalar(select(Recipe).where(Recipe.id == recipe_id))
         if not recipe:
             raise HTTPException(status_code=404, detail="Recipe not found")
         
@@ -162,6 +185,19 @@ async def proxy_recipe_image(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to proxy image: {str(e)}")
 
+async def _stage_upload(
+    user_id: str,
+    image_data: bytes,
+    mime_type: Optional[str],
+    prepared: List[PreprocessedImage],
+    filename: Optional[str],
+    analysis: dict
+) -> Optional[str]:
+    """Stage the image this request sent to the model, or the upload as received when it didn't call the model"""
+    if prepared:
+        return await stage_analysis(user_id, prepared[0].data, prepared[0].mime_type, filename, analysis)
+    return await stage_analysis(user_id, image_data, mime_type, filename, analysis, preprocessed=False)
+
 @router.post("/")
 @limiter.limit("5/minute")
 async def analyze_dish(
@@ -170,90 +206,236 @@ async def analyze_dish(
     location: str = Form(None),
     current_user: Users = Depends(get_current_user)
 ):
+    """
+    Analyze a dish photo.
+
+    The response's `analysis_id` lets POST /dish/save/ reuse the photo and the
+    analysis instead of receiving them again.
+    """
     try:
         image_data = await file.read()
-
-        USER_ID = str(current_user["id"])
-        SESSION_ID = str(uuid.uuid4())
-        await session_service.create_session(
-            app_name=APP_NAME,
-            user_id=USER_ID,
-            session_id=SESSION_ID,
+        prepared: List[PreprocessedImage] = []
+        result = await analyze_image(
+            image_data=image_data,
+            mime_type=file.content_type,
+            location=location,
+            user_id=str(current_user["id"]),
+            on_preprocessed=prepared.append,
         )
 
-        content_parts = [types.Part(
-            inline_data=types.Blob(
-                mime_type=file.content_type,
-                data=image_data
-            )
-        )]
-        
-        if location:
-            content_parts.append(types.Part(text=f"User location: {location}"))
-
-        content = types.Content(
-            role="user",
-            parts=content_parts
-        )
-
-        checking_result = "Agent did not respond"
-        async for event in checking_runner.run_async(
-            user_id=USER_ID,
-            session_id=SESSION_ID,
-            new_message=content
-        ):
-            if event.is_final_response() and event.content and event.content.parts:
-                checking_result = event.content.parts[0].text
-                break
-
-        cleaned_checking = re.sub(r"^```(?:json)?\s*|\s*```$", "", (checking_result or "").strip(), flags=re.MULTILINE)
-        checking_data = json.loads(cleaned_checking)
-
-        if not checking_data.get("is_food"):
-            return {
-                "message": "Not food",
-                "description": checking_data.get("description", "Unknown")
-            }
-
-        final_response = "Agent did not respond"
-        async for event in runner.run_async(
-            user_id=USER_ID,
-            session_id=SESSION_ID,
-            new_message=content
-        ):
-            if (
-                event.is_final_response()
-                and event.author == "final_agent"
-                and event.content
-                and event.content.parts
-            ):
-                final_response = event.content.parts[0].text
-                break
-
-        cleaned = re.sub(r"^```(?:json)?\s*|\s*```$", "", (final_response or "").strip(), flags=re.MULTILINE)
-        parsed = json.loads(cleaned)
+        if "analysis" not in result:
+            return result
 
         return {
             "filename": file.filename,
-            "analysis": parsed
+            "analysis": result["analysis"],
+            "analysis_id": await _stage_upload(
+                str(current_user["id"]), image_data, file.content_type, prepared, file.filename, result["analysis"]
+            )
         }
 
+    except SessionStoreFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": ANALYSIS_BUSY_RETRY_AFTER})
     except Exception as e:
         print("❌ Error:", str(e))
         raise HTTPException(status_code=500, detail=f"Failed to analyze dish: {str(e)}")
 
+@router.post("/stream/")
+@limiter.limit("5/minute")
+async def analyze_dish_stream(
+    request: Request,
+    file: UploadFile = File(...),
+    location: str = Form(None),
+    current_user: Users = Depends(get_current_user)
+):
+    """
+    Server-Sent Events variant of analyze_dish.
+
+    Emits `recipe`, `calories`, `health_categories` and `delivery` events as soon
+    as each stage finishes, then `result` (same body as POST /dish/) or `not_food`.
+    Remaining stages are cancelled if the client disconnects.
+    """
+    image_data = await file.read()
+    user_id = str(current_user["id"])
+
+    async def event_stream():
+        prepared: List[PreprocessedImage] = []
+        events = stream_analysis(
+            image_data=image_data,
+            mime_type=file.content_type,
+            location=location,
+            user_id=user_id,
+            on_preprocessed=prepared.append,
+        )
+        try:
+            async for name, payload in events:
+                if await request.is_disconnected():
+                    break
+                if name == "result":
+                    payload = {
+                        "filename": file.filename,
+                        "analysis": payload["analysis"],
+                        "analysis_id": await _stage_upload(
+                            user_id, image_data, file.content_type, prepared, file.filename, payload["analysis"]
+                        )
+                    }
+                yield {"event": name, "data": json.dumps(payload)}
+        except SessionStoreFull as e:
+            yield {"event": "error", "data": json.dumps({"detail": str(e), "status": 503})}
+        except Exception as e:
+            print("❌ Error:", str(e))
+            yield {"event": "error", "data": json.dumps({"detail": f"Failed to analyze dish: {str(e)}"})}
+        finally:
+            await events.aclose()
+
+    return EventSourceResponse(event_stream())
+
+async def _read_batch(files: List[UploadFile]) -> List[tuple]:
+    if not files or len(files) > ANALYSIS_BATCH_MAX_IMAGES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Upload between 1 and {ANALYSIS_BATCH_MAX_IMAGES} images"
+        )
+    return [(await file.read(), file.content_type) for file in files]
+
+def _batch_item(index: int, filename: str, result: dict, error: str) -> BatchAnalysisItem:
+    if result and "analysis" in result:
+        result = {"filename": filename, "analysis": result["analysis"]}
+    return BatchAnalysisItem(
+        index=index,
+        filename=filename,
+        result=result,
+        error=f"Failed to analyze dish: {error}" if error else None
+    )
+
+@router.post("/batch/", response_model=BatchAnalysisResponse)
+@limiter.limit("5/minute")
+async def analyze_dish_batch(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    location: str = Form(None),
+    current_user: Users = Depends(get_current_user)
+):
+    """
+    Analyze up to ANALYSIS_BATCH_MAX_IMAGES photos concurrently.
+
+    Each item carries the POST /dish/ body in `result`, or `error` if that
+    photo failed; one failure doesn't fail the batch.
+    """
+    images = await _read_batch(files)
+    results = []
+    async for index, result, error in analyze_batch(images, location, str(current_user["id"])):
+        results.append(_batch_item(index, files[index].filename, result, error))
+
+    return BatchAnalysisResponse(results=sorted(results, key=lambda item: item.index))
+
+@router.post("/batch/stream/")
+@limiter.limit("5/minute")
+async def analyze_dish_batch_stream(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    location: str = Form(None),
+    current_user: Users = Depends(get_current_user)
+):
+    """Server-Sent Events variant of analyze_dish_batch: one `item` event per photo as it finishes, then `done`"""
+    images = await _read_batch(files)
+    filenames = [file.filename for file in files]
+
+    async def event_stream():
+        results = analyze_batch(images, location, str(current_user["id"]))
+        try:
+            async for index, result, error in results:
+                if await request.is_disconnected():
+                    break
+                item = _batch_item(index, filenames[index], result, error)
+                yield {"event": "item", "data": item.model_dump_json()}
+            else:
+                yield {"event": "done", "data": json.dumps({"count": len(images)})}
+        finally:
+            await results.aclose()
+
+    return EventSourceResponse(event_stream())
+
+@router.post("/jobs/", response_model=AnalysisJobCreatedResponse, status_code=status.HTTP_202_ACCEPTED)
+@limiter.limit("5/minute")
+async def submit_analysis_job(
+    request: Request,
+    file: UploadFile = File(...),
+    location: str = Form(None),
+    current_user: Users = Depends(get_current_user)
+):
+    """Queue a dish analysis; poll GET /dish/jobs/{job_id}/ for the result"""
+    image_data = await file.read()
+    try:
+        job_id = await enqueue_job(
+            user_id=str(current_user["id"]),
+            image_data=image_data,
+            mime_type=file.content_type,
+            filename=file.filename,
+            location=location,
+        )
+    except QueueFullError as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
+
+    return AnalysisJobCreatedResponse(job_id=job_id, status=JobStatus.QUEUED)
+
+@router.get("/jobs/{job_id}/", response_model=AnalysisJobResponse)
+@limiter.limit("60/minute")
+async def get_analysis_job(
+    request: Request,
+    job_id: str,
+    current_user: Users = Depends(get_current_user)
+):
+    job = await get_job(job_id)
+    if not job or job["user_id"] != str(current_user["id"]):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return AnalysisJobResponse(**job)
+
+def _recipe_from_analysis(analysis: dict) -> dict:
+    """The save form's `recipe` JSON, built from a staged analysis"""
+    dish = DishAnalysis.model_validate(analysis)
+    return {
+        "dish_name": dish.recipe.dish_name,
+        "recipe": dish.recipe.recipe,
+        "ingredients_calories": [
+            {"ingredient": ingredient, "calories": calories}
+            for ingredient, calories in dish.calories.ingredients_calories.items()
+        ],
+        "estimated_weight_g": dish.calories.estimated_weight_g,
+        "total_calories_per_100g": dish.calories.total_calories_per_100g,
+        "health_categories": dish.health_categories,
+        "is_vegan": dish.is_vegan,
+        "is_halal": dish.is_halal,
+    }
+
 @router.post("/save/")
 @limiter.limit("5/minute")
 async def save_recipe(
     request: Request,
-    file: UploadFile = File(...),
-    recipe: str = Form(...),
+    file: Optional[UploadFile] = File(None),
+    recipe: Optional[str] = Form(None),
+    analysis_id: Optional[str] = Form(None),
     current_user: Users = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
+    """
+    Save an analyzed dish.
+
+    With the `analysis_id` from POST /dish/ the staged photo and analysis are
+    used, so neither has to be sent again; `recipe` may still be sent to save
+    an edited version. Without an id, `file` and `recipe` are both required.
+    """
     try:
-        image_url = upload_large_file_to_gcs(file)
-        parsed = json.loads(recipe)
+        staged = None
+        if analysis_id:
+            staged = await get_staged_analysis(analysis_id, str(current_user["id"]))
+            if staged is None:
+                raise HTTPException(status_code=404, detail="Analysis not found or expired")
+        elif file is None or not recipe:
+            raise HTTPException(status_code=400, detail="Send analysis_id, or both file and recipe")
+
+        parsed = json.loads(recipe) if recipe else _recipe_from_analysis(staged.analysis)
 
         dish_name = parsed.get("dish_name")
         recipe_text = parsed.get("recipe")
@@ -267,8 +449,18 @@ async def save_recipe(
         if not dish_name or not recipe_text or not ingredients_calories:
             raise HTTPException(status_code=400, detail="Invalid recipe format")
 
-        # Create recipe with basic info
-        db_recipe = create_recipe_with_categories(
+        # The GCS client blocks, so uploads run off the event loop
+        if staged is not None:
+            image_data, mime_type = staged.image_data, staged.mime_type
+            if not staged.preprocessed:
+                image = await preprocess_image(image_data, mime_type)
+                image_data, mime_type = image.data, image.mime_type
+            image_url = await asyncio.to_thread(upload_bytes_to_gcs, image_data, mime_type)
+        else:
+            image_url = await asyncio.to_thread(upload_large_file_to_gcs, file)
+
+        # Recipe, categories and ingredients are written in one transaction
+        db_recipe = await create_recipe_with_categories(
             db=db,
             user_id=current_user["id"],
             dish_name=dish_name,
@@ -276,29 +468,14 @@ async def save_recipe(
             image_path=image_url,
             estimated_weight_g=estimated_weight_g,
             total_calories_per_100g=total_calories_per_100g,
-            health_categories=health_categories
+            health_categories=health_categories,
+            ingredients_calories=ingredients_calories,
+            is_vegan=is_vegan,
+            is_halal=is_halal,
         )
 
-        # Update is_vegan and is_halal separately
-        db_recipe.is_vegan = is_vegan
-        db_recipe.is_halal = is_halal
-
-        # Add ingredients
-        for item in ingredients_calories:
-            ingredient = item.get("ingredient")
-            calories = item.get("calories")
-            if not ingredient or calories is None:
-                continue
-
-            db_ingredient = IngredientCalories(
-                recipe_id=db_recipe.id,  # type: ignore
-                ingredient=ingredient,
-                calories=calories
-            )
-            db.add(db_ingredient)
-
-        db.commit()
-        db.refresh(db_recipe)
+        if analysis_id:
+            await discard_staged_analysis(analysis_id)
 
         # Invalidate caches after saving new recipe
         await invalidate_recipe_caches()
@@ -310,6 +487,8 @@ async def save_recipe(
             "slug": db_recipe.slug
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         print("❌ Error saving recipe:", str(e))
         raise HTTPException(status_code=500, detail=f"Failed to save recipe: {str(e)}")
@@ -321,10 +500,10 @@ async def update_recipe(
     slug: str,
     recipe_update: RecipePatchRequest,
     current_user: Users = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        recipe = db.query(Recipe).filter(Recipe.slug == slug, Recipe.user_id == current_user["id"]).first()
+        recipe = await db.scalar(select(Recipe).where(Recipe.slug == slug, Recipe.user_id == current_user["id"]))
         if not recipe:
             raise HTTPException(status_code=404, detail="Recipe not found or unauthorized")
         
@@ -333,8 +512,15 @@ async def update_recipe(
         for field, value in update_data.items():
             setattr(recipe, field, value)
         
-        db.commit()
-        db.refresh(recipe)
+        await db.commit()
+        # Reload with the relationships the response reads; lazy loads can't run on an async session
+        recipe = await db.scalar(
+            select(Recipe)
+            .join(Users)
+            .where(Recipe.id == recipe.id)
+            .options(*RECIPE_RESPONSE_LOADS)
+            .execution_options(populate_existing=True)
+        )
         
         return RecipeResponse.from_orm(recipe)
     except Exception as e:
@@ -354,26 +540,23 @@ async def patch_recipe(
     request: Request,
     recipe_id: int,
     patch_data: RecipePatchRequest = Body(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    recipe = db.query(Recipe).filter(Recipe.id == recipe_id).first()
+    recipe = await db.scalar(select(Recipe).where(Recipe.id == recipe_id))
     if not recipe:
         raise HTTPException(status_code=404, detail="Recipe not found")
     
     # Store old slug for cache invalidation
     old_slug = str(recipe.slug)
     
-    # Update recipe fields
-    update_data = {}
+    # Update recipe fields on the instance, so the row counts see a publish toggle
     if patch_data.dish_name is not None:
-        update_data["dish_name"] = patch_data.dish_name
+        recipe.dish_name = patch_data.dish_name
     if patch_data.publish is not None:
-        update_data["is_published"] = patch_data.publish
+        recipe.is_published = patch_data.publish
     
-    # Update using query
-    db.query(Recipe).filter(Recipe.id == recipe_id).update(update_data)
-    db.commit()
-    db.refresh(recipe)
+    await db.commit()
+    await db.refresh(recipe)
 
     # Invalidate caches
     await invalidate_recipe_caches(old_slug)
@@ -397,17 +580,17 @@ async def delete_recipe(
     request: Request,
     recipe_id: int = Path(..., description="ID of the recipe to delete"),
     current_user: Users = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        recipe = db.query(Recipe).filter(Recipe.id == recipe_id, Recipe.user_id == current_user["id"]).first()
+        recipe = await db.scalar(select(Recipe).where(Recipe.id == recipe_id, Recipe.user_id == current_user["id"]))
         if not recipe:
             raise HTTPException(status_code=404, detail="Recipe not found or unauthorized")
 
         recipe_slug = str(recipe.slug)
         
-        db.delete(recipe)
-        db.commit()
+        await db.delete(recipe)
+        await db.commit()
 
         # Invalidate caches
         await invalidate_recipe_caches(recipe_slug)
@@ -421,41 +604,77 @@ async def delete_recipe(
 @limiter.limit("3/minute")
 async def get_public_recipe(
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(20, ge=1, le=100, description="Number of items per page"),
-    sort_by: SortOrder = Query(SortOrder.NEWEST, description="Sort order for recipes")
+    sort_by: SortOrder = Query(SortOrder.NEWEST, description="Sort order for recipes"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces page"),
+    recipe_filter: RecipeFilter = Depends(recipe_filter_params)
 ):
-    cache_key = f"recipes:public:page={page}:size={page_size}:sort={sort_by}"
+    cache_key = f"recipes:public:page={page}:size={page_size}:sort={sort_by}:cursor={cursor}:{recipe_filter.cache_key}"
     
     cached_data = await redis_client.get(cache_key)
     if cached_data:
         return PaginatedRecipesResponse(**json.loads(cached_data))
 
-    response: PaginatedRecipesResponse = get_public_recipes_paginated(db, page=page, page_size=page_size, sort_by=sort_by)
+    try:
+        response: PaginatedRecipesResponse = await get_public_recipes_paginated(db, page=page, page_size=page_size, sort_by=sort_by, cursor=cursor, recipe_filter=recipe_filter)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     await redis_client.set(cache_key, json.dumps(response.model_dump(), cls=DateTimeEncoder), ex=300)
 
     return response
 
 
+@router.get("/search/", response_model=RecipeSearchResponse)
+@limiter.limit("20/minute")
+async def search_public_recipes(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    q: str = Query(..., min_length=2, max_length=200, description="Words to look for in dish names, ingredients and recipe text"),
+    page_size: int = Query(20, ge=1, le=100, description="Number of items per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page")
+):
+    # Matching ignores case and spacing, so equivalent queries share a cache entry
+    q = " ".join(q.split()).lower()
+    cache_key = f"recipes:search:q={q}:size={page_size}:cursor={cursor}"
+
+    cached_data = await redis_client.get(cache_key)
+    if cached_data:
+        return RecipeSearchResponse(**json.loads(cached_data))
+
+    try:
+        response = await search_recipes(db, q, page_size=page_size, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    await redis_client.set(cache_key, json.dumps(response.model_dump(), cls=DateTimeEncoder), ex=300)
+
+    return response
+
 @router.get("/my/", response_model=PaginatedRecipesResponse)
 @limiter.limit("3/minute")
 async def get_my_recipes(
     request: Request,
     current_user: Users = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(20, ge=1, le=100, description="Number of items per page"),
-    sort_by: SortOrder = Query(SortOrder.NEWEST, description="Sort order for recipes")
+    sort_by: SortOrder = Query(SortOrder.NEWEST, description="Sort order for recipes"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces page"),
+    recipe_filter: RecipeFilter = Depends(recipe_filter_params)
 ):
-    cache_key = f"recipes:my:user_id={current_user['id']}:page={page}:size={page_size}:sort={sort_by}"
+    cache_key = f"recipes:my:user_id={current_user['id']}:page={page}:size={page_size}:sort={sort_by}:cursor={cursor}:{recipe_filter.cache_key}"
     
     cached_data = await redis_client.get(cache_key)
     if cached_data:
         return PaginatedRecipesResponse(**json.loads(cached_data))
 
-    response: PaginatedRecipesResponse = get_my_recipes_paginated(db, current_user["id"], page=page, page_size=page_size, sort_by=sort_by)
+    try:
+        response: PaginatedRecipesResponse = await get_my_recipes_paginated(db, current_user["id"], page=page, page_size=page_size, sort_by=sort_by, cursor=cursor, recipe_filter=recipe_filter)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     await redis_client.set(cache_key, json.dumps(response.model_dump(), cls=DateTimeEncoder), ex=300)
 
@@ -469,18 +688,23 @@ async def get_my_recipes(
 async def get_favorite_revipes(
     request: Request,
     current_user: Users = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(20, ge=1, le=100, description="Number of items per page"),
-    sort_by: SortOrder = Query(SortOrder.NEWEST, description="Sort order for recipes")
+    sort_by: SortOrder = Query(SortOrder.NEWEST, description="Sort order for recipes"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces page"),
+    recipe_filter: RecipeFilter = Depends(recipe_filter_params)
 ):
-    cache_key = f"favorites:user_id={current_user['id']}:page={page}:size={page_size}:sort={sort_by}"
+    cache_key = f"favorites:user_id={current_user['id']}:page={page}:size={page_size}:sort={sort_by}:cursor={cursor}:{recipe_filter.cache_key}"
 
     cached_data = await redis_client.get(cache_key)
     if cached_data:
         return  PaginatedFavoriteRecipesResponse(**json.loads(cached_data))
 
-    response: PaginatedFavoriteRecipesResponse = get_favorite_recipes_paginated(db, current_user["id"], page=page, page_size=page_size, sort_by=sort_by)
+    try:
+        response: PaginatedFavoriteRecipesResponse = await get_favorite_recipes_paginated(db, current_user["id"], page=page, page_size=page_size, sort_by=sort_by, cursor=cursor, recipe_filter=recipe_filter)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     await redis_client.set(cache_key, json.dumps(response.model_dump(), cls=DateTimeEncoder), ex=300)
 
@@ -492,11 +716,11 @@ async def add_recipe_to_favorites(
     request: Request,
     recipe_id: int = Path(..., description="Recipe ID to add to favorites"),
     current_user: Users = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Add recipe to user's favorites"""
     try:
-        success = add_to_favorites(db, current_user["id"], recipe_id)
+        success = await add_to_favorites(db, current_user["id"], recipe_id)
         
         if success:
             # Инвалидируем кэш избранного для пользователя
@@ -521,11 +745,11 @@ async def remove_recipe_from_favorites(
     request: Request,
     recipe_id: int = Path(..., description="Recipe ID to remove from favorites"),
     current_user: Users = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Remove recipe from user's favorites"""
     try:
-        success = remove_from_favorites(db, current_user["id"], recipe_id)
+        success = await remove_from_favorites(db, current_user["id"], recipe_id)
         
         if success:
             # Инвалидируем кэш избранного для пользователя
@@ -547,11 +771,11 @@ async def check_favorite_status(
     request: Request,
     recipe_id: int = Path(..., description="Recipe ID to check"),
     current_user: Users = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Check if recipe is in user's favorites"""
     try:
-        is_favorited = is_recipe_favorited(db, current_user["id"], recipe_id)
+        is_favorited = await is_recipe_favorited(db, current_user["id"], recipe_id)
         
         return FavoriteStatusResponse(
             is_favorited=is_favorited,
@@ -566,10 +790,10 @@ async def check_favorite_status(
 
 @router.get("/categories/", response_model=CategoryListResponse)
 @limiter.limit("3/minute")
-async def get_all_categories(request: Request, db: Session = Depends(get_db)):
+async def get_all_categories(request: Request, db: AsyncSession = Depends(get_async_db)):
     """Get all available categories"""
     try:
-        categories = get_categories(db)
+        categories = await get_categories(db)
         return CategoryListResponse(categories=categories) # type: ignore
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get categories: {str(e)}")
@@ -587,11 +811,11 @@ async def get_recipe_image_url(
     request: Request,
     recipe_id: int,
     current_user: Users = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get signed URL for recipe image"""
     try:
-        recipe = db.query(Recipe).filter(Recipe.id == recipe_id).first()
+        recipe = await db.scalar(select(Recipe).where(Recipe.id == recipe_id))
         if not recipe:
             raise HTTPException(status_code=404, detail="Recipe not found")
         
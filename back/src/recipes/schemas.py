@@ -1,8 +1,11 @@
 # schemas.py
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, field_validator
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 from enum import Enum
+import re
+
+from src.constants import HEALTH_CATEGORIES
 
 class SortOrder(str, Enum):
     NEWEST = "newest"
@@ -10,6 +13,39 @@ class SortOrder(str, Enum):
     NAME_ASC = "name_asc"
     NAME_DESC = "name_desc"
 
+class CategoryMatch(str, Enum):
+    ALL = "all"
+    ANY = "any"
+
+class RecipeFilter(BaseModel):
+    """Listing filter; several categories must all match, or any one with category_match=any"""
+    categories: List[str] = []
+    category_match: CategoryMatch = CategoryMatch.ALL
+    vegan: bool = False
+    halal: bool = False
+
+    @field_validator("categories")
+    @classmethod
+    def _known_categories(cls, value):
+        unknown = [name for name in value if name not in HEALTH_CATEGORIES]
+        if unknown:
+            raise ValueError(f"Unknown health categories: {', '.join(unknown)}")
+        return sorted(set(value))
+
+    @property
+    def is_active(self) -> bool:
+        return bool(self.categories or self.vegan or self.halal)
+
+    @property
+    def cache_key(self) -> str:
+        return f"cat={','.join(self.categories)}:match={self.category_match.value}:vegan={self.vegan}:halal={self.halal}"
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
 class CategoryCreate(BaseModel):
     name: str
 
@@ -69,6 +105,94 @@ class RecipeResponse(BaseModel):
 
     model_config = {"from_attributes": True}
 
+# Stage outputs of the analysis pipeline, validated and normalized by the assembler
+def _to_int(value: Any) -> Optional[int]:
+    """Accept 120, 120.4, "120", "~120 kcal" from the model; None if there's no number"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return round(value)
+    match = re.search(r"-?\d+(?:[.,]\d+)?", str(value))
+    return round(float(match.group().replace(",", "."))) if match else None
+
+class RecipeStageOutput(BaseModel):
+    dish_name: str
+    ingredients: List[str] = []
+    recipe: str
+
+    @field_validator("ingredients", mode="before")
+    @classmethod
+    def _ingredients_as_strings(cls, value):
+        if not isinstance(value, list):
+            return []
+        return [str(item).strip() for item in value if str(item).strip()]
+
+    @field_validator("recipe", mode="before")
+    @classmethod
+    def _steps_as_text(cls, value):
+        if isinstance(value, list):
+            return "\n".join(f"{i}. {str(step).strip()}" for i, step in enumerate(value, start=1))
+        return value
+
+class CaloriesStageOutput(BaseModel):
+    dish_name: Optional[str] = None
+    ingredients_calories: Dict[str, int] = {}
+    estimated_weight_g: Optional[int] = None
+    total_calories_per_100g: Optional[int] = None
+
+    @field_validator("ingredients_calories", mode="before")
+    @classmethod
+    def _calories_as_mapping(cls, value):
+        if isinstance(value, list):
+            value = {
+                item.get("ingredient"): item.get("calories")
+                for item in value
+                if isinstance(item, dict) and item.get("ingredient")
+            }
+        if not isinstance(value, dict):
+            return {}
+        calories = {}
+        for ingredient, amount in value.items():
+            amount = _to_int(amount)
+            if ingredient and amount is not None:
+                calories[str(ingredient).strip()] = amount
+        return calories
+
+    @field_validator("estimated_weight_g", "total_calories_per_100g", mode="before")
+    @classmethod
+    def _number(cls, value):
+        return _to_int(value)
+
+class HealthStageOutput(BaseModel):
+    health_categories: List[str] = []
+    is_vegan: bool = False
+    is_halal: bool = False
+
+    @field_validator("health_categories", mode="before")
+    @classmethod
+    def _only_known_categories(cls, value):
+        if not isinstance(value, list):
+            return []
+        canonical = {name.lower(): name for name in HEALTH_CATEGORIES}
+        categories = []
+        for name in value:
+            category = canonical.get(str(name).strip().lower())
+            if category and category not in categories:
+                categories.append(category)
+        return categories
+
+class DeliveryLink(BaseModel):
+    product: str
+    link: str
+
+class DishAnalysis(BaseModel):
+    recipe: RecipeStageOutput
+    calories: CaloriesStageOutput
+    health_categories: List[str] = []
+    is_vegan: bool = False
+    is_halal: bool = False
+    delivery: List[DeliveryLink] = []
+
 # Дополнительная схема для AI ответа
 class AIRecipeResponse(BaseModel):
     dish_name: str
@@ -98,9 +222,17 @@ class RecipePatchRequest(BaseModel):
 class PaginatedRecipesResponse(BaseModel):
     recipes: List[RecipeResponse]
     total: int
-    page: int
+    # None when the page was requested by cursor
+    page: Optional[int] = None
     page_size: int
     total_pages: int
+    next_cursor: Optional[str] = None
+
+class RecipeSearchResponse(BaseModel):
+    recipes: List[RecipeResponse]
+    query: str
+    page_size: int
+    next_cursor: Optional[str] = None
 
 #Favorirites
 class FavoriteRecipeResponse(BaseModel):
@@ -126,9 +258,11 @@ class FavoriteToggleRequest(BaseModel):
 class PaginatedFavoriteRecipesResponse(BaseModel):
     recipes: List[FavoriteRecipeResponse]
     total: int
-    page: int
+    # None when the page was requested by cursor
+    page: Optional[int] = None
     page_size: int
     total_pages: int
+    next_cursor: Optional[str] = None
 
 class FavoriteStatusResponse(BaseModel):
     is_favorited: bool
@@ -138,4 +272,27 @@ class FavoriteStatusResponse(BaseModel):
 class CategoryListResponse(BaseModel):
     categories: List[CategoryResponse]
 
-    model_config = {"from_attributes": True}
\ No newline at end of file
+    model_config = {"from_attributes": True}
+
+# Analysis jobs
+class AnalysisJobCreatedResponse(BaseModel):
+    job_id: str
+    status: JobStatus
+
+class AnalysisJobResponse(BaseModel):
+    job_id: str
+    status: JobStatus
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+# Batch analysis
+class BatchAnalysisItem(BaseModel):
+    index: int
+    filename: Optional[str] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+
+class BatchAnalysisResponse(BaseModel):
+    results: List[BatchAnalysisItem]
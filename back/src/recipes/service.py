@@ -1,7 +1,13 @@
-from src.recipes.models import Recipe, FavoriteRecipe, Category, HEALTH_CATEGORIES
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from src.recipes.models import Recipe, FavoriteRecipe, Category, IngredientCalories, HEALTH_CATEGORIES, SEARCH_CONFIG
+from sqlalchemy import func, insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager, make_transient_to_detached, selectinload
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from math import ceil
+from datetime import datetime
+import base64
+import binascii
+import json
 
 from src.auth.models import Users
 from src.recipes.schemas import (
@@ -11,12 +17,122 @@ from src.recipes.schemas import (
     CategoryResponse,
     PaginatedRecipesResponse,
     PaginatedFavoriteRecipesResponse,
+    RecipeSearchResponse,
+    RecipeFilter,
     FavoriteRecipeResponse,
     SortOrder
 )
 from src.gcs.signed_urls import signed_url_service
+from src.recipes.filters import filter_conditions
+from src.services.row_counts import (
+    RECIPES,
+    PUBLISHED_RECIPES,
+    get_row_count,
+    user_recipes,
+    user_favorites,
+)
+
+# Everything _build_recipe_response reads. The list queries already join users,
+# so the author comes from that join; the collections take one IN query each,
+# which keeps a page at a fixed number of queries whatever its size.
+RECIPE_RESPONSE_LOADS = (
+    contains_eager(Recipe.user),
+    selectinload(Recipe.ingredients_calories),
+    selectinload(Recipe.categories),
+)
+
+# Sort column and direction per SortOrder; Recipe.id breaks ties so every
+# position in the listing is unique and can serve as a cursor
+SORT_KEYS = {
+    SortOrder.NEWEST: (Recipe.created_at, True),
+    SortOrder.OLDEST: (Recipe.created_at, False),
+    SortOrder.NAME_ASC: (Recipe.dish_name, False),
+    SortOrder.NAME_DESC: (Recipe.dish_name, True),
+}
+# Search results are ordered by relevance instead of a SortOrder
+SEARCH_SORT = "rank"
 
 # Helper functions
+def _pack_cursor(sort: str, value: Any, recipe_id: int) -> str:
+    payload = {
+        "sort": sort,
+        "value": value.isoformat() if isinstance(value, datetime) else value,
+        "id": recipe_id,
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def _unpack_cursor(cursor: str, sort: str) -> Tuple[Any, int]:
+    """(sort value, recipe id) of the last row of the previous page; ValueError if the cursor is invalid"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        value, recipe_id = payload["value"], int(payload["id"])
+        if payload["sort"] != sort:
+            raise ValueError("Cursor was issued for a different sort order")
+    except (TypeError, KeyError, json.JSONDecodeError, UnicodeDecodeError, binascii.Error) as e:
+        raise ValueError("Invalid cursor") from e
+    return value, recipe_id
+
+
+def _encode_cursor(sort_by: SortOrder, recipe: Recipe) -> str:
+    column, _ = SORT_KEYS[sort_by]
+    return _pack_cursor(sort_by.value, getattr(recipe, column.key), recipe.id)  # type: ignore
+
+
+def _decode_cursor(cursor: str, sort_by: SortOrder) -> Tuple[Any, int]:
+    value, recipe_id = _unpack_cursor(cursor, sort_by.value)
+    if SORT_KEYS[sort_by][0] is Recipe.created_at:
+        try:
+            value = datetime.fromisoformat(value)
+        except (TypeError, ValueError) as e:
+            raise ValueError("Invalid cursor") from e
+    return value, recipe_id
+
+
+async def _paginate(
+    db: AsyncSession,
+    query,
+    sort_by: SortOrder,
+    page: int,
+    page_size: int,
+    cursor: Optional[str],
+    recipe_of: Callable[[Any], Recipe] = lambda row: row
+) -> Tuple[list, Optional[str]]:
+    """
+    One page of the `query` select (which must select from or join Recipe) and the cursor of the next page.
+
+    With a cursor the page starts right after the row it points at, a range scan
+    on (sort column, id) that costs the same at any depth; without one it falls
+    back to OFFSET by page number.
+    """
+    column, descending = SORT_KEYS[sort_by]
+    if descending:
+        query = query.order_by(column.desc(), Recipe.id.desc())
+    else:
+        query = query.order_by(column.asc(), Recipe.id.asc())
+
+    if cursor:
+        position = tuple_(column, Recipe.id)
+        after = _decode_cursor(cursor, sort_by)
+        query = query.where(position < after if descending else position > after)
+    else:
+        query = query.offset((page - 1) * page_size)
+
+    # One extra row tells whether there is a next page
+    rows = (await db.scalars(query.limit(page_size + 1))).unique().all()
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, _encode_cursor(sort_by, recipe_of(rows[-1]))
+
+
+async def _total(db: AsyncSession, counter: str, query, recipe_filter: Optional[RecipeFilter]) -> int:
+    """Listing total: the maintained row count, or a COUNT of the filtered `query`"""
+    if recipe_filter is None or not recipe_filter.is_active:
+        return await get_row_count(db, counter)
+    return await db.scalar(select(func.count()).select_from(query.subquery())) or 0
+
+
 def _build_recipe_response(recipe: Recipe) -> RecipeResponse:
     """Helper function to build RecipeResponse from Recipe model"""
     # Извлекаем blob name из URL и генерируем подписанный URL
@@ -68,28 +184,45 @@ def _build_favorite_recipe_response(favorite_recipe: FavoriteRecipe) -> Favorite
     )
 
 # Category operations
-def get_categories(db: Session) -> List[Category]:
+async def get_categories(db: AsyncSession) -> List[Category]:
     """Get all categories"""
-    return db.query(Category).all()
+    return list(await db.scalars(select(Category)))
 
-def get_category_by_name(db: Session, name: str) -> Optional[Category]:
+async def get_category_by_name(db: AsyncSession, name: str) -> Optional[Category]:
     """Get category by name"""
-    return db.query(Category).filter(Category.name == name).first()
+    return await db.scalar(select(Category).where(Category.name == name).limit(1))
 
-def create_category(db: Session, name: str) -> Category:
-    """Create new category"""
+async def create_category(db: AsyncSession, name: str) -> Category:
+    """Create new category; it is committed with the caller's transaction"""
     category = Category(name=name)
     db.add(category)
-    db.commit()
-    db.refresh(category)
     return category
 
-def get_or_create_category(db: Session, name: str) -> Category:
-    """Get category by name or create if doesn't exist"""
-    category = get_category_by_name(db, name)
-    if not category:
-        category = create_category(db, name)
-    return category
+# Category name -> id. The categories are the fixed HEALTH_CATEGORIES rows and
+# are never renamed or deleted, so the ids are shared by every request of the
+# process and a save attaches its categories without looking them up.
+_category_ids: Dict[str, int] = {}
+
+async def _load_category_ids(db: AsyncSession) -> None:
+    rows = await db.execute(select(Category.id, Category.name).order_by(Category.id))
+    for category_id, name in rows:
+        _category_ids.setdefault(name, category_id)
+
+async def get_categories_by_name(db: AsyncSession, names: List[str]) -> List[Category]:
+    """Categories for the names, from the id cache; missing ones are created"""
+    if any(name not in _category_ids for name in names):
+        await _load_category_ids(db)
+    categories = []
+    for name in names:
+        category_id = _category_ids.get(name)
+        if category_id is None:
+            # Cached once it has been committed and read back by a later load
+            categories.append(await create_category(db, name))
+            continue
+        category = Category(id=category_id, name=name)
+        make_transient_to_detached(category)
+        categories.append(await db.merge(category, load=False))
+    return categories
 
 def validate_categories(category_names: List[str]) -> List[str]:
     """Validate that all category names are in allowed list"""
@@ -110,129 +243,140 @@ def validate_categories(category_names: List[str]) -> List[str]:
     return valid_categories
 
 # Basic recipe operations
-def get_recipes(db: Session) -> List[Recipe]:
-    return db.query(Recipe).join(Users).all()
+async def get_recipes(db: AsyncSession) -> List[Recipe]:
+    return list(await db.scalars(select(Recipe).join(Users)))
 
-def get_recipe_by_slug(db: Session, slug: str) -> Optional[Recipe]:
-    return db.query(Recipe).filter(Recipe.slug == slug).first()  # type: ignore
+async def get_recipe_by_slug(db: AsyncSession, slug: str) -> Optional[Recipe]:
+    return await db.scalar(select(Recipe).where(Recipe.slug == slug).limit(1))  # type: ignore
 
-def get_recipe_response_by_slug(db: Session, slug: str) -> Optional[RecipeResponse]:
+async def get_recipe_response_by_slug(db: AsyncSession, slug: str) -> Optional[RecipeResponse]:
     """Get recipe by slug and return as RecipeResponse for API"""
-    recipe = get_recipe_by_slug(db, slug)
+    recipe = await db.scalar(
+        select(Recipe)
+        .join(Users)
+        .options(*RECIPE_RESPONSE_LOADS)
+        .where(Recipe.slug == slug)  # type: ignore
+        .limit(1)
+    )
     return _build_recipe_response(recipe) if recipe else None
 
 # Recipe pagination
-def get_recipes_paginated(db: Session, page: int = 1, page_size: int = 20, sort_by: SortOrder = SortOrder.NEWEST) -> PaginatedRecipesResponse:
+async def get_recipes_paginated(db: AsyncSession, page: int = 1, page_size: int = 20, sort_by: SortOrder = SortOrder.NEWEST, cursor: Optional[str] = None, recipe_filter: Optional[RecipeFilter] = None) -> PaginatedRecipesResponse:
     """Get all recipes with pagination and sorting"""
-    offset = (page - 1) * page_size
-    
-    query = db.query(Recipe).join(Users)
+    query = select(Recipe).join(Users).where(*filter_conditions(recipe_filter or RecipeFilter()))
     
-    # Apply sorting
-    if sort_by == SortOrder.NEWEST:
-        query = query.order_by(Recipe.created_at.desc())
-    elif sort_by == SortOrder.OLDEST:
-        query = query.order_by(Recipe.created_at.asc())
-    elif sort_by == SortOrder.NAME_ASC:
-        query = query.order_by(Recipe.dish_name.asc())
-    elif sort_by == SortOrder.NAME_DESC:
-        query = query.order_by(Recipe.dish_name.desc())
-    
-    recipes = query.offset(offset).limit(page_size).all()
-    total_recipes = db.query(Recipe).count()
+    recipes, next_cursor = await _paginate(db, query.options(*RECIPE_RESPONSE_LOADS), sort_by, page, page_size, cursor)
+    total_recipes = await _total(db, RECIPES, query, recipe_filter)
     total_pages = ceil(total_recipes / page_size)
     
     return PaginatedRecipesResponse(
         recipes=[_build_recipe_response(r) for r in recipes],
         total=total_recipes,
-        page=page,
+        page=None if cursor else page,
         page_size=page_size,
-        total_pages=total_pages
+        total_pages=total_pages,
+        next_cursor=next_cursor
     )
 
 # Public & My
 
-def get_public_recipes_paginated(db: Session, page: int = 1, page_size: int = 20, sort_by: SortOrder = SortOrder.NEWEST) -> PaginatedRecipesResponse:
+async def get_public_recipes_paginated(db: AsyncSession, page: int = 1, page_size: int = 20, sort_by: SortOrder = SortOrder.NEWEST, cursor: Optional[str] = None, recipe_filter: Optional[RecipeFilter] = None) -> PaginatedRecipesResponse:
     """Get public recipes with pagination and sorting"""
-    offset = (page - 1) * page_size
-    
-    query = db.query(Recipe).join(Users).filter(Recipe.is_published == True)  # type: ignore
-    
-    # Apply sorting
-    if sort_by == SortOrder.NEWEST:
-        query = query.order_by(Recipe.created_at.desc())
-    elif sort_by == SortOrder.OLDEST:
-        query = query.order_by(Recipe.created_at.asc())
-    elif sort_by == SortOrder.NAME_ASC:
-        query = query.order_by(Recipe.dish_name.asc())
-    elif sort_by == SortOrder.NAME_DESC:
-        query = query.order_by(Recipe.dish_name.desc())
+    query = (
+        select(Recipe)
+        .join(Users)
+        .where(Recipe.is_published == True, *filter_conditions(recipe_filter or RecipeFilter()))  # type: ignore
+    )
     
-    recipes = query.offset(offset).limit(page_size).all()
-    total_recipes = db.query(Recipe).filter(Recipe.is_published == True).count()  # type: ignore
+    recipes, next_cursor = await _paginate(db, query.options(*RECIPE_RESPONSE_LOADS), sort_by, page, page_size, cursor)
+    total_recipes = await _total(db, PUBLISHED_RECIPES, query, recipe_filter)
     total_pages = ceil(total_recipes / page_size)
     
     return PaginatedRecipesResponse(
         recipes=[_build_recipe_response(r) for r in recipes],
         total=total_recipes,
-        page=page,
+        page=None if cursor else page,
+        page_size=page_size,
+        total_pages=total_pages,
+        next_cursor=next_cursor
+    )
+
+async def search_recipes(db: AsyncSession, q: str, page_size: int = 20, cursor: Optional[str] = None) -> RecipeSearchResponse:
+    """
+    Published recipes matching `q` (web search syntax: words, "phrases", -excluded), best match first.
+
+    The match runs on the GIN-indexed search_vector; pages continue after the
+    (rank, id) of the previous page's last row.
+    """
+    search_vector = Recipe.__table__.c.search_vector
+    ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+    rank = func.ts_rank_cd(search_vector, ts_query).label("rank")
+    query = (
+        select(Recipe, rank)
+        .join(Users)
+        .options(*RECIPE_RESPONSE_LOADS)
+        .where(Recipe.is_published == True, search_vector.op("@@")(ts_query))  # type: ignore
+        .order_by(rank.desc(), Recipe.id.desc())
+    )
+    if cursor:
+        after_rank, after_id = _unpack_cursor(cursor, SEARCH_SORT)
+        if not isinstance(after_rank, (int, float)):
+            raise ValueError("Invalid cursor")
+        query = query.where(tuple_(rank, Recipe.id) < (after_rank, after_id))
+
+    rows = (await db.execute(query.limit(page_size + 1))).all()
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last_recipe, last_rank = rows[-1]
+        next_cursor = _pack_cursor(SEARCH_SORT, last_rank, last_recipe.id)
+
+    return RecipeSearchResponse(
+        recipes=[_build_recipe_response(recipe) for recipe, _ in rows],
+        query=q,
         page_size=page_size,
-        total_pages=total_pages
+        next_cursor=next_cursor
     )
 
-def get_my_recipes_paginated(db: Session, user_id: int, page: int = 1, page_size: int = 20, sort_by: SortOrder = SortOrder.NEWEST) -> PaginatedRecipesResponse:
+async def get_my_recipes_paginated(db: AsyncSession, user_id: int, page: int = 1, page_size: int = 20, sort_by: SortOrder = SortOrder.NEWEST, cursor: Optional[str] = None, recipe_filter: Optional[RecipeFilter] = None) -> PaginatedRecipesResponse:
     """Get user's recipes with pagination and sorting"""
-    offset = (page - 1) * page_size
-    
-    query = db.query(Recipe).join(Users).filter(Recipe.user_id == user_id)  # type: ignore
-    
-    # Apply sorting
-    if sort_by == SortOrder.NEWEST:
-        query = query.order_by(Recipe.created_at.desc())
-    elif sort_by == SortOrder.OLDEST:
-        query = query.order_by(Recipe.created_at.asc())
-    elif sort_by == SortOrder.NAME_ASC:
-        query = query.order_by(Recipe.dish_name.asc())
-    elif sort_by == SortOrder.NAME_DESC:
-        query = query.order_by(Recipe.dish_name.desc())
+    query = (
+        select(Recipe)
+        .join(Users)
+        .where(Recipe.user_id == user_id, *filter_conditions(recipe_filter or RecipeFilter()))  # type: ignore
+    )
     
-    recipes = query.offset(offset).limit(page_size).all()
-    total_recipes = db.query(Recipe).filter(Recipe.user_id == user_id).count()  # type: ignore
+    recipes, next_cursor = await _paginate(db, query.options(*RECIPE_RESPONSE_LOADS), sort_by, page, page_size, cursor)
+    total_recipes = await _total(db, user_recipes(user_id), query, recipe_filter)
     total_pages = ceil(total_recipes / page_size)
     
     return PaginatedRecipesResponse(
         recipes=[_build_recipe_response(r) for r in recipes],
         total=total_recipes,
-        page=page,
+        page=None if cursor else page,
         page_size=page_size,
-        total_pages=total_pages
+        total_pages=total_pages,
+        next_cursor=next_cursor
     )
 
 # Favorites operations
-def get_favorite_recipes_paginated(db: Session, user_id: int, page: int = 1, page_size: int = 20, sort_by: SortOrder = SortOrder.NEWEST) -> PaginatedFavoriteRecipesResponse:
+async def get_favorite_recipes_paginated(db: AsyncSession, user_id: int, page: int = 1, page_size: int = 20, sort_by: SortOrder = SortOrder.NEWEST, cursor: Optional[str] = None, recipe_filter: Optional[RecipeFilter] = None) -> PaginatedFavoriteRecipesResponse:
     """Get user's favorite recipes with pagination and sorting"""
-    offset = (page - 1) * page_size
-
     query = (
-        db.query(FavoriteRecipe)
+        select(FavoriteRecipe)
         .join(Recipe)
         .join(Users)
-        .filter(FavoriteRecipe.user_id == user_id)
+        .where(FavoriteRecipe.user_id == user_id, *filter_conditions(recipe_filter or RecipeFilter()))
     )
-    
-    # Apply sorting
-    if sort_by == SortOrder.NEWEST:
-        query = query.order_by(Recipe.created_at.desc())
-    elif sort_by == SortOrder.OLDEST:
-        query = query.order_by(Recipe.created_at.asc())
-    elif sort_by == SortOrder.NAME_ASC:
-        query = query.order_by(Recipe.dish_name.asc())
-    elif sort_by == SortOrder.NAME_DESC:
-        query = query.order_by(Recipe.dish_name.desc())
-
-    favorite_recipes = query.offset(offset).limit(page_size).all()
-
-    total_favorite_recipes = db.query(FavoriteRecipe).filter(FavoriteRecipe.user_id == user_id).count()
+
+    favorite_recipes, next_cursor = await _paginate(
+        db,
+        query.options(contains_eager(FavoriteRecipe.recipe).options(*RECIPE_RESPONSE_LOADS)),
+        sort_by, page, page_size, cursor,
+        recipe_of=lambda favorite: favorite.recipe
+    )
+
+    total_favorite_recipes = await _total(db, user_favorites(user_id), query, recipe_filter)
     total_pages = ceil(total_favorite_recipes / page_size)
 
     return PaginatedFavoriteRecipesResponse(
@@ -240,72 +384,80 @@ def get_favorite_recipes_paginated(db: Session, user_id: int, page: int = 1, pag
             _build_favorite_recipe_response(fr) for fr in favorite_recipes
         ],
         total=total_favorite_recipes,
-        page=page,
+        page=None if cursor else page,
         page_size=page_size,
-        total_pages=total_pages
+        total_pages=total_pages,
+        next_cursor=next_cursor
+    )
+
+async def _get_favorite(db: AsyncSession, user_id: int, recipe_id: int) -> Optional[FavoriteRecipe]:
+    return await db.scalar(
+        select(FavoriteRecipe)
+        .where(FavoriteRecipe.user_id == user_id, FavoriteRecipe.recipe_id == recipe_id)
+        .limit(1)
     )
 
-def add_to_favorites(db: Session, user_id: int, recipe_id: int) -> bool:
+async def add_to_favorites(db: AsyncSession, user_id: int, recipe_id: int) -> bool:
     """Add recipe to user's favorites"""
-    recipe = db.query(Recipe).filter(Recipe.id == recipe_id, Recipe.is_published == True).first()  # type: ignore
+    recipe = await db.scalar(select(Recipe).where(Recipe.id == recipe_id, Recipe.is_published == True).limit(1))  # type: ignore
     if not recipe or recipe.user_id == user_id:  # type: ignore
         return False
     
-    existing = db.query(FavoriteRecipe).filter(
-        FavoriteRecipe.user_id == user_id,
-        FavoriteRecipe.recipe_id == recipe_id
-    ).first()
-    
-    if existing:
+    if await _get_favorite(db, user_id, recipe_id):
         return False
     
     favorite = FavoriteRecipe(user_id=user_id, recipe_id=recipe_id)
     db.add(favorite)
-    db.commit()
+    await db.commit()
     return True
 
-def remove_from_favorites(db: Session, user_id: int, recipe_id: int) -> bool:
+async def remove_from_favorites(db: AsyncSession, user_id: int, recipe_id: int) -> bool:
     """Remove recipe from user's favorites"""
-    favorite = db.query(FavoriteRecipe).filter(
-        FavoriteRecipe.user_id == user_id,
-        FavoriteRecipe.recipe_id == recipe_id
-    ).first()
-    
+    favorite = await _get_favorite(db, user_id, recipe_id)
     if not favorite:
         return False
     
-    db.delete(favorite)
-    db.commit()
+    await db.delete(favorite)
+    await db.commit()
     return True
 
-def is_recipe_favorited(db: Session, user_id: int, recipe_id: int) -> bool:
+async def is_recipe_favorited(db: AsyncSession, user_id: int, recipe_id: int) -> bool:
     """Check if recipe is in user's favorites"""
-    return db.query(FavoriteRecipe).filter(
-        FavoriteRecipe.user_id == user_id,
-        FavoriteRecipe.recipe_id == recipe_id
-    ).first() is not None
+    return await _get_favorite(db, user_id, recipe_id) is not None
 
-def get_favorites_count(db: Session, user_id: int) -> int:
+async def get_favorites_count(db: AsyncSession, user_id: int) -> int:
     """Get total count of user's favorite recipes"""
-    return db.query(FavoriteRecipe).filter(FavoriteRecipe.user_id == user_id).count()
+    return await get_row_count(db, user_favorites(user_id))
 
 # Recipe creation with categories
-def create_recipe_with_categories(
-    db: Session, 
+async def create_recipe_with_categories(
+    db: AsyncSession, 
     user_id: int,
     dish_name: str,
     recipe_text: str,
     image_path: str,
     estimated_weight_g: int,
     total_calories_per_100g: int,
-    health_categories: List[str]
+    health_categories: List[str],
+    ingredients_calories: List[Dict[str, Any]],
+    is_vegan: bool = False,
+    is_halal: bool = False,
 ) -> Recipe:
-    """Create recipe with categories"""
+    """
+    Create recipe with categories and ingredients in one transaction.
+
+    Ingredients without a name or calories are skipped. Only the columns of the
+    returned recipe are loaded; its ingredients are bulk inserted, not mapped.
+    """
     
     # Validate categories
-    valid_categories = validate_categories(health_categories)
+    valid_categories = list(dict.fromkeys(validate_categories(health_categories)))
+    ingredients = [
+        {"ingredient": item.get("ingredient"), "calories": item.get("calories")}
+        for item in ingredients_calories
+        if item.get("ingredient") and item.get("calories") is not None
+    ]
     
-    # Create recipe
     recipe = Recipe(
         user_id=user_id,
         dish_name=dish_name,
@@ -313,17 +465,19 @@ def create_recipe_with_categories(
         image_path=image_path,
         estimated_weight_g=estimated_weight_g,
         total_calories_per_100g=total_calories_per_100g,
+        is_vegan=is_vegan,
+        is_halal=is_halal,
+        # Feeds the recipe's generated search vector
+        ingredients_text=", ".join(item["ingredient"] for item in ingredients),
+        categories=await get_categories_by_name(db, valid_categories),
     )
     
     db.add(recipe)
-    db.flush()  # Get recipe ID
+    await db.flush()  # Recipe and its recipe_categories rows; gets the id
     recipe.generate_slug()
     
-    # Add categories
-    for category_name in valid_categories:
-        category = get_or_create_category(db, category_name)
-        recipe.categories.append(category)
+    if ingredients:
+        await db.execute(insert(IngredientCalories), [{"recipe_id": recipe.id, **item} for item in ingredients])
     
-    db.commit()
-    db.refresh(recipe)
-    return recipe
\ No newline at end of file
+    await db.commit()
+    return recipe
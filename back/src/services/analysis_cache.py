@@ -0,0 +1,175 @@
+import asyncio
+import hashlib
+import io
+import json
+import time
+from typing import List, Optional
+
+from src.config import (
+    ANALYSIS_CACHE_ENABLED,
+    ANALYSIS_CACHE_TTL_SECONDS,
+    ANALYSIS_CACHE_MAX_ENTRIES,
+    ANALYSIS_CACHE_PHASH,
+    ANALYSIS_CACHE_PHASH_MAX_DISTANCE,
+)
+from src.services.redis import redis_client
+
+try:
+    from PIL import Image
+except ImportError:  # perceptual mode is unavailable without Pillow
+    Image = None
+
+ENTRY_PREFIX = "analysis:entry:"
+# Entry keys scored by last access; entries expire ANALYSIS_CACHE_TTL_SECONDS
+# after it, so the members below (now - TTL) are exactly the expired ones
+LRU_KEY = "analysis:lru"
+# Perceptual index: per location and hash part, {phash: entry key}
+PHASH_BUCKET_PREFIX = "analysis:phash:bucket:"
+# Entry key -> its phash, so dropping an entry finds its buckets without a scan
+PHASH_OF_KEY = "analysis:phash:of"
+
+
+def normalize_location(location: Optional[str]) -> str:
+    return " ".join((location or "").lower().split())
+
+
+def image_digest(image_data: bytes) -> str:
+    """Content address of the uploaded bytes"""
+    return hashlib.sha256(image_data).hexdigest()
+
+
+def _location_hash(location: str) -> str:
+    return hashlib.sha256(location.encode()).hexdigest()[:16]
+
+
+def _request_id(digest: str, location: str) -> str:
+    return f"{digest}:{_location_hash(location)}"
+
+
+def _entry_key(digest: str, location: str) -> str:
+    return f"{ENTRY_PREFIX}{_request_id(digest, location)}"
+
+
+def analysis_key(image_data: bytes, location: Optional[str]) -> str:
+    """Identity of an analysis request: the exact image bytes plus the normalized location"""
+    return _request_id(image_digest(image_data), normalize_location(location))
+
+
+def _perceptual_hash(image_data: bytes) -> Optional[str]:
+    """64-bit difference hash; stable across re-encoding and resizing"""
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(image_data)) as img:
+            pixels = list(img.convert("L").resize((9, 8), Image.Resampling.LANCZOS).getdata())
+    except Exception as e:
+        print(f"Perceptual hash failed: {e}")
+        return None
+
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (1 if left > right else 0)
+    return f"{bits:016x}"
+
+
+def _hamming(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+def _bucket_keys(phash: str, location_hash: str) -> List[str]:
+    """
+    Index buckets of a hash: it is split into MAX_DISTANCE + 1 parts, and by
+    pigeonhole any hash within MAX_DISTANCE bits equals it in at least one part.
+    """
+    parts = ANALYSIS_CACHE_PHASH_MAX_DISTANCE + 1
+    width = -(-64 // parts)
+    bits = int(phash, 16)
+    return [
+        f"{PHASH_BUCKET_PREFIX}{location_hash}:{part}:{(bits >> (part * width)) & ((1 << width) - 1):x}"
+        for part in range(parts)
+    ]
+
+
+async def _find_similar(phash: str, location: str) -> Optional[str]:
+    """Entry key of the closest cached image for this location, if close enough"""
+    best_key, best_distance = None, ANALYSIS_CACHE_PHASH_MAX_DISTANCE + 1
+    for bucket in _bucket_keys(phash, _location_hash(location)):
+        for candidate_hash, entry_key in (await redis_client.hgetall(bucket)).items():
+            distance = _hamming(phash, candidate_hash)
+            if distance < best_distance:
+                best_key, best_distance = entry_key, distance
+    return best_key
+
+
+async def get_cached_analysis(image_data: bytes, location: Optional[str]) -> Optional[dict]:
+    """Return a previously computed analysis for the same image and location"""
+    if not ANALYSIS_CACHE_ENABLED:
+        return None
+    try:
+        location = normalize_location(location)
+        key = _entry_key(image_digest(image_data), location)
+        cached = await redis_client.get(key)
+
+        if cached is None and ANALYSIS_CACHE_PHASH:
+            phash = await asyncio.to_thread(_perceptual_hash, image_data)
+            similar_key = await _find_similar(phash, location) if phash else None
+            if similar_key:
+                cached = await redis_client.get(similar_key)
+                key = similar_key
+
+        if cached is None:
+            return None
+
+        await redis_client.expire(key, ANALYSIS_CACHE_TTL_SECONDS)
+        await redis_client.zadd(LRU_KEY, {key: time.time()})
+        return json.loads(cached)
+    except Exception as e:
+        print(f"Analysis cache read error: {e}")
+        return None
+
+
+async def cache_analysis(image_data: bytes, location: Optional[str], result: dict) -> None:
+    """Store an analysis result, then drop expired entries and the least recently used over the limit"""
+    if not ANALYSIS_CACHE_ENABLED:
+        return
+    try:
+        location = normalize_location(location)
+        key = _entry_key(image_digest(image_data), location)
+        await redis_client.set(key, json.dumps(result), ex=ANALYSIS_CACHE_TTL_SECONDS)
+        await redis_client.zadd(LRU_KEY, {key: time.time()})
+
+        if ANALYSIS_CACHE_PHASH:
+            phash = await asyncio.to_thread(_perceptual_hash, image_data)
+            if phash:
+                for bucket in _bucket_keys(phash, _location_hash(location)):
+                    await redis_client.hset(bucket, phash, key)
+                await redis_client.hset(PHASH_OF_KEY, key, phash)
+
+        await _evict()
+    except Exception as e:
+        print(f"Analysis cache write error: {e}")
+
+
+async def _drop_entries(keys: List[str]) -> None:
+    """Delete entries together with their LRU members and perceptual index fields"""
+    await redis_client.delete(*keys)
+    await redis_client.zrem(LRU_KEY, *keys)
+    for key, phash in zip(keys, await redis_client.hmget(PHASH_OF_KEY, keys)):
+        if phash is None:
+            continue
+        for bucket in _bucket_keys(phash, key.rsplit(":", 1)[1]):
+            # A newer entry with the same phash may own the field by now
+            if await redis_client.hget(bucket, phash) == key:
+                await redis_client.hdel(bucket, phash)
+    await redis_client.hdel(PHASH_OF_KEY, *keys)
+
+
+async def _evict() -> None:
+    expired = await redis_client.zrangebyscore(LRU_KEY, "-inf", time.time() - ANALYSIS_CACHE_TTL_SECONDS)
+    overflow = await redis_client.zcard(LRU_KEY) - len(expired) - ANALYSIS_CACHE_MAX_ENTRIES
+    evicted = await redis_client.zrange(LRU_KEY, len(expired), len(expired) + overflow - 1) if overflow > 0 else []
+    if expired or evicted:
+        await _drop_entries(expired + evicted)
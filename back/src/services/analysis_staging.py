@@ -0,0 +1,75 @@
+import base64
+import json
+import uuid
+from typing import NamedTuple, Optional
+
+from src.config import ANALYSIS_STAGING_TTL_SECONDS
+from src.services.redis import redis_client
+
+STAGED_PREFIX = "analysis:staged:"
+
+
+class StagedAnalysis(NamedTuple):
+    image_data: bytes
+    mime_type: Optional[str]
+    filename: Optional[str]
+    analysis: dict
+    # False when the upload was staged as received, e.g. after a cache hit
+    preprocessed: bool
+
+
+def _staged_key(analysis_id: str) -> str:
+    return f"{STAGED_PREFIX}{analysis_id}"
+
+
+async def stage_analysis(
+    user_id: str,
+    image_data: bytes,
+    mime_type: Optional[str],
+    filename: Optional[str],
+    analysis: dict,
+    preprocessed: bool = True
+) -> Optional[str]:
+    """
+    Keep an analyzed image and its analysis until the user saves the recipe.
+
+    Returns the analysis id POST /dish/save/ accepts instead of the photo and
+    the analysis JSON, or None if staging failed (the client then falls back
+    to uploading both). The entry expires after ANALYSIS_STAGING_TTL_SECONDS.
+    """
+    analysis_id = uuid.uuid4().hex
+    key = _staged_key(analysis_id)
+    try:
+        await redis_client.hset(key, mapping={
+            "user_id": user_id,
+            # The shared client decodes responses, so the bytes travel as base64
+            "image": base64.b64encode(image_data).decode(),
+            "mime_type": mime_type or "",
+            "filename": filename or "",
+            "analysis": json.dumps(analysis),
+            "preprocessed": int(preprocessed),
+        })
+        await redis_client.expire(key, ANALYSIS_STAGING_TTL_SECONDS)
+    except Exception as e:
+        print(f"Analysis staging error: {e}")
+        return None
+    return analysis_id
+
+
+async def get_staged_analysis(analysis_id: str, user_id: str) -> Optional[StagedAnalysis]:
+    """The staged analysis, or None if it expired or belongs to another user"""
+    staged = await redis_client.hgetall(_staged_key(analysis_id))
+    if not staged or staged.get("user_id") != user_id:
+        return None
+
+    return StagedAnalysis(
+        image_data=base64.b64decode(staged["image"]),
+        mime_type=staged.get("mime_type") or None,
+        filename=staged.get("filename") or None,
+        analysis=json.loads(staged["analysis"]),
+        preprocessed=staged.get("preprocessed", "1") == "1",
+    )
+
+
+async def discard_staged_analysis(analysis_id: str) -> None:
+    await redis_client.delete(_staged_key(analysis_id))
@@ -0,0 +1,97 @@
+import asyncio
+import io
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional
+
+from PIL import Image, ImageOps
+
+from src.config import (
+    IMAGE_PREPROCESS_ENABLED,
+    IMAGE_PREPROCESS_WORKERS,
+    IMAGE_MAX_EDGE,
+    IMAGE_OUTPUT_FORMAT,
+    IMAGE_OUTPUT_QUALITY,
+)
+from src.services.redis import redis_client
+
+IMAGE_STATS_KEY = "analysis:image_bytes"
+# Upload formats the model takes as they are, so they can skip a re-encode that doesn't pay off
+PASSTHROUGH_FORMATS = {"JPEG", "PNG", "WEBP"}
+# Metadata that can identify the user (location, device); never forwarded
+IDENTIFYING_METADATA = ("exif", "xmp")
+
+# Pillow releases the GIL while decoding/resizing, so a small thread pool keeps
+# the event loop free without the pickling overhead of a process pool.
+_executor = ThreadPoolExecutor(max_workers=IMAGE_PREPROCESS_WORKERS, thread_name_prefix="image-preprocess")
+
+
+class PreprocessedImage(NamedTuple):
+    data: bytes
+    mime_type: Optional[str]
+    original_size: int
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_size - len(self.data)
+
+
+def preprocess_image_sync(image_data: bytes, mime_type: Optional[str]) -> PreprocessedImage:
+    """
+    Apply EXIF orientation, drop metadata, downscale to IMAGE_MAX_EDGE and re-encode.
+
+    Anything Pillow can't decode is passed through unchanged. So is an upload that
+    needed no downscaling and carries no EXIF/XMP, when re-encoding it would not make
+    it smaller (e.g. a small, already optimized JPEG or WebP). Uploads with such
+    metadata are always re-encoded, even if that costs bytes, so it is stripped.
+    """
+    try:
+        with Image.open(io.BytesIO(image_data)) as img:
+            source_format = img.format
+            has_metadata = bool(img.getexif()) or any(key in img.info for key in IDENTIFYING_METADATA)
+            img = ImageOps.exif_transpose(img)
+            downscaled = max(img.size) > IMAGE_MAX_EDGE
+            if downscaled:
+                img.thumbnail((IMAGE_MAX_EDGE, IMAGE_MAX_EDGE), Image.Resampling.LANCZOS)
+            if img.mode != "RGB":
+                img = img.convert("RGB")
+
+            output = io.BytesIO()
+            # No exif/icc arguments: the re-encoded file carries no metadata
+            img.save(output, format=IMAGE_OUTPUT_FORMAT, quality=IMAGE_OUTPUT_QUALITY, optimize=True)
+    except Exception as e:
+        print(f"Image preprocessing skipped: {e}")
+        return PreprocessedImage(image_data, mime_type, len(image_data))
+
+    processed = output.getvalue()
+    if (
+        not downscaled
+        and not has_metadata
+        and source_format in PASSTHROUGH_FORMATS
+        and len(processed) >= len(image_data)
+    ):
+        return PreprocessedImage(image_data, Image.MIME[source_format], len(image_data))
+    return PreprocessedImage(processed, f"image/{IMAGE_OUTPUT_FORMAT.lower()}", len(image_data))
+
+
+async def _record_bytes(image: PreprocessedImage) -> None:
+    try:
+        await redis_client.hincrby(IMAGE_STATS_KEY, "images", 1)
+        await redis_client.hincrby(IMAGE_STATS_KEY, "original_bytes", image.original_size)
+        await redis_client.hincrby(IMAGE_STATS_KEY, "processed_bytes", len(image.data))
+    except Exception as e:
+        print(f"Image stats error: {e}")
+
+
+async def preprocess_image(image_data: bytes, mime_type: Optional[str]) -> PreprocessedImage:
+    """Preprocess an upload off the event loop and record how many bytes it saved"""
+    if not IMAGE_PREPROCESS_ENABLED:
+        return PreprocessedImage(image_data, mime_type, len(image_data))
+
+    loop = asyncio.get_running_loop()
+    image = await loop.run_in_executor(_executor, preprocess_image_sync, image_data, mime_type)
+    print(
+        f"🖼 Image preprocessed: {image.original_size} → {len(image.data)} bytes "
+        f"({image.bytes_saved} saved)"
+    )
+    await _record_bytes(image)
+    return image
@@ -0,0 +1,43 @@
+from fastapi import Response
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+
+# Model calls take seconds, the local stages (delivery, final) take milliseconds
+LATENCY_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+
+AGENT_DURATION = Histogram(
+    "foodsnap_agent_duration_seconds",
+    "Wall time of one analysis pipeline stage",
+    ["agent", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+AGENT_LLM_CALLS = Counter(
+    "foodsnap_agent_llm_calls_total",
+    "Model requests issued by an agent, including retries and hedges",
+    ["agent"],
+)
+AGENT_TOKENS = Counter(
+    "foodsnap_agent_tokens_total",
+    "Tokens reported by the model per agent",
+    ["agent", "kind"],
+)
+JSON_PARSE_FAILURES = Counter(
+    "foodsnap_json_parse_failures_total",
+    "Model replies that were not valid JSON",
+    ["agent"],
+)
+ANALYSIS_DURATION = Histogram(
+    "foodsnap_analysis_duration_seconds",
+    "End-to-end dish analysis time",
+    ["outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+
+COALESCED_REQUESTS = Counter(
+    "foodsnap_analysis_coalesced_total",
+    "Analyses that reused an identical in-flight analysis instead of running the pipeline",
+    ["scope"],
+)
+
+
+def metrics_response() -> Response:
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,244 @@
+import asyncio
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import BigInteger, Column, Integer, String, event, func, inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.auth.models import Users
+from src.config import ROW_COUNTS_FOLD_INTERVAL_SECONDS, ROW_COUNTS_RECONCILE_INTERVAL_SECONDS
+from src.database import Base, SessionLocal
+from src.recipes.models import Recipe, FavoriteRecipe
+
+# Counter names
+RECIPES = "recipes"
+PUBLISHED_RECIPES = "recipes:published"
+USERS = "users"
+ADMINS = "users:admin"
+
+
+def user_recipes(user_id) -> str:
+    return f"recipes:user:{user_id}"
+
+
+def user_favorites(user_id) -> str:
+    return f"favorites:user:{user_id}"
+
+
+class RowCount(Base):
+    """
+    Row counts the listings report as `total`, so a page never runs COUNT(*).
+
+    Writes don't update these rows: the mapper events below append a
+    RowCountDelta in the writer's transaction, and fold_row_count_deltas()
+    periodically moves the deltas in here. A counter's value is its row plus
+    its pending deltas; reconcile_row_counts() recomputes them from the tables.
+    """
+    __tablename__ = "row_counts"
+
+    name = Column(String, primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
+
+
+class RowCountDelta(Base):
+    """
+    One write's change to a counter, not yet folded into RowCount.
+
+    Append-only, so concurrent saves never wait on each other's counter row
+    lock the way an UPDATE of the shared "recipes" row made them.
+    """
+    __tablename__ = "row_count_deltas"
+
+    # INTEGER PRIMARY KEY is what autoincrements on SQLite
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    name = Column(String, nullable=False, index=True)
+    delta = Column(BigInteger, nullable=False)
+
+
+_UPSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def _add_to_row_count(connection, name: str, delta: int) -> None:
+    insert = _UPSERTS.get(connection.dialect.name)
+    if insert is not None:
+        statement = insert(RowCount).values(name=name, value=delta)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=[RowCount.name],
+            set_={"value": RowCount.value + delta},
+        ))
+        return
+
+    updated = connection.execute(
+        RowCount.__table__.update().where(RowCount.name == name).values(value=RowCount.value + delta)
+    )
+    if updated.rowcount == 0:
+        connection.execute(RowCount.__table__.insert().values(name=name, value=delta))
+
+
+def _bump(connection, name: str, delta: int) -> None:
+    connection.execute(RowCountDelta.__table__.insert().values(name=name, delta=delta))
+
+
+def _bump_user(connection, counter, user_id: Optional[int], delta: int) -> None:
+    # Recipes of a deleted user keep a NULL user_id and belong to no per-user counter
+    if user_id is not None:
+        _bump(connection, counter(user_id), delta)
+
+
+# Load the previous value on assignment even when it was expired, so
+# after_update can tell a real toggle from setting the same value again
+for _attribute in (Recipe.is_published, Recipe.user_id, Users.is_admin):
+    event.listen(_attribute, "set", lambda target, value, oldvalue, initiator: None, active_history=True)
+
+
+def _changed(target, attribute: str):
+    """(old, new) if the flush changes `attribute`, else None"""
+    history = inspect(target).attrs[attribute].history
+    if not history.has_changes():
+        return None
+    old = history.deleted[0] if history.deleted else None
+    new = history.added[0] if history.added else None
+    return old, new
+
+
+@event.listens_for(Recipe, "after_insert")
+def _recipe_inserted(mapper, connection, recipe):
+    _bump(connection, RECIPES, 1)
+    _bump_user(connection, user_recipes, recipe.user_id, 1)
+    if recipe.is_published:
+        _bump(connection, PUBLISHED_RECIPES, 1)
+
+
+@event.listens_for(Recipe, "after_delete")
+def _recipe_deleted(mapper, connection, recipe):
+    _bump(connection, RECIPES, -1)
+    _bump_user(connection, user_recipes, recipe.user_id, -1)
+    if recipe.is_published:
+        _bump(connection, PUBLISHED_RECIPES, -1)
+
+
+@event.listens_for(Recipe, "after_update")
+def _recipe_updated(mapper, connection, recipe):
+    published = _changed(recipe, "is_published")
+    if published and bool(published[0]) != bool(published[1]):
+        _bump(connection, PUBLISHED_RECIPES, 1 if published[1] else -1)
+    owner = _changed(recipe, "user_id")
+    if owner:
+        _bump_user(connection, user_recipes, owner[0], -1)
+        _bump_user(connection, user_recipes, owner[1], 1)
+
+
+@event.listens_for(FavoriteRecipe, "after_insert")
+def _favorite_inserted(mapper, connection, favorite):
+    _bump_user(connection, user_favorites, favorite.user_id, 1)
+
+
+@event.listens_for(FavoriteRecipe, "after_delete")
+def _favorite_deleted(mapper, connection, favorite):
+    _bump_user(connection, user_favorites, favorite.user_id, -1)
+
+
+@event.listens_for(Users, "after_insert")
+def _user_inserted(mapper, connection, user):
+    _bump(connection, USERS, 1)
+    if user.is_admin:
+        _bump(connection, ADMINS, 1)
+
+
+@event.listens_for(Users, "after_delete")
+def _user_deleted(mapper, connection, user):
+    _bump(connection, USERS, -1)
+    if user.is_admin:
+        _bump(connection, ADMINS, -1)
+
+
+@event.listens_for(Users, "after_update")
+def _user_updated(mapper, connection, user):
+    admin = _changed(user, "is_admin")
+    if admin and bool(admin[0]) != bool(admin[1]):
+        _bump(connection, ADMINS, 1 if admin[1] else -1)
+
+
+async def get_row_count(db: AsyncSession, name: str) -> int:
+    stored = select(RowCount.value).where(RowCount.name == name).scalar_subquery()
+    pending = select(func.sum(RowCountDelta.delta)).where(RowCountDelta.name == name).scalar_subquery()
+    return await db.scalar(select(func.coalesce(stored, 0) + func.coalesce(pending, 0)))
+
+
+def fold_row_count_deltas(db: Session) -> int:
+    """Move the pending deltas into row_counts; returns how many counters changed"""
+    folded: Dict[str, int] = {}
+    # Only what this DELETE removed is added, so a delta committed meanwhile is
+    # either folded now or left for the next run, never lost
+    deleted = db.execute(RowCountDelta.__table__.delete().returning(RowCountDelta.name, RowCountDelta.delta))
+    for name, delta in deleted:
+        folded[name] = folded.get(name, 0) + delta
+    for name, delta in folded.items():
+        if delta:
+            _add_to_row_count(db.connection(), name, delta)
+    db.commit()
+    return sum(1 for delta in folded.values() if delta)
+
+
+def count_rows(db: Session) -> Dict[str, int]:
+    """Every counter, computed from the tables"""
+    counts = {
+        RECIPES: db.query(Recipe).count(),
+        PUBLISHED_RECIPES: db.query(Recipe).filter(Recipe.is_published == True).count(),  # type: ignore
+        USERS: db.query(Users).count(),
+        ADMINS: db.query(Users).filter(Users.is_admin == True).count(),  # type: ignore
+    }
+    for user_id, count in db.query(Recipe.user_id, func.count()).filter(Recipe.user_id.isnot(None)).group_by(Recipe.user_id):
+        counts[user_recipes(user_id)] = count
+    for user_id, count in db.query(FavoriteRecipe.user_id, func.count()).filter(FavoriteRecipe.user_id.isnot(None)).group_by(FavoriteRecipe.user_id):
+        counts[user_favorites(user_id)] = count
+    return counts
+
+
+def reconcile_row_counts(db: Session) -> Dict[str, int]:
+    """Overwrite the counters with fresh counts; returns {name: drift} for the ones that were off"""
+    fold_row_count_deltas(db)
+    actual = count_rows(db)
+    stored = dict(db.query(RowCount.name, RowCount.value).all())
+
+    drift = {
+        name: stored.get(name, 0) - actual.get(name, 0)
+        for name in set(actual) | set(stored)
+        if stored.get(name, 0) != actual.get(name, 0)
+    }
+    for name, off_by in drift.items():
+        _add_to_row_count(db.connection(), name, -off_by)
+    db.commit()
+    return drift
+
+
+def _maintain_once(reconcile: bool) -> None:
+    db = SessionLocal()
+    try:
+        if reconcile:
+            drift = reconcile_row_counts(db)
+            if drift:
+                print(f"🔢 Row counts reconciled, drift: {drift}")
+        else:
+            fold_row_count_deltas(db)
+    finally:
+        db.close()
+
+
+async def maintain_row_counts(
+    fold_interval: int = ROW_COUNTS_FOLD_INTERVAL_SECONDS,
+    reconcile_interval: int = ROW_COUNTS_RECONCILE_INTERVAL_SECONDS,
+) -> None:
+    """Fold the pending deltas every `fold_interval` seconds and reconcile every `reconcile_interval`"""
+    last_reconcile = None
+    while True:
+        reconcile = last_reconcile is None or time.monotonic() - last_reconcile >= reconcile_interval
+        try:
+            await asyncio.to_thread(_maintain_once, reconcile)
+            if reconcile:
+                last_reconcile = time.monotonic()
+        except Exception as e:
+            print(f"Row count maintenance error: {e}")
+        await asyncio.sleep(fold_interval)
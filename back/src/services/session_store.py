@@ -0,0 +1,301 @@
+import json
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, Session
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+
+from src.config import (
+    ADK_SESSION_BACKEND,
+    ADK_SESSION_MAX_COUNT,
+    ADK_SESSION_MAX_BYTES,
+    ADK_SESSION_IDLE_TTL_SECONDS,
+)
+from src.services.redis import redis_client
+
+SessionKey = Tuple[str, str, str]
+
+
+class SessionStoreFull(Exception):
+    """Every stored session belongs to a running analysis and the store is at its limit"""
+
+
+def event_size(event: Event) -> int:
+    """Approximate memory held by an event: inline blobs (the uploaded image) plus text"""
+    size = 0
+    if event.content and event.content.parts:
+        for part in event.content.parts:
+            if part.inline_data and part.inline_data.data:
+                size += len(part.inline_data.data)
+            if part.text:
+                size += len(part.text)
+    if event.actions and event.actions.state_delta:
+        size += sum(len(str(value)) for value in event.actions.state_delta.values())
+    return size
+
+
+def _apply_config(session: Session, config: Optional[GetSessionConfig]) -> Session:
+    if not config:
+        return session
+    events = session.events
+    if config.after_timestamp:
+        events = [event for event in events if event.timestamp >= config.after_timestamp]
+    if config.num_recent_events:
+        events = events[-config.num_recent_events:]
+    return session.model_copy(update={"events": events})
+
+
+class _Entry:
+    __slots__ = ("session", "size", "last_access")
+
+    def __init__(self, session: Session):
+        self.session = session
+        self.size = 0
+        self.last_access = time.monotonic()
+
+
+class BoundedSessionService(BaseSessionService):
+    """
+    In-process session store with a session count limit, a byte budget and idle expiry.
+
+    Every stored session is in flight: the analysis that created it deletes it
+    when the run ends. Sessions are therefore never evicted to make room, since
+    that would fail the run still using them. create_session instead raises
+    SessionStoreFull while either limit is reached. Only sessions idle for
+    longer than `idle_ttl`, left behind by runs that died, are dropped. Unlike
+    InMemorySessionService, get_session returns the stored object itself
+    rather than a deep copy of it.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = ADK_SESSION_MAX_COUNT,
+        max_bytes: int = ADK_SESSION_MAX_BYTES,
+        idle_ttl: int = ADK_SESSION_IDLE_TTL_SECONDS,
+    ):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        # In last-access order, so the idle ones are at the front
+        self._sessions: "OrderedDict[SessionKey, _Entry]" = OrderedDict()
+        self.total_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _drop(self, key: SessionKey) -> None:
+        entry = self._sessions.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry.size
+
+    def _expire(self) -> None:
+        deadline = time.monotonic() - self.idle_ttl
+        while self._sessions:
+            key, entry = next(iter(self._sessions.items()))
+            if entry.last_access >= deadline:
+                break
+            self._drop(key)
+
+    def _check_capacity(self) -> None:
+        self._expire()
+        if len(self._sessions) >= self.max_sessions or self.total_bytes >= self.max_bytes:
+            raise SessionStoreFull(f"{len(self._sessions)} analyses in progress, try again shortly")
+
+    def _touch(self, key: SessionKey) -> Optional[_Entry]:
+        entry = self._sessions.get(key)
+        if entry is not None:
+            entry.last_access = time.monotonic()
+            self._sessions.move_to_end(key)
+        return entry
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        self._check_capacity()
+        session = Session(
+            id=session_id.strip() if session_id and session_id.strip() else str(uuid.uuid4()),
+            app_name=app_name,
+            user_id=user_id,
+            state=dict(state or {}),
+            last_update_time=time.time(),
+        )
+        self._sessions[(app_name, user_id, session.id)] = _Entry(session)
+        return session
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        key = (app_name, user_id, session_id)
+        entry = self._sessions.get(key)
+        if entry is None:
+            return None
+        if entry.last_access < time.monotonic() - self.idle_ttl:
+            self._drop(key)
+            return None
+        self._touch(key)
+        return _apply_config(entry.session, config)
+
+    async def list_sessions(self, *, app_name: str, user_id: str) -> ListSessionsResponse:
+        return ListSessionsResponse(sessions=[
+            entry.session.model_copy(update={"state": {}, "events": []})
+            for (app, user, _), entry in self._sessions.items()
+            if app == app_name and user == user_id
+        ])
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        self._drop((app_name, user_id, session_id))
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        event = await super().append_event(session, event)
+        if event.partial:
+            return event
+        session.last_update_time = event.timestamp
+
+        entry = self._touch((session.app_name, session.user_id, session.id))
+        if entry is not None:
+            size = event_size(event)
+            entry.size += size
+            self.total_bytes += size
+        return event
+
+
+class RedisSessionService(BaseSessionService):
+    """
+    Redis-backed sessions shared by all workers.
+
+    Session metadata and state live in one hash and events in a list next to it;
+    both expire after `idle_ttl` without access. A sorted set of last-access
+    times counts the sessions. As in BoundedSessionService, every stored session
+    is in flight, so create_session raises SessionStoreFull at the limit and
+    never evicts a session.
+    """
+
+    PREFIX = "adk:session:"
+    INDEX_KEY = "adk:sessions"
+
+    def __init__(
+        self,
+        client=redis_client,
+        max_sessions: int = ADK_SESSION_MAX_COUNT,
+        idle_ttl: int = ADK_SESSION_IDLE_TTL_SECONDS,
+    ):
+        self.client = client
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+
+    def _key(self, app_name: str, user_id: str, session_id: str) -> str:
+        return f"{self.PREFIX}{app_name}:{user_id}:{session_id}"
+
+    async def _touch(self, key: str) -> None:
+        await self.client.expire(key, self.idle_ttl)
+        await self.client.expire(f"{key}:events", self.idle_ttl)
+        await self.client.zadd(self.INDEX_KEY, {key: time.time()})
+
+    async def _check_capacity(self) -> None:
+        # Entries that already expired are dropped from the index as well
+        await self.client.zremrangebyscore(self.INDEX_KEY, "-inf", time.time() - self.idle_ttl)
+        count = await self.client.zcard(self.INDEX_KEY)
+        if count >= self.max_sessions:
+            raise SessionStoreFull(f"{count} analyses in progress, try again shortly")
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        await self._check_capacity()
+        session = Session(
+            id=session_id.strip() if session_id and session_id.strip() else str(uuid.uuid4()),
+            app_name=app_name,
+            user_id=user_id,
+            state=dict(state or {}),
+            last_update_time=time.time(),
+        )
+        key = self._key(app_name, user_id, session.id)
+        await self.client.hset(key, mapping={
+            "last_update_time": session.last_update_time,
+            "state": json.dumps(session.state),
+        })
+        await self._touch(key)
+        return session
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        key = self._key(app_name, user_id, session_id)
+        stored = await self.client.hgetall(key)
+        if not stored:
+            return None
+
+        events = [Event.model_validate_json(raw) for raw in await self.client.lrange(f"{key}:events", 0, -1)]
+        await self._touch(key)
+        session = Session(
+            id=session_id,
+            app_name=app_name,
+            user_id=user_id,
+            state=json.loads(stored.get("state") or "{}"),
+            events=events,
+            last_update_time=float(stored.get("last_update_time") or 0),
+        )
+        return _apply_config(session, config)
+
+    async def list_sessions(self, *, app_name: str, user_id: str) -> ListSessionsResponse:
+        prefix = self._key(app_name, user_id, "")
+        sessions = []
+        cursor = 0
+        while True:
+            cursor, keys = await self.client.scan(cursor=cursor, match=f"{prefix}*")
+            for key in keys:
+                if key.endswith(":events"):
+                    continue
+                sessions.append(Session(id=key[len(prefix):], app_name=app_name, user_id=user_id))
+            if cursor == 0:
+                break
+        return ListSessionsResponse(sessions=sessions)
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        key = self._key(app_name, user_id, session_id)
+        await self.client.delete(key, f"{key}:events")
+        await self.client.zrem(self.INDEX_KEY, key)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        event = await super().append_event(session, event)
+        if event.partial:
+            return event
+        session.last_update_time = event.timestamp
+
+        key = self._key(session.app_name, session.user_id, session.id)
+        await self.client.rpush(f"{key}:events", event.model_dump_json(exclude_none=True))
+        await self.client.hset(key, mapping={
+            "last_update_time": session.last_update_time,
+            "state": json.dumps(session.state),
+        })
+        await self._touch(key)
+        return event
+
+
+def create_session_service() -> BaseSessionService:
+    if ADK_SESSION_BACKEND == "redis":
+        return RedisSessionService()
+    return BoundedSessionService()
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Optional
+
+from src.config import (
+    ANALYSIS_SINGLE_FLIGHT_ENABLED,
+    ANALYSIS_SINGLE_FLIGHT_LOCK_TTL_SECONDS,
+    ANALYSIS_SINGLE_FLIGHT_RESULT_TTL_SECONDS,
+)
+from src.services.metrics import COALESCED_REQUESTS
+from src.services.redis import redis_client
+
+LOCK_PREFIX = "analysis:inflight:"
+RESULT_PREFIX = "analysis:inflight:result:"
+CHANNEL_PREFIX = "analysis:inflight:done:"
+# Published instead of a result when the leader gives up without one
+ABANDONED = "abandoned"
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent computations of the same key.
+
+    Within a process, duplicates await the leader's future. Across workers, the
+    leader holds a Redis lock (SET NX with a TTL) and publishes the result on a
+    per-key channel; followers subscribe, and take over if the leader abandons
+    the key or its lock expires. Only JSON-serializable results are supported.
+    """
+
+    def __init__(
+        self,
+        client=redis_client,
+        lock_ttl: int = ANALYSIS_SINGLE_FLIGHT_LOCK_TTL_SECONDS,
+        result_ttl: int = ANALYSIS_SINGLE_FLIGHT_RESULT_TTL_SECONDS,
+    ):
+        self.client = client
+        self.lock_ttl = lock_ttl
+        self.result_ttl = result_ttl
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def run(self, key: str, compute: Callable[[], Awaitable[dict]]) -> dict:
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            COALESCED_REQUESTS.labels(scope="process").inc()
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if inflight.cancelled():
+                    # The leader's request went away; start over
+                    return await self.run(key, compute)
+                raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._run_distributed(key, compute)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark it retrieved so a leader without followers doesn't log a warning
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _run_distributed(self, key: str, compute: Callable[[], Awaitable[dict]]) -> dict:
+        token = uuid.uuid4().hex
+        try:
+            acquired = await self.client.set(f"{LOCK_PREFIX}{key}", token, nx=True, ex=self.lock_ttl)
+        except Exception as e:
+            print(f"Single-flight lock error: {e}")
+            return await compute()
+
+        if not acquired:
+            result = await self._follow(key)
+            if result is not None:
+                COALESCED_REQUESTS.labels(scope="redis").inc()
+                return result
+            # The leader abandoned the key; compete for it again
+            return await self._run_distributed(key, compute)
+
+        published = False
+        try:
+            result = await compute()
+            payload = json.dumps(result)
+            await self.client.set(f"{RESULT_PREFIX}{key}", payload, ex=self.result_ttl)
+            await self.client.publish(f"{CHANNEL_PREFIX}{key}", payload)
+            published = True
+            return result
+        finally:
+            try:
+                if not published:
+                    await self.client.publish(f"{CHANNEL_PREFIX}{key}", ABANDONED)
+                if await self.client.get(f"{LOCK_PREFIX}{key}") == token:
+                    await self.client.delete(f"{LOCK_PREFIX}{key}")
+            except Exception as e:
+                print(f"Single-flight release error: {e}")
+
+    async def _follow(self, key: str) -> Optional[dict]:
+        """Wait for another worker's result; None if it abandoned the key"""
+        pubsub = self.client.pubsub()
+        try:
+            await pubsub.subscribe(f"{CHANNEL_PREFIX}{key}")
+            deadline = time.monotonic() + self.lock_ttl
+            while time.monotonic() < deadline:
+                # Checked after subscribing, so a result published in between isn't missed
+                stored = await self.client.get(f"{RESULT_PREFIX}{key}")
+                if stored is not None:
+                    return json.loads(stored)
+
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is not None:
+                    return None if message["data"] == ABANDONED else json.loads(message["data"])
+                if not await self.client.exists(f"{LOCK_PREFIX}{key}"):
+                    # Leader crashed and its lock expired, or it finished just now
+                    stored = await self.client.get(f"{RESULT_PREFIX}{key}")
+                    return json.loads(stored) if stored is not None else None
+            return None
+        finally:
+            await pubsub.aclose()
+
+
+analysis_flight = SingleFlight()
+
+
+async def coalesce(key: str, compute: Callable[[], Awaitable[dict]]) -> dict:
+    if not ANALYSIS_SINGLE_FLIGHT_ENABLED:
+        return await compute()
+    return await analysis_flight.run(key, compute)
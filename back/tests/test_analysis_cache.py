@@ -0,0 +1,80 @@
+import asyncio
+import io
+
+import fakeredis
+from PIL import Image
+
+from src.services import analysis_cache
+
+
+def _photo(shade: int, size=(64, 48), quality: int = 90) -> bytes:
+    image = Image.new("RGB", size)
+    image.putdata([((x * 4 + shade) % 256, (y * 5) % 256, shade) for y in range(size[1]) for x in range(size[0])])
+    output = io.BytesIO()
+    image.save(output, "JPEG", quality=quality)
+    return output.getvalue()
+
+
+def _reencoded(photo: bytes) -> bytes:
+    output = io.BytesIO()
+    Image.open(io.BytesIO(photo)).resize((128, 96)).save(output, "JPEG", quality=60)
+    return output.getvalue()
+
+
+def _use_cache(monkeypatch, max_entries: int):
+    fake = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(analysis_cache, "redis_client", fake)
+    monkeypatch.setattr(analysis_cache, "ANALYSIS_CACHE_ENABLED", True)
+    monkeypatch.setattr(analysis_cache, "ANALYSIS_CACHE_PHASH", True)
+    monkeypatch.setattr(analysis_cache, "ANALYSIS_CACHE_MAX_ENTRIES", max_entries)
+    return fake
+
+
+async def _index_keys(fake) -> set:
+    return {key async for key in fake.scan_iter(match="analysis:phash:*")}
+
+
+def test_similar_photo_hits_and_eviction_drops_its_index_fields(monkeypatch):
+    fake = _use_cache(monkeypatch, max_entries=1)
+    plov, salad = _photo(10), _photo(200, size=(48, 64))
+
+    async def scenario():
+        await analysis_cache.cache_analysis(plov, "Almaty", {"analysis": {"dish": "plov"}})
+        # A re-encoded, resized copy is found through the perceptual index
+        copy = _reencoded(plov)
+        assert await analysis_cache.get_cached_analysis(copy, " almaty ") == {"analysis": {"dish": "plov"}}
+        assert await analysis_cache.get_cached_analysis(copy, "Astana") is None
+
+        await analysis_cache.cache_analysis(salad, "Almaty", {"analysis": {"dish": "salad"}})
+        assert await analysis_cache.get_cached_analysis(plov, "Almaty") is None
+        # Only the surviving entry is left in the LRU and the index
+        salad_key = analysis_cache._entry_key(analysis_cache.image_digest(salad), "almaty")
+        assert await fake.zrange(analysis_cache.LRU_KEY, 0, -1) == [salad_key]
+        assert list(await fake.hgetall(analysis_cache.PHASH_OF_KEY)) == [salad_key]
+        for bucket in await _index_keys(fake) - {analysis_cache.PHASH_OF_KEY}:
+            assert set((await fake.hgetall(bucket)).values()) == {salad_key}
+
+    asyncio.run(scenario())
+
+
+def test_expired_entries_leave_the_lru_and_the_index(monkeypatch):
+    fake = _use_cache(monkeypatch, max_entries=10)
+    now = [1_000_000.0]
+    monkeypatch.setattr(analysis_cache.time, "time", lambda: now[0])
+
+    async def scenario():
+        await analysis_cache.cache_analysis(_photo(10), None, {"message": "Not food"})
+        now[0] += analysis_cache.ANALYSIS_CACHE_TTL_SECONDS + 1
+        await analysis_cache.cache_analysis(_photo(200, size=(48, 64)), None, {"message": "Not food"})
+
+        assert await fake.zcard(analysis_cache.LRU_KEY) == 1
+        assert await fake.hlen(analysis_cache.PHASH_OF_KEY) == 1
+
+    asyncio.run(scenario())
+
+
+def test_hash_parts_catch_every_hash_within_the_distance():
+    phash = "f0e1d2c3b4a59687"
+    flipped = f"{int(phash, 16) ^ 0b1000_0000_0000_1000_0000_0000_0100_0001:016x}"
+    assert analysis_cache._hamming(phash, flipped) == analysis_cache.ANALYSIS_CACHE_PHASH_MAX_DISTANCE
+    assert set(analysis_cache._bucket_keys(phash, "loc")) & set(analysis_cache._bucket_keys(flipped, "loc"))
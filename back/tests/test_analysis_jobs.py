@@ -0,0 +1,193 @@
+import asyncio
+
+import fakeredis
+
+from src.recipes import jobs
+
+
+def _use_fake_redis(monkeypatch):
+    fake = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(jobs, "redis_client", fake)
+    return fake
+
+
+def test_jobs_are_served_round_robin_across_users(monkeypatch):
+    _use_fake_redis(monkeypatch)
+
+    async def scenario():
+        a1 = await jobs.enqueue_job("1", b"a1", "image/jpeg", "a1.jpg", None)
+        a2 = await jobs.enqueue_job("1", b"a2", "image/jpeg", "a2.jpg", None)
+        a3 = await jobs.enqueue_job("1", b"a3", "image/jpeg", "a3.jpg", None)
+        b1 = await jobs.enqueue_job("2", b"b1", "image/jpeg", "b1.jpg", None)
+
+        order = [await jobs.next_job(timeout=1) for _ in range(4)]
+        assert order == [a1, b1, a2, a3]
+        assert await jobs.next_job(timeout=1) is None
+
+    asyncio.run(scenario())
+
+
+def test_process_job_stores_result_and_drops_image(monkeypatch):
+    fake = _use_fake_redis(monkeypatch)
+
+    async def fake_analyze_image(image_data, mime_type, location, user_id):
+        assert image_data == b"photo"
+        return {"analysis": {"recipe": {"dish_name": "Plov"}}}
+
+    monkeypatch.setattr(jobs, "analyze_image", fake_analyze_image)
+
+    async def scenario():
+        job_id = await jobs.enqueue_job("7", b"photo", "image/png", "plov.png", "Almaty")
+        assert (await jobs.get_queue_metrics())["queue_depth"] == 1
+
+        await jobs.process_job(await jobs.next_job(timeout=1))
+
+        job = await jobs.get_job(job_id)
+        assert job["status"] == "done"
+        assert job["result"] == {"filename": "plov.png", "analysis": {"recipe": {"dish_name": "Plov"}}}
+        assert not await fake.hexists(jobs._job_key(job_id), "image")
+
+        metrics = await jobs.get_queue_metrics()
+        assert metrics["queue_depth"] == 0
+        assert metrics["completed"] == 1
+        assert metrics["running"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_failed_analysis_marks_job_failed(monkeypatch):
+    _use_fake_redis(monkeypatch)
+
+    async def broken_analyze_image(**kwargs):
+        raise ValueError("bad JSON")
+
+    monkeypatch.setattr(jobs, "analyze_image", broken_analyze_image)
+
+    async def scenario():
+        job_id = await jobs.enqueue_job("7", b"photo", "image/png", "plov.png", None)
+        await jobs.process_job(await jobs.next_job(timeout=1))
+
+        job = await jobs.get_job(job_id)
+        assert job["status"] == "failed"
+        assert "bad JSON" in job["error"]
+
+    asyncio.run(scenario())
+
+
+def test_pending_jobs_per_user_are_capped(monkeypatch):
+    _use_fake_redis(monkeypatch)
+    monkeypatch.setattr(jobs, "ANALYSIS_JOB_MAX_PENDING_PER_USER", 1)
+
+    async def scenario():
+        await jobs.enqueue_job("7", b"one", "image/png", None, None)
+        try:
+            await jobs.enqueue_job("7", b"two", "image/png", None, None)
+        except jobs.QueueFullError:
+            return
+        raise AssertionError("second job should have been rejected")
+
+    asyncio.run(scenario())
+
+
+def test_job_waits_in_queue_while_analysis_sessions_are_full(monkeypatch):
+    fake = _use_fake_redis(monkeypatch)
+
+    async def busy_analyze_image(**kwargs):
+        raise jobs.SessionStoreFull("busy")
+
+    async def no_sleep(_):
+        pass
+
+    monkeypatch.setattr(jobs, "analyze_image", busy_analyze_image)
+    monkeypatch.setattr(jobs.asyncio, "sleep", no_sleep)
+
+    async def scenario():
+        job_id = await jobs.enqueue_job("7", b"photo", "image/png", "plov.png", None)
+        await jobs.process_job(await jobs.next_job(timeout=1))
+
+        assert (await jobs.get_job(job_id))["status"] == "queued"
+        assert await fake.hexists(jobs._job_key(job_id), "image")
+        assert (await jobs.get_queue_metrics())["running"] == 0
+        assert await jobs.next_job(timeout=1) == job_id
+
+    asyncio.run(scenario())
+
+
+def test_ready_ring_stays_consistent_under_concurrent_enqueues_and_takes(monkeypatch):
+    fake = _use_fake_redis(monkeypatch)
+    monkeypatch.setattr(jobs, "ANALYSIS_JOB_MAX_PENDING_PER_USER", 100)
+
+    async def scenario():
+        users = ["1", "2", "3"]
+        enqueues = [jobs.enqueue_job(users[i % 3], b"x", "image/png", None, None) for i in range(30)]
+        takes = [jobs.next_job(timeout=1) for _ in range(20)]
+        results = await asyncio.gather(*enqueues, *takes)
+        taken = [job_id for job_id in results[30:] if job_id]
+
+        ring = await fake.lrange(jobs.READY_USERS_KEY, 0, -1)
+        waiting = [user for user in users if await fake.llen(jobs._user_queue_key(user))]
+        # Each user with queued jobs is in the ring exactly once, and no one else is
+        assert sorted(ring) == waiting
+        assert len(taken) == len(set(taken)) == await fake.zcard(jobs.PROCESSING_KEY)
+        assert len(taken) + sum([await fake.llen(jobs._user_queue_key(user)) for user in users]) == 30
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_enqueues_respect_the_pending_cap(monkeypatch):
+    _use_fake_redis(monkeypatch)
+    monkeypatch.setattr(jobs, "ANALYSIS_JOB_MAX_PENDING_PER_USER", 2)
+
+    async def scenario():
+        results = await asyncio.gather(
+            *(jobs.enqueue_job("7", b"x", "image/png", None, None) for _ in range(5)),
+            return_exceptions=True,
+        )
+        assert sum(1 for result in results if isinstance(result, jobs.QueueFullError)) == 3
+
+    asyncio.run(scenario())
+
+
+def test_jobs_of_a_dead_worker_are_requeued(monkeypatch):
+    fake = _use_fake_redis(monkeypatch)
+    monkeypatch.setattr(jobs, "ANALYSIS_JOB_VISIBILITY_TIMEOUT_SECONDS", -1)
+    monkeypatch.setattr(jobs, "ANALYSIS_JOB_MAX_ATTEMPTS", 2)
+
+    async def scenario():
+        job_id = await jobs.enqueue_job("7", b"photo", "image/png", None, None)
+        # Taken by a worker that never finishes it
+        assert await jobs.next_job(timeout=1) == job_id
+        assert (await jobs.get_queue_metrics())["running"] == 1
+
+        assert await jobs.requeue_expired_jobs() == 1
+        assert (await jobs.get_job(job_id))["status"] == "queued"
+        assert (await jobs.get_queue_metrics())["running"] == 0
+
+        # Lost a second time: it fails instead of looping forever
+        assert await jobs.next_job(timeout=1) == job_id
+        assert await jobs.requeue_expired_jobs() == 0
+        assert (await jobs.get_job(job_id))["status"] == "failed"
+        assert not await fake.hexists(jobs._job_key(job_id), "image")
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_worker_puts_its_job_back(monkeypatch):
+    _use_fake_redis(monkeypatch)
+
+    async def slow_analyze_image(**kwargs):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(jobs, "analyze_image", slow_analyze_image)
+
+    async def scenario():
+        job_id = await jobs.enqueue_job("7", b"photo", "image/png", None, None)
+        worker = asyncio.create_task(jobs.process_job(await jobs.next_job(timeout=1)))
+        await asyncio.sleep(0.05)
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+
+        assert (await jobs.get_job(job_id))["status"] == "queued"
+        assert await jobs.next_job(timeout=1) == job_id
+
+    asyncio.run(scenario())
@@ -0,0 +1,51 @@
+import asyncio
+
+import fakeredis
+
+from src.recipes import analysis
+from src.services import analysis_staging
+
+
+def test_staged_analysis_is_returned_only_to_its_owner(monkeypatch):
+    monkeypatch.setattr(analysis_staging, "redis_client", fakeredis.FakeAsyncRedis(decode_responses=True))
+    analysis = {"recipe": {"dish_name": "Plov", "ingredients": [], "recipe": "Cook"}}
+
+    async def scenario():
+        analysis_id = await analysis_staging.stage_analysis("7", b"\xff\xd8jpeg", "image/jpeg", "plov.jpg", analysis)
+
+        assert await analysis_staging.get_staged_analysis(analysis_id, "8") is None
+        staged = await analysis_staging.get_staged_analysis(analysis_id, "7")
+        assert staged.image_data == b"\xff\xd8jpeg"
+        assert staged.mime_type == "image/jpeg"
+        assert staged.analysis == analysis
+        assert staged.preprocessed
+
+        await analysis_staging.discard_staged_analysis(analysis_id)
+        assert await analysis_staging.get_staged_analysis(analysis_id, "7") is None
+
+    asyncio.run(scenario())
+
+
+def test_cache_hit_skips_preprocessing_and_stages_the_upload(monkeypatch):
+    monkeypatch.setattr(analysis_staging, "redis_client", fakeredis.FakeAsyncRedis(decode_responses=True))
+    cached = {"analysis": {"recipe": {"dish_name": "Plov"}}}
+
+    async def cache_hit(image_data, location):
+        return cached
+
+    async def no_preprocessing(image_data, mime_type):
+        raise AssertionError("cache hits must not decode the upload")
+
+    monkeypatch.setattr(analysis, "get_cached_analysis", cache_hit)
+    monkeypatch.setattr(analysis, "preprocess_image", no_preprocessing)
+
+    async def scenario():
+        prepared = []
+        result = await analysis.analyze_image(b"raw", "image/png", None, "7", on_preprocessed=prepared.append)
+        assert result == cached and prepared == []
+
+        analysis_id = await analysis_staging.stage_analysis("7", b"raw", "image/png", None, result["analysis"], preprocessed=False)
+        staged = await analysis_staging.get_staged_analysis(analysis_id, "7")
+        assert staged.image_data == b"raw" and not staged.preprocessed
+
+    asyncio.run(scenario())
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from src.recipes.assembler import assemble_analysis
+from src.recipes.model_backend import FAKE_STAGE_OUTPUTS
+from src.recipes.schemas import CaloriesStageOutput, RecipeStageOutput
+
+
+def test_assembler_normalizes_stage_outputs():
+    state = {
+        "recipe": "```json\n" + json.dumps({
+            "dish_name": "Pizza",
+            "ingredients": ["300 g flour", "200 g mozzarella"],
+            "recipe": ["Knead the dough", "Bake"],
+        }) + "\n```",
+        "calories": json.dumps({
+            "ingredients_calories": [{"ingredient": "flour", "calories": "364 kcal"}],
+            "estimated_weight_g": "800",
+            "total_calories_per_100g": 250.6,
+        }),
+        "health_categories": json.dumps({
+            "health_categories": ["high protein", "Invented Label", "High Protein"],
+            "is_vegan": False,
+            "is_halal": True,
+        }),
+        "delivery": json.dumps([{"product": "flour", "link": "https://www.google.com/search?q=flour"}, {"oops": 1}]),
+    }
+
+    analysis = assemble_analysis(state).model_dump()
+
+    assert analysis["recipe"]["recipe"] == "1. Knead the dough\n2. Bake"
+    assert analysis["calories"] == {
+        "dish_name": "Pizza",
+        "ingredients_calories": {"flour": 364},
+        "estimated_weight_g": 800,
+        "total_calories_per_100g": 251,
+    }
+    assert analysis["health_categories"] == ["High Protein"]
+    assert analysis["is_halal"] is True
+    assert analysis["delivery"] == [{"product": "flour", "link": "https://www.google.com/search?q=flour"}]
+
+
+def test_assembler_tolerates_broken_optional_stages():
+    state = {
+        "recipe": json.dumps({"dish_name": "Soup", "ingredients": ["water"], "recipe": "1. Boil"}),
+        "calories": "{not json",
+    }
+
+    analysis = assemble_analysis(state)
+
+    assert analysis.calories.dish_name == "Soup"
+    assert analysis.calories.ingredients_calories == {}
+    assert analysis.health_categories == []
+    assert analysis.delivery == []
+
+
+def test_assembler_requires_a_recipe():
+    with pytest.raises(ValueError):
+        assemble_analysis({"recipe": "Sorry, I can't help with that"})
+
+
+def test_fake_model_answers_in_the_prompt_shapes():
+    # Load tests should take the path real Gemini output takes, not the coercion branches above
+    for stage, schema in (("recipe_agent", RecipeStageOutput), ("calories_agent", CaloriesStageOutput)):
+        output = FAKE_STAGE_OUTPUTS[stage]
+        assert schema.model_validate(output).model_dump(include=set(output)) == output
+    assert isinstance(FAKE_STAGE_OUTPUTS["recipe_agent"]["recipe"], str)
+    assert isinstance(FAKE_STAGE_OUTPUTS["calories_agent"]["ingredients_calories"], dict)
@@ -0,0 +1,20 @@
+from src.recipes.delivery import detect_language
+
+
+def test_russian_terms_for_kazakhstan_russia_and_belarus():
+    assert detect_language("Almaty, Kazakhstan") == "ru"
+    assert detect_language("Saint Petersburg, Russia") == "ru"
+    assert detect_language("Минск, Беларусь") == "ru"
+    assert detect_language("Brest, Belarus") == "ru"
+    assert detect_language("Astana") == "ru"
+    assert detect_language("Almaty, Unknown Country") == "ru"
+
+
+def test_names_only_match_as_whole_words_and_the_country_decides():
+    # Brest is also a French city
+    assert detect_language("Brest, France") == "en"
+    assert detect_language("Prussia Cove, UK") == "en"
+    assert detect_language("Prussia Cove") == "en"
+    assert detect_language("Kazanlak, Bulgaria") == "en"
+    assert detect_language("Unknown City, Unknown Country") == "en"
+    assert detect_language("") == "en"
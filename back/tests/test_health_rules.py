@@ -0,0 +1,46 @@
+from src.recipes.health_rules import evaluate
+
+
+def test_plant_based_dish_is_vegan_halal_and_dairy_free():
+    result = evaluate(["200 g chickpeas", "2 tbsp tahini", "1 tbsp lemon juice", "200 ml coconut milk"])
+
+    assert result.is_vegan and result.is_halal
+    assert result.health_categories == ["Plant-Based", "Dairy-Free"]
+
+
+def test_animal_products_and_alcohol():
+    result = evaluate(["150 g pancetta", "2 egg yolks", "50 g Parmesan cheese", "splash of white wine", "spaghetti"])
+
+    assert not result.is_vegan and not result.is_halal
+    assert result.health_categories == ["Red Meat-Based"]
+
+
+def test_longest_term_wins():
+    # Nut but not dairy; vinegar is not wine; nutmeg and eggplant are neither nut nor egg
+    result = evaluate(["2 tbsp peanut butter", "1 tbsp red wine vinegar", "pinch of nutmeg", "1 eggplant"])
+    assert result.is_vegan and result.is_halal
+    assert result.health_categories == ["Plant-Based", "Dairy-Free", "Contains Nuts"]
+
+    spicy = evaluate(["500 g ground beef", "2 Jalapeños", "1 tsp cayenne pepper"])
+    assert spicy.is_halal and not spicy.is_vegan
+    assert spicy.health_categories == ["Spicy/Irritant", "Red Meat-Based", "Dairy-Free"]
+
+
+def test_false_friends_of_meat_and_dairy_terms():
+    # Dairy, not meat
+    goat = evaluate(["100 g goat cheese", "splash of goat's milk", "rocket"])
+    assert goat.is_vegan is False and goat.is_halal
+    assert goat.health_categories == []
+
+    # Plants and sauces that only borrow the name
+    plants = evaluate([
+        "400 g butter beans", "1 head butter lettuce", "2 tbsp duck sauce", "200 g oyster mushrooms",
+        "2 beefsteak tomatoes", "handful of lamb's lettuce", "3 tbsp coconut yogurt",
+    ])
+    assert plants.is_vegan and plants.is_halal
+    assert plants.health_categories == ["Plant-Based", "Dairy-Free"]
+
+    # An egg, whatever bird laid it
+    eggs = evaluate(["4 quail eggs", "1 duck egg"])
+    assert not eggs.is_vegan
+    assert eggs.health_categories == ["Dairy-Free"]
@@ -0,0 +1,40 @@
+import io
+
+from PIL import Image
+
+from src.config import IMAGE_MAX_EDGE
+from src.services.image_preprocessing import preprocess_image_sync
+
+
+def _photo(edge, quality, exif=None):
+    img = Image.effect_noise((edge, edge), 64).convert("RGB")
+    output = io.BytesIO()
+    img.save(output, format="JPEG", quality=quality, optimize=True, **({"exif": exif} if exif else {}))
+    return output.getvalue()
+
+
+def test_small_optimized_upload_is_kept_when_re_encoding_would_grow_it():
+    upload = _photo(300, quality=40)
+
+    image = preprocess_image_sync(upload, "image/jpeg")
+    assert image.data == upload
+    assert image.mime_type == "image/jpeg"
+    assert image.bytes_saved == 0
+
+
+def test_metadata_is_stripped_even_when_it_costs_bytes():
+    exif = Image.Exif()
+    exif[0x010F] = "PhoneMaker"
+    upload = _photo(300, quality=40, exif=exif.tobytes())
+
+    image = preprocess_image_sync(upload, "image/jpeg")
+    assert len(image.data) > len(upload)
+    with Image.open(io.BytesIO(image.data)) as processed:
+        assert not processed.getexif()
+
+
+def test_large_upload_is_downscaled():
+    image = preprocess_image_sync(_photo(IMAGE_MAX_EDGE + 500, quality=90), "image/jpeg")
+    assert image.bytes_saved > 0
+    with Image.open(io.BytesIO(image.data)) as processed:
+        assert max(processed.size) == IMAGE_MAX_EDGE
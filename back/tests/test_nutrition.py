@@ -0,0 +1,41 @@
+from src.recipes.nutrition import NutritionIndex, estimate_calories, nutrition_index
+
+
+def test_lookup_normalizes_and_prefers_the_most_specific_entry():
+    assert nutrition_index.lookup("2 tbsp Extra Virgin Olive Oil").name == "olive oil"
+    assert nutrition_index.lookup("3 large eggs").name == "egg"
+    assert nutrition_index.lookup("2 boneless skinless chicken breasts").name == "chicken breast"
+    assert nutrition_index.lookup("1 red bell pepper, diced").name == "bell pepper"
+
+
+def test_lookup_tolerates_typos_but_not_unknown_ingredients():
+    index = NutritionIndex([("mozzarella", 280, 0), ("spaghetti", 158, 0)])
+
+    assert index.lookup("200 g mozarella").name == "mozzarella"
+    assert index.lookup("spagetti").name == "spaghetti"
+    assert index.lookup("saffron threads") is None
+
+
+def test_estimate_is_complete_only_when_every_ingredient_is_weighable():
+    complete = estimate_calories(["300 g bread flour", "2 tbsp olive oil", "2 eggs"])
+    assert complete.complete
+    assert complete.ingredients_calories == {"bread flour": 361, "olive oil": 884, "eggs": 143}
+    assert complete.estimated_weight_g == 430
+    assert complete.total_calories_per_100g == round((300 * 3.61 + 30 * 8.84 + 100 * 1.43) / 430 * 100)
+
+    partial = estimate_calories(["300 g bread flour", "a handful of saffron threads", "fresh basil"])
+    assert not partial.complete
+    assert partial.unmatched == ["a handful of saffron threads"]
+    assert partial.estimated_weight_g is None
+
+
+def test_lines_naming_several_ingredients_are_left_to_the_model():
+    assert nutrition_index.lookup("1 tsp salt and pepper") is None
+    assert nutrition_index.lookup("2 tbsp oil or butter") is None
+    # A partial match has to cover most of the name
+    assert nutrition_index.lookup("baby spinach") is None
+
+    estimate = estimate_calories(["200 g chicken breast", "1 tsp salt and pepper"])
+    assert not estimate.complete
+    assert estimate.unmatched == ["1 tsp salt and pepper"]
+    assert estimate.ingredients_calories == {"chicken breast": nutrition_index.lookup("chicken breast").kcal_per_100g}
@@ -0,0 +1,319 @@
+import asyncio
+import os
+import re
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, func, select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import selectinload
+from sqlalchemy.pool import StaticPool
+
+from src.database import Base, async_database_url
+from src.auth.models import Users
+from src.recipes.models import Recipe, IngredientCalories, FavoriteRecipe, Category
+from sqlalchemy.dialects import postgresql
+
+from src.recipes.filters import filter_conditions
+from src.recipes.schemas import CategoryMatch, RecipeFilter, SortOrder
+from src.recipes import service
+
+
+def _seed(db, recipes: int):
+    author = Users(username="chef", email="chef@example.com", hashed_password="x")
+    reader = Users(username="reader", email="reader@example.com", hashed_password="x")
+    categories = [Category(name="Plant-Based"), Category(name="High Protein")]
+    db.add_all([author, reader, *categories])
+    db.flush()
+    for i in range(recipes):
+        # Pairs share a name and a timestamp, so the id has to break ties
+        recipe = Recipe(
+            user_id=author.id,
+            dish_name=f"Dish {i // 2:02d}",
+            recipe="Cook",
+            is_published=True,
+            created_at=datetime(2025, 1, 1) + timedelta(minutes=i // 2),
+            categories=categories,
+        )
+        recipe.ingredients_calories = [
+            IngredientCalories(ingredient="rice", calories=130),
+            IngredientCalories(ingredient="carrot", calories=41),
+        ]
+        db.add(recipe)
+        db.flush()
+        recipe.generate_slug()
+        db.add(FavoriteRecipe(user_id=reader.id, recipe_id=recipe.id))
+    db.commit()
+    db.expire_all()
+    return author.id, reader.id
+
+
+@asynccontextmanager
+async def _seeded_session(recipes: int = 0, seed=_seed, engine=None):
+    engine = engine or create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    try:
+        async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+            author_id, reader_id = await db.run_sync(seed, recipes)
+            yield engine, db, author_id, reader_id
+    finally:
+        await engine.dispose()
+
+
+async def _capture_queries(engine, db, call) -> list:
+    """(statement, parameters) of every query `call` runs"""
+    statements = []
+    listener = lambda *args: statements.append((args[2], args[3]))
+    event.listen(engine.sync_engine, "before_cursor_execute", listener)
+    try:
+        await call()
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", listener)
+        db.expire_all()
+    return statements
+
+
+async def _count_queries(engine, db, call) -> int:
+    return len(await _capture_queries(engine, db, call))
+
+
+def test_listing_queries_do_not_grow_with_page_size():
+    async def scenario():
+        async with _seeded_session(recipes=30) as (engine, db, author_id, reader_id):
+            listings = {
+                "all": lambda size: service.get_recipes_paginated(db, page_size=size),
+                "public": lambda size: service.get_public_recipes_paginated(db, page_size=size),
+                "my": lambda size: service.get_my_recipes_paginated(db, author_id, page_size=size),
+                "favorites": lambda size: service.get_favorite_recipes_paginated(db, reader_id, page_size=size),
+            }
+
+            for name, listing in listings.items():
+                page = await listing(30)
+                assert len(page.recipes) == 30, name
+                first = page.recipes[0].recipe if name == "favorites" else page.recipes[0]
+                assert first.user.username == "chef"
+                assert len(first.ingredients_calories) == 2 and len(first.categories) == 2
+
+                small = await _count_queries(engine, db, lambda: listing(2))
+                large = await _count_queries(engine, db, lambda: listing(30))
+                # page + count + ingredients + categories
+                assert small == large == 4, name
+
+    asyncio.run(scenario())
+
+
+def test_cursor_pages_match_offset_pages():
+    async def scenario():
+        async with _seeded_session(recipes=11) as (_, db, _, reader_id):
+            for sort_by in SortOrder:
+                by_offset = [r.id for r in (await service.get_public_recipes_paginated(db, page_size=11, sort_by=sort_by)).recipes]
+
+                by_cursor, cursor = [], None
+                while True:
+                    page = await service.get_public_recipes_paginated(db, page_size=4, sort_by=sort_by, cursor=cursor)
+                    by_cursor += [r.id for r in page.recipes]
+                    cursor = page.next_cursor
+                    if cursor is None:
+                        break
+                assert by_cursor == by_offset, sort_by
+
+                first = await service.get_favorite_recipes_paginated(db, reader_id, page_size=6, sort_by=sort_by)
+                rest = await service.get_favorite_recipes_paginated(db, reader_id, page_size=6, sort_by=sort_by, cursor=first.next_cursor)
+                assert [f.recipe_id for f in first.recipes + rest.recipes] == by_offset
+                assert rest.next_cursor is None and rest.page is None
+
+    asyncio.run(scenario())
+
+
+def test_cursor_is_bound_to_its_sort_order():
+    async def scenario():
+        async with _seeded_session(recipes=3) as (_, db, _, _):
+            cursor = (await service.get_public_recipes_paginated(db, page_size=1, sort_by=SortOrder.NEWEST)).next_cursor
+
+            with pytest.raises(ValueError):
+                await service.get_public_recipes_paginated(db, page_size=1, sort_by=SortOrder.NAME_ASC, cursor=cursor)
+            with pytest.raises(ValueError):
+                await service.get_public_recipes_paginated(db, page_size=1, cursor="not-a-cursor")
+
+    asyncio.run(scenario())
+
+
+async def _listing_plans(engine, db, author_id, reader_id, explain):
+    """(listing, plan steps) for every query of every listing, sort order and paging mode"""
+    listings = {
+        "all": lambda **kw: service.get_recipes_paginated(db, **kw),
+        "public": lambda **kw: service.get_public_recipes_paginated(db, **kw),
+        "my": lambda **kw: service.get_my_recipes_paginated(db, author_id, **kw),
+        "favorites": lambda **kw: service.get_favorite_recipes_paginated(db, reader_id, **kw),
+    }
+
+    connection = await db.connection()
+    for name, listing in listings.items():
+        for sort_by in SortOrder:
+            cursor = (await listing(page_size=20, sort_by=sort_by)).next_cursor
+            for kwargs in ({"page": 3}, {"cursor": cursor}):
+                queries = await _capture_queries(
+                    engine, db, lambda: listing(page_size=20, sort_by=sort_by, **kwargs)
+                )
+                for statement, parameters in queries:
+                    plan = await connection.exec_driver_sql(f"{explain} {statement}", parameters)
+                    steps = [row[-1] for row in plan]
+                    yield f"{name} {sort_by.value} {list(kwargs)[0]}: {steps}", steps
+
+
+# A plan step that reads a whole table, or sorts instead of reading an index in order
+FULL_SCAN = re.compile(r"^SCAN (recipes|favorite_recipes|ingredient_calories|recipe_categories)$")
+SORT = "USE TEMP B-TREE FOR ORDER BY"
+
+
+def test_listings_read_through_indexes():
+    async def scenario():
+        async with _seeded_session(recipes=200) as (engine, db, author_id, reader_id):
+            await db.execute(text("ANALYZE"))
+            async for where, steps in _listing_plans(engine, db, author_id, reader_id, "EXPLAIN QUERY PLAN"):
+                assert not any(FULL_SCAN.match(step) for step in steps), where
+                assert SORT not in steps, where
+
+    asyncio.run(scenario())
+
+
+# The partial indexes only exist on Postgres, so their plans need a real server
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+PG_FULL_SCAN = re.compile(r"Seq Scan on (recipes|favorite_recipes|ingredient_calories|recipe_categories)\b")
+PG_SORT = re.compile(r"^\s*(->\s+)?(Incremental )?Sort\b")
+
+
+@asynccontextmanager
+async def _postgres_engine():
+    """Engine on a throwaway schema of TEST_POSTGRES_URL"""
+    schema = f"test_{uuid.uuid4().hex[:12]}"
+    engine = create_async_engine(
+        async_database_url(TEST_POSTGRES_URL),
+        connect_args={"server_settings": {"search_path": schema}},
+    )
+    async with engine.begin() as connection:
+        await connection.exec_driver_sql(f"CREATE SCHEMA {schema}")
+    try:
+        yield engine
+    finally:
+        async with engine.begin() as connection:
+            await connection.exec_driver_sql(f"DROP SCHEMA {schema} CASCADE")
+        await engine.dispose()
+
+
+@pytest.mark.skipif(not TEST_POSTGRES_URL, reason="TEST_POSTGRES_URL is not set")
+def test_listings_read_through_indexes_on_postgres():
+    async def scenario():
+        async with _postgres_engine() as pg_engine, \
+                _seeded_session(recipes=200, engine=pg_engine) as (engine, db, author_id, reader_id):
+            await db.execute(text("ANALYZE"))
+            # 200 rows are cheaper to scan and sort than to read by index; pricing both
+            # out leaves a Seq Scan or Sort in the plan only where no index can serve it
+            await db.execute(text("SET enable_seqscan = off"))
+            await db.execute(text("SET enable_sort = off"))
+            async for where, steps in _listing_plans(engine, db, author_id, reader_id, "EXPLAIN"):
+                assert not any(PG_FULL_SCAN.search(step) for step in steps), where
+                assert not any(PG_SORT.match(step) for step in steps), where
+
+    asyncio.run(scenario())
+
+
+def _seed_tagged(db, _):
+    author = Users(username="chef", email="chef@example.com", hashed_password="x")
+    reader = Users(username="reader", email="reader@example.com", hashed_password="x")
+    plant, protein, red_meat = Category(name="Plant-Based"), Category(name="High Protein"), Category(name="Red Meat-Based")
+    db.add_all([author, reader])
+    db.flush()
+    recipes = [
+        Recipe(dish_name="Salad", categories=[plant], is_vegan=True, is_halal=True),
+        Recipe(dish_name="Steak", categories=[protein, red_meat], is_halal=True),
+        Recipe(dish_name="Tofu Bowl", categories=[plant, protein]),
+        Recipe(dish_name="Lemonade", categories=[], is_vegan=True),
+    ]
+    for recipe in recipes:
+        recipe.user_id, recipe.recipe, recipe.is_published = author.id, "Cook", True
+    db.add_all(recipes)
+    db.flush()
+    for recipe in recipes:
+        recipe.generate_slug()
+    db.add(FavoriteRecipe(user_id=reader.id, recipe_id=recipes[2].id))
+    db.commit()
+    return author.id, reader.id
+
+
+def test_filters_by_categories_and_flags():
+    async def scenario():
+        async with _seeded_session(seed=_seed_tagged) as (_, db, author_id, reader_id):
+            async def names(listing=service.get_public_recipes_paginated, *args, **filters):
+                page = await listing(db, *args, recipe_filter=RecipeFilter(**filters))
+                assert page.total == len(page.recipes)
+                return {(r.recipe if hasattr(r, "recipe_id") else r).dish_name for r in page.recipes}
+
+            assert await names(categories=["Plant-Based"]) == {"Salad", "Tofu Bowl"}
+            assert await names(categories=["Plant-Based", "High Protein"]) == {"Tofu Bowl"}
+            assert await names(categories=["Plant-Based", "High Protein"], category_match=CategoryMatch.ANY) == {"Salad", "Steak", "Tofu Bowl"}
+            assert await names(vegan=True) == {"Salad", "Lemonade"}
+            assert await names(categories=["Red Meat-Based", "Plant-Based"], category_match=CategoryMatch.ANY, halal=True) == {"Salad", "Steak"}
+            assert await names(service.get_my_recipes_paginated, author_id, categories=["High Protein"]) == {"Steak", "Tofu Bowl"}
+            assert await names(service.get_favorite_recipes_paginated, reader_id, vegan=True) == set()
+
+            # The tags follow later changes to the categories and flags
+            tofu = await db.scalar(select(Recipe).where(Recipe.dish_name == "Tofu Bowl").options(selectinload(Recipe.categories)))
+            tofu.is_vegan = True
+            tofu.categories = [c for c in tofu.categories if c.name != "High Protein"]
+            await db.commit()
+            assert await names(vegan=True, categories=["Plant-Based"]) == {"Salad", "Tofu Bowl"}
+            assert await names(categories=["High Protein"]) == {"Steak"}
+
+    asyncio.run(scenario())
+
+
+def test_filters_are_gin_operators_on_postgres():
+    recipe_filter = RecipeFilter(categories=["Plant-Based", "Dairy-Free"], category_match=CategoryMatch.ANY, vegan=True)
+    sql = [str(c.compile(dialect=postgresql.dialect())) for c in filter_conditions(recipe_filter)]
+    assert [statement.split(" %")[0] for statement in sql] == ["recipes.filter_tags &&", "recipes.filter_tags @>"]
+
+    with pytest.raises(ValueError):
+        RecipeFilter(categories=["Deep Fried"])
+
+
+def test_save_is_one_transaction_with_cached_categories(monkeypatch):
+    monkeypatch.setattr(service, "_category_ids", {})
+
+    async def scenario():
+        async with _seeded_session() as (engine, db, author_id, _):
+            commits = []
+            event.listen(engine.sync_engine, "commit", lambda connection: commits.append(connection))
+
+            async def save(dish_name, categories):
+                return await service.create_recipe_with_categories(
+                    db, author_id, dish_name, "Cook", "https://example/x.jpg", 300, 120, categories,
+                    [{"ingredient": "rice", "calories": 130}, {"ingredient": "tofu", "calories": 76}, {"ingredient": None, "calories": 5}],
+                    is_vegan=True,
+                )
+
+            first = await _capture_queries(engine, db, lambda: save("Tofu Bowl", ["Plant-Based", "High Sodium", "Deep Fried"]))
+            second = await _capture_queries(engine, db, lambda: save("Rice Bowl", ["Plant-Based", "High Protein"]))
+            assert len(commits) == 2
+
+            # Only the first save reads the categories; the second finds them in the cache
+            assert [s for s, _ in first if "FROM categories" in s]
+            assert not [s for s, _ in second if "FROM categories" in s]
+            # The ingredients go in as one executemany
+            inserts = [p for s, p in second if s.startswith("INSERT INTO ingredient_calories")]
+            assert len(inserts) == 1 and [row[1:] for row in inserts[0]] == [("rice", 130), ("tofu", 76)]
+
+            recipe = await db.scalar(
+                select(Recipe).where(Recipe.dish_name == "Tofu Bowl")
+                .options(selectinload(Recipe.categories), selectinload(Recipe.ingredients_calories))
+            )
+            assert recipe.slug == f"tofu-bowl-{recipe.id}" and recipe.ingredients_text == "rice, tofu"
+            assert sorted(c.name for c in recipe.categories) == ["High Sodium", "Plant-Based"]
+            assert recipe.filter_tags == ["High Sodium", "Plant-Based", "vegan"]
+            assert len(recipe.ingredients_calories) == 2
+            assert (await db.scalar(select(func.count()).select_from(Category))) == 3
+
+    asyncio.run(scenario())
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.schema import CreateTable
+
+from src.auth.models import Users
+from src.recipes.models import Recipe
+from src.recipes.schemas import SortOrder
+from src.recipes import service
+
+
+class _RecordingSession:
+    """Stands in for the AsyncSession: keeps the statements, answers with canned rows"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        rows = self.rows
+        return type("Result", (), {"all": lambda self: rows})()
+
+
+def _recipe(recipe_id: int) -> Recipe:
+    return Recipe(
+        id=recipe_id,
+        slug=f"plov-{recipe_id}",
+        user_id=1,
+        user=Users(username="chef"),
+        dish_name="Plov",
+        recipe="Cook",
+        is_published=True,
+        ingredients_calories=[],
+        categories=[],
+    )
+
+
+def _sql(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+def test_search_matches_the_vector_and_pages_by_rank():
+    rows = [(_recipe(9), 0.9), (_recipe(7), 0.5), (_recipe(4), 0.5)]
+    db = _RecordingSession(rows)
+
+    first = asyncio.run(service.search_recipes(db, "lamb plov", page_size=2))
+    assert [r.id for r in first.recipes] == [9, 7]
+    sql = _sql(db.statements[0])
+    assert "recipes.search_vector @@ websearch_to_tsquery" in sql
+    assert "ORDER BY rank DESC, recipes.id DESC" in sql
+
+    db.rows = rows[2:]
+    rest = asyncio.run(service.search_recipes(db, "lamb plov", page_size=2, cursor=first.next_cursor))
+    assert [r.id for r in rest.recipes] == [4] and rest.next_cursor is None
+    after = db.statements[1].compile(dialect=postgresql.dialect())
+    assert "(ts_rank_cd(recipes.search_vector, websearch_to_tsquery" in str(after)
+    assert {0.5, 7} <= set(after.params.values())
+
+
+def test_search_rejects_listing_cursors():
+    listing_cursor = service._encode_cursor(SortOrder.NEWEST, _recipe(3))
+    with pytest.raises(ValueError):
+        asyncio.run(service.search_recipes(_RecordingSession([]), "plov", cursor=listing_cursor))
+    with pytest.raises(ValueError):
+        asyncio.run(service.search_recipes(_RecordingSession([]), "plov", cursor="not-a-cursor"))
+
+
+def test_search_vector_exists_only_on_postgres():
+    assert "search_vector TSVECTOR GENERATED ALWAYS AS" in str(CreateTable(Recipe.__table__).compile(dialect=postgresql.dialect()))
+    assert "search_vector" not in str(CreateTable(Recipe.__table__).compile(dialect=sqlite.dialect()))
@@ -0,0 +1,72 @@
+import asyncio
+import json
+
+import pytest
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from src.recipes import resilience
+from src.recipes.resilience import ResilientLlm, RetryBudget, StageTimeoutError
+
+
+class ScriptedLlm(BaseLlm):
+    """Answers with the next (delay, text) pair on every call"""
+
+    model: str = "scripted"
+    script: list
+    requests: list = []
+
+    async def generate_content_async(self, llm_request, stream=False):
+        self.requests.append(llm_request)
+        delay, text = self.script.pop(0)
+        await asyncio.sleep(delay)
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=text)]))
+
+
+def _request() -> LlmRequest:
+    return LlmRequest(contents=[types.Content(role="user", parts=[types.Part(text="photo")])])
+
+
+def _run(llm: ResilientLlm) -> str:
+    async def scenario():
+        responses = [response async for response in llm.generate_content_async(_request())]
+        return responses[0].content.parts[0].text
+
+    return asyncio.run(scenario())
+
+
+@pytest.fixture(autouse=True)
+def fresh_budget(monkeypatch):
+    monkeypatch.setattr(resilience, "retry_budget", RetryBudget(ratio=0.1, capacity=10))
+
+
+def test_malformed_reply_reprompts_only_the_stage():
+    inner = ScriptedLlm(script=[(0, "Sure! Here is the recipe"), (0, json.dumps({"dish_name": "Plov"}))])
+    llm = ResilientLlm(model="scripted", inner=inner, stage="recipe_agent")
+
+    assert json.loads(_run(llm)) == {"dish_name": "Plov"}
+    assert len(inner.requests) == 2
+    assert inner.requests[1].contents[-1].parts[0].text == resilience.JSON_REMINDER
+
+
+def test_slow_stage_times_out_and_empty_budget_stops_retries(monkeypatch):
+    monkeypatch.setitem(resilience.STAGE_TIMEOUTS, "calories_agent", 0.05)
+    monkeypatch.setattr(resilience, "retry_budget", RetryBudget(ratio=0.1, capacity=0))
+    inner = ScriptedLlm(script=[(1, "{}"), (0, "{}")])
+    llm = ResilientLlm(model="scripted", inner=inner, stage="calories_agent")
+
+    with pytest.raises(StageTimeoutError):
+        _run(llm)
+    assert len(inner.requests) == 1
+
+
+def test_hedged_request_wins_over_a_slow_primary(monkeypatch):
+    monkeypatch.setattr(resilience, "ANALYSIS_HEDGE_ENABLED", True)
+    monkeypatch.setattr(resilience, "hedge_delay", lambda stage: 0.05)
+    inner = ScriptedLlm(script=[(2, json.dumps({"slow": True})), (0, json.dumps({"slow": False}))])
+    llm = ResilientLlm(model="scripted", inner=inner, stage="health_categories_agent")
+
+    assert json.loads(_run(llm)) == {"slow": False}
+    assert len(inner.requests) == 2
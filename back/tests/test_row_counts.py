@@ -0,0 +1,98 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.database import Base
+from src.auth.models import Users
+from src.recipes.models import Recipe, FavoriteRecipe
+from src.services import row_counts
+from src.services.row_counts import RowCount, RowCountDelta, count_rows, fold_row_count_deltas, reconcile_row_counts
+
+
+def _session():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)()
+
+
+def _stored(db):
+    fold_row_count_deltas(db)
+    return {name: value for name, value in db.query(RowCount.name, RowCount.value) if value}
+
+
+def test_counts_follow_creates_publishes_and_deletes():
+    db = _session()
+    chef = Users(username="chef", email="chef@example.com", hashed_password="x")
+    reader = Users(username="reader", email="reader@example.com", hashed_password="x", is_admin=True)
+    db.add_all([chef, reader])
+    db.flush()
+    recipes = [Recipe(user_id=chef.id, dish_name=f"Dish {i}", recipe="Cook", is_published=i < 2) for i in range(3)]
+    db.add_all(recipes)
+    db.flush()
+    db.add_all([FavoriteRecipe(user_id=reader.id, recipe_id=recipe.id) for recipe in recipes[:2]])
+    db.commit()
+
+    recipes[2].is_published = True
+    db.commit()
+    # Deleting a recipe also removes the favorite pointing at it
+    db.delete(recipes[0])
+    reader.is_admin = False
+    db.commit()
+
+    stored = _stored(db)
+    assert stored[row_counts.PUBLISHED_RECIPES] == 2
+    assert stored[row_counts.user_favorites(reader.id)] == 1
+    assert row_counts.user_recipes(reader.id) not in stored
+    assert stored == {name: value for name, value in count_rows(db).items() if value}
+
+
+def test_reconcile_repairs_drift():
+    db = _session()
+    chef = Users(username="chef", email="chef@example.com", hashed_password="x")
+    db.add(chef)
+    db.flush()
+    db.add(Recipe(user_id=chef.id, dish_name="Plov", recipe="Cook"))
+    db.commit()
+    fold_row_count_deltas(db)
+
+    db.query(RowCount).filter(RowCount.name == row_counts.RECIPES).update({"value": 7})
+    db.add(RowCount(name="recipes:user:999", value=3))
+    db.commit()
+
+    assert reconcile_row_counts(db) == {row_counts.RECIPES: 6, "recipes:user:999": 3}
+    assert _stored(db) == {row_counts.RECIPES: 1, row_counts.user_recipes(chef.id): 1, row_counts.USERS: 1}
+    assert reconcile_row_counts(db) == {}
+
+
+def test_writes_append_deltas_instead_of_updating_counters():
+    db = _session()
+    chef = Users(username="chef", email="chef@example.com", hashed_password="x")
+    db.add(chef)
+    db.flush()
+    db.add(Recipe(user_id=chef.id, dish_name="Plov", recipe="Cook", is_published=True))
+    db.commit()
+
+    # Nothing in row_counts is locked by the save; the counters only move on a fold
+    assert db.query(RowCount).count() == 0
+    assert db.query(RowCountDelta).count() == 4
+    assert fold_row_count_deltas(db) == 4
+    assert db.query(RowCountDelta).count() == 0
+    assert _stored(db) == {name: value for name, value in count_rows(db).items() if value}
+
+
+def test_deleting_a_user_skips_the_orphaned_recipes_counter():
+    db = _session()
+    chef = Users(username="chef", email="chef@example.com", hashed_password="x")
+    db.add(chef)
+    db.flush()
+    db.add(Recipe(user_id=chef.id, dish_name="Plov", recipe="Cook"))
+    db.commit()
+
+    # The recipe stays with user_id set to NULL
+    db.delete(chef)
+    db.commit()
+
+    stored = _stored(db)
+    assert "recipes:user:None" not in stored
+    assert stored == {row_counts.RECIPES: 1}
+    assert reconcile_row_counts(db) == {}
@@ -0,0 +1,108 @@
+import asyncio
+
+import fakeredis
+import pytest
+from google.adk.events import Event, EventActions
+from google.genai import types
+
+from src.services import session_store
+from src.services.session_store import BoundedSessionService, RedisSessionService, SessionStoreFull
+
+
+def _image_event(size: int) -> Event:
+    return Event(
+        invocation_id="inv",
+        author="user",
+        content=types.Content(role="user", parts=[
+            types.Part(inline_data=types.Blob(mime_type="image/jpeg", data=b"x" * size)),
+        ]),
+        actions=EventActions(state_delta={"recipe": "{}"}),
+    )
+
+
+def test_running_session_is_not_evicted_when_the_store_is_full():
+    service = BoundedSessionService(max_sessions=2, max_bytes=10_000, idle_ttl=60)
+
+    async def scenario():
+        running = await service.create_session(app_name="app", user_id="1", session_id="a")
+        await service.create_session(app_name="app", user_id="1", session_id="b")
+        # New work is turned away instead of failing the runs already in flight
+        with pytest.raises(SessionStoreFull):
+            await service.create_session(app_name="app", user_id="2", session_id="c")
+
+        await service.append_event(running, _image_event(100))
+        assert await service.get_session(app_name="app", user_id="1", session_id="a")
+        assert len(service) == 2
+
+        # A finished run frees its slot
+        await service.delete_session(app_name="app", user_id="1", session_id="b")
+        assert await service.create_session(app_name="app", user_id="2", session_id="c")
+
+    asyncio.run(scenario())
+
+
+def test_bounded_store_drops_only_idle_sessions(monkeypatch):
+    service = BoundedSessionService(max_sessions=1, max_bytes=10_000, idle_ttl=60)
+    now = [1_000.0]
+    monkeypatch.setattr(session_store.time, "monotonic", lambda: now[0])
+
+    async def scenario():
+        await service.create_session(app_name="app", user_id="1", session_id="abandoned")
+        now[0] += 61
+        await service.create_session(app_name="app", user_id="1", session_id="b")
+        assert await service.get_session(app_name="app", user_id="1", session_id="abandoned") is None
+
+    asyncio.run(scenario())
+
+
+def test_bounded_store_tracks_bytes_and_releases_them_on_delete():
+    service = BoundedSessionService(max_sessions=10, max_bytes=1_500, idle_ttl=60)
+
+    async def scenario():
+        first = await service.create_session(app_name="app", user_id="1", session_id="a")
+        await service.append_event(first, _image_event(1_000))
+        assert service.total_bytes >= 1_000
+
+        second = await service.create_session(app_name="app", user_id="1", session_id="b")
+        await service.append_event(second, _image_event(1_000))
+        # Over budget: both runs keep their sessions, new ones wait
+        assert await service.get_session(app_name="app", user_id="1", session_id="a")
+        with pytest.raises(SessionStoreFull):
+            await service.create_session(app_name="app", user_id="1", session_id="c")
+
+        for session_id in ("a", "b"):
+            await service.delete_session(app_name="app", user_id="1", session_id=session_id)
+        assert len(service) == 0
+        assert service.total_bytes == 0
+
+    asyncio.run(scenario())
+
+
+def test_redis_store_round_trips_events_and_state():
+    service = RedisSessionService(client=fakeredis.FakeAsyncRedis(decode_responses=True), max_sessions=10, idle_ttl=60)
+
+    async def scenario():
+        session = await service.create_session(app_name="app", user_id="1", session_id="a")
+        event = await service.append_event(session, _image_event(16))
+
+        stored = await service.get_session(app_name="app", user_id="1", session_id="a")
+        assert stored.state == {"recipe": "{}"}
+        assert [e.id for e in stored.events] == [event.id]
+        assert stored.events[0].content.parts[0].inline_data.data == b"x" * 16
+
+        await service.delete_session(app_name="app", user_id="1", session_id="a")
+        assert await service.get_session(app_name="app", user_id="1", session_id="a") is None
+
+    asyncio.run(scenario())
+
+
+def test_redis_store_rejects_new_sessions_at_the_limit():
+    service = RedisSessionService(client=fakeredis.FakeAsyncRedis(decode_responses=True), max_sessions=1, idle_ttl=60)
+
+    async def scenario():
+        await service.create_session(app_name="app", user_id="1", session_id="a")
+        with pytest.raises(SessionStoreFull):
+            await service.create_session(app_name="app", user_id="2", session_id="b")
+        assert await service.get_session(app_name="app", user_id="1", session_id="a")
+
+    asyncio.run(scenario())
@@ -0,0 +1,130 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from src.recipes import analysis
+from src.services import single_flight
+from src.services.image_preprocessing import PreprocessedImage
+from src.services.metrics import ANALYSIS_DURATION
+from src.services.single_flight import SingleFlight
+
+
+def test_concurrent_duplicates_share_one_computation():
+    flight = SingleFlight(client=fakeredis.FakeAsyncRedis(decode_responses=True), lock_ttl=5)
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"analysis": {"recipe": {"dish_name": "Plov"}}}
+
+    async def scenario():
+        return await asyncio.gather(*(flight.run("digest:almaty", compute) for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert calls == 1
+    assert all(result == results[0] for result in results)
+
+
+def test_result_fans_out_to_another_worker():
+    server = fakeredis.FakeServer()
+    # Two instances stand in for two worker processes sharing one Redis
+    leader = SingleFlight(client=fakeredis.FakeAsyncRedis(server=server, decode_responses=True), lock_ttl=5)
+    follower = SingleFlight(client=fakeredis.FakeAsyncRedis(server=server, decode_responses=True), lock_ttl=5)
+    calls = []
+
+    def computation(worker):
+        async def compute():
+            calls.append(worker)
+            await asyncio.sleep(0.2)
+            return {"message": "Not food", "description": worker}
+        return compute
+
+    async def scenario():
+        first = asyncio.create_task(leader.run("digest:", computation("leader")))
+        await asyncio.sleep(0.05)
+        second = await follower.run("digest:", computation("follower"))
+        return await first, second
+
+    first, second = asyncio.run(scenario())
+    assert calls == ["leader"]
+    assert first == second == {"message": "Not food", "description": "leader"}
+
+
+def test_failed_leader_lets_the_next_request_run():
+    flight = SingleFlight(client=fakeredis.FakeAsyncRedis(decode_responses=True), lock_ttl=5)
+
+    async def failing():
+        raise RuntimeError("model unavailable")
+
+    async def working():
+        return {"analysis": {}}
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await flight.run("digest:", failing)
+        return await flight.run("digest:", working)
+
+    assert asyncio.run(scenario()) == {"analysis": {}}
+
+
+def test_identical_streams_share_one_pipeline_run(monkeypatch):
+    monkeypatch.setattr(single_flight, "ANALYSIS_SINGLE_FLIGHT_ENABLED", True)
+    flight = SingleFlight(client=fakeredis.FakeAsyncRedis(decode_responses=True), lock_ttl=5)
+    monkeypatch.setattr(single_flight, "analysis_flight", flight)
+    monkeypatch.setattr(analysis, "ANALYSIS_SPECULATIVE", False)
+    runs = []
+
+    async def cache_miss(image_data, location):
+        return None
+
+    async def no_cache(image_data, location, result):
+        return None
+
+    async def preprocess(image_data, mime_type):
+        return PreprocessedImage(image_data, mime_type, len(image_data))
+
+    async def no_session(user_id, *args):
+        return "session"
+
+    async def is_food(user_id, session_id, content):
+        return {"is_food": True}
+
+    async def pipeline(user_id, session_id, content):
+        runs.append(user_id)
+        for key in ("recipe", "calories", "health_categories", "delivery"):
+            await asyncio.sleep(0.02)
+            yield key, '{"stage": "%s"}' % key
+        yield "final_output", '{"recipe": {"dish_name": "Plov"}, "health_categories": []}'
+
+    monkeypatch.setattr(analysis, "get_cached_analysis", cache_miss)
+    monkeypatch.setattr(analysis, "cache_analysis", no_cache)
+    monkeypatch.setattr(analysis, "preprocess_image", preprocess)
+    monkeypatch.setattr(analysis, "_create_session", no_session)
+    monkeypatch.setattr(analysis, "_delete_session", no_session)
+    monkeypatch.setattr(analysis, "check_food", is_food)
+    monkeypatch.setattr(analysis, "iter_pipeline_outputs", pipeline)
+
+    def observed():
+        return sum(
+            sample.value for metric in ANALYSIS_DURATION.collect() for sample in metric.samples
+            if sample.name.endswith("_count") and sample.labels["outcome"] == "food"
+        )
+
+    async def stream(user_id):
+        return [event async for event in analysis.stream_analysis(b"photo", "image/jpeg", None, user_id)]
+
+    async def scenario():
+        return await asyncio.gather(stream("leader"), stream("follower"))
+
+    before = observed()
+    leader, follower = asyncio.run(scenario())
+    assert runs == ["leader"]
+    assert observed() - before == 2
+    assert [name for name, _ in leader] == ["recipe", "calories", "health_categories", "delivery", "result"]
+    assert leader[0] == ("recipe", {"stage": "recipe"})
+    # The follower gets its stage events from the shared result
+    assert [name for name, _ in follower] == ["recipe", "health_categories", "result"]
+    assert follower[-1] == leader[-1]
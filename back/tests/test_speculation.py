@@ -0,0 +1,115 @@
+import asyncio
+import io
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+from google.adk.models.llm_request import LlmRequest
+from google.genai import types
+from PIL import Image
+
+from src.recipes import analysis
+from src.recipes.instrumentation import (
+    PipelineTrace,
+    estimate_prompt_tokens,
+    pipeline_trace,
+    record_model_call,
+    record_model_usage,
+)
+
+
+def _photo(width, height):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 120, 40)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def _request(text, image_data):
+    return LlmRequest(contents=[types.Content(role="user", parts=[
+        types.Part(text=text),
+        types.Part(inline_data=types.Blob(mime_type="image/jpeg", data=image_data)),
+    ])])
+
+
+def test_estimate_counts_text_and_image_tiles():
+    # 1536x1152 is 2x2 tiles; 400 characters are about 100 tokens
+    assert estimate_prompt_tokens(_request("x" * 400, _photo(1536, 1152))) == 4 * 258 + 100
+    assert estimate_prompt_tokens(_request("", _photo(300, 200))) == 258
+
+
+def test_unanswered_calls_keep_their_estimate():
+    trace = PipelineTrace("root_agent")
+    context = SimpleNamespace(agent_name="recipe_agent")
+    with pipeline_trace(trace):
+        record_model_call(context, _request("x" * 400, _photo(300, 200)))
+        record_model_call(context, _request("x" * 400, _photo(300, 200)))
+        usage = types.GenerateContentResponseUsageMetadata(prompt_token_count=350, candidates_token_count=80)
+        record_model_usage(context, SimpleNamespace(usage_metadata=usage))
+
+    assert trace.total_llm_usage() == {"calls": 2, "prompt_tokens": 350, "response_tokens": 80}
+    assert trace.unanswered_prompt_tokens() == 358
+
+
+def test_failed_check_waits_for_the_cancelled_pipeline(monkeypatch):
+    fake = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(analysis, "redis_client", fake)
+    unwound = []
+
+    async def pipeline_in_flight(user_id, session_id, content):
+        record_model_call(SimpleNamespace(agent_name="recipe_agent"), _request("x" * 400, _photo(300, 200)))
+        try:
+            await asyncio.sleep(60)
+        finally:
+            # Yield once more, as the ADK runner does while closing its stream
+            await asyncio.sleep(0)
+            unwound.append(session_id)
+        yield "final_output", "{}"
+
+    async def failing_check(user_id, session_id, content):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("model unavailable")
+
+    monkeypatch.setattr(analysis, "iter_pipeline_outputs", pipeline_in_flight)
+    monkeypatch.setattr(analysis, "check_food", failing_check)
+
+    async def scenario():
+        content = types.Content(role="user", parts=[types.Part(text="photo")])
+        with pytest.raises(RuntimeError):
+            await analysis._run_speculative(content, "user", "check", "pipeline")
+        return await analysis.get_speculation_stats()
+
+    stats = asyncio.run(scenario())
+    assert unwound == ["pipeline"]
+    assert stats["cancelled_runs"] == 1
+    assert stats["wasted_llm_calls"] == 1
+    assert stats["wasted_unanswered_prompt_tokens"] == 358
+
+
+def test_stages_are_held_until_the_check_confirms_food(monkeypatch):
+    monkeypatch.setattr(analysis, "redis_client", fakeredis.FakeAsyncRedis(decode_responses=True))
+
+    async def pipeline(user_id, session_id, content):
+        yield "recipe", '{"dish_name": "Plov"}'
+        await asyncio.sleep(60)
+        yield "final_output", "{}"
+
+    def check(verdict):
+        async def check_food(user_id, session_id, content):
+            await asyncio.sleep(0.02)
+            return verdict
+        return check_food
+
+    monkeypatch.setattr(analysis, "iter_pipeline_outputs", pipeline)
+    content = types.Content(role="user", parts=[types.Part(text="photo")])
+
+    async def stages_of(verdict):
+        monkeypatch.setattr(analysis, "check_food", check(verdict))
+        stages = []
+        run = asyncio.create_task(analysis._run_speculative(content, "user", "check", "pipeline", lambda *s: stages.append(s)))
+        await asyncio.sleep(0.1)
+        run.cancel()
+        await asyncio.gather(run, return_exceptions=True)
+        return stages
+
+    assert asyncio.run(stages_of({"is_food": False, "description": "A cat"})) == []
+    assert asyncio.run(stages_of({"is_food": True})) == [("recipe", {"dish_name": "Plov"})]
@@ -262,6 +262,7 @@ const generateResponse = async () => {
           health_categories: (res.health_categories || []).map(category => ({ name: category })),
           is_vegan: res.is_vegan ?? false,
           is_halal: res.is_halal ?? false,
+          analysis_id: res.analysis_id ?? null,
         };
         
         console.log("Final health_categories:", finalRecipe.health_categories);
@@ -21,6 +21,7 @@ export const SaveRecipeButton: React.FC<Props> = ({ file, generatedRecipe }) =>
       try {
         const recipeData = {
           file,
+          analysisId: generatedRecipe.analysis_id,
           recipePart: {
             ...generatedRecipe.recipe,
             estimated_weight_g: generatedRecipe.recipe.estimated_weight_g ?? 0,
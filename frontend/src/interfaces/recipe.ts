@@ -42,6 +42,7 @@ export interface PaginatedRecipesResponse {
   page: number;
   page_size: number;
   total_pages: number;
+  next_cursor?: string | null;
 }
 
 export interface FavoriteRecipe {
@@ -57,6 +58,7 @@ export interface PaginatedFavoriteRecipesResponse {
   page: number;
   page_size: number;
   total_pages: number;
+  next_cursor?: string | null;
 }
 
 export interface FavoriteStatusResponse {
@@ -78,6 +80,7 @@ export interface RecipeOutput {
 
 export interface RecipeInput {
   file: File;
+  analysisId?: string | null;
   recipePart: {
     dish_name: string;
     recipe: string;
@@ -127,6 +130,7 @@ export interface GenerationResponse {
   health_categories: string[]; 
   is_vegan?: boolean;
   is_halal?: boolean;
+  analysis_id?: string | null;
 }
 
 export interface GenerationOutput {
@@ -136,6 +140,7 @@ export interface GenerationOutput {
   health_categories: HealthCategory[];
   is_vegan?: boolean;
   is_halal?: boolean;
+  analysis_id?: string | null;
 }
 
 export interface HealthCategory {
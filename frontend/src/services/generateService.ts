@@ -1,4 +1,5 @@
 import axios from '@/lib/axios';
+import { AxiosError } from 'axios';
 import { tokenService } from './tokenService';
 import { RecipeOutput, RecipeInput, GenerationResponse } from "@/interfaces/recipe";
 
@@ -20,28 +21,43 @@ export async function generateRecipe(imageFile: File, location?: string | null):
         Authorization: `Bearer ${token}`,
       }
     });
-    return response.data.analysis || response.data;
+    if (!response.data.analysis) {
+      return response.data;
+    }
+    return { ...response.data.analysis, analysis_id: response.data.analysis_id };
   } catch (error) {
     console.error("Upload error details:", error);
     throw error;
   }
 }
 
-export async function saveRecipe(recipe: RecipeInput) {
+export async function saveRecipe(recipe: RecipeInput): Promise<{ slug: string }> {
   const token = tokenService.requireAuth();
 
   const formData = new FormData();
-  formData.append("file", recipe.file);
-  formData.append("recipe", JSON.stringify(recipe.recipePart));
-
-  const response = await axios.post("/dish/save/", formData, {
-    headers: {
-      "Content-Type": "multipart/form-data",
-      Authorization: `Bearer ${token}`,
-    },
-  });
+  // The backend kept the analyzed photo and analysis; both are only sent again without an analysis id
+  if (recipe.analysisId) {
+    formData.append("analysis_id", recipe.analysisId);
+  } else {
+    formData.append("file", recipe.file);
+    formData.append("recipe", JSON.stringify(recipe.recipePart));
+  }
 
-  return { slug: response.data.slug };
+  try {
+    const response = await axios.post("/dish/save/", formData, {
+      headers: {
+        "Content-Type": "multipart/form-data",
+        Authorization: `Bearer ${token}`,
+      },
+    });
+    return { slug: response.data.slug };
+  } catch (error) {
+    // The staged analysis expired; send the photo instead
+    if (recipe.analysisId && (error as AxiosError).response?.status === 404) {
+      return saveRecipe({ ...recipe, analysisId: null });
+    }
+    throw error;
+  }
 }
 
 export function isRecipe(obj: RecipeOutput): obj is Extract<RecipeOutput, { dish_name: string }> {